@@ -1,7 +1,12 @@
 from PySide2 import QtWidgets, QtCore
 import maya.cmds as cmds
 import time  # 导入时间模块
-from maya import OpenMaya, OpenMayaAnim
+import os
+import sys
+import inspect
+
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import dropframe_sampler
 
 
 class DropFrameTool(QtWidgets.QWidget):
@@ -187,132 +192,46 @@ class DropFrameTool(QtWidgets.QWidget):
                 cmds.warning(f'Object "{obj_name}" has no keyable attributes to add to animation layer.')
 
     def record_keyframes(self, obj_list, start_frame, end_frame, n):
-        """记录对象列表的 n 倍数关键帧数据"""
+        """记录对象列表的 n 倍数关键帧数据（不移动时间轴：直接求曲线值或按时间上下文求值）"""
         self.mute_and_lock_layer()  # 静音并锁定所有相关动画层
 
-        def get_anim_curve(node, attr_name):
-            """获取属性的动画曲线"""
-            dep_fn = OpenMaya.MFnDependencyNode(node)
-            plug = dep_fn.findPlug(attr_name, False)
-            conn = OpenMaya.MPlugArray()
-            plug.connectedTo(conn, True, False)
-            for i in range(conn.length()):
-                if conn[i].node().hasFn(OpenMaya.MFn.kAnimCurve):
-                    return OpenMayaAnim.MFnAnimCurve(conn[i].node())
-            return None
-
-        def get_attr_value(node, attr_name):
-            """获取属性值"""
-            dep_fn = OpenMaya.MFnDependencyNode(node)
-            plug = dep_fn.findPlug(attr_name, False)
-            return plug.asDouble()
-
-        sel = OpenMaya.MSelectionList()
-        for obj_name in obj_list:
-            sel.add(obj_name)
+        attrs = dropframe_sampler.trs_attrs(self.translate_check.isChecked(),
+                                            self.rotate_check.isChecked(),
+                                            self.scale_check.isChecked())
+        # 一次解析所有通道的 plug / 曲线句柄，之后只做求值
+        sampler = dropframe_sampler.ChannelSampler(obj_list, attrs)
+        frames = dropframe_sampler.step_frames(start_frame, end_frame, n)
+        values = sampler.sample(frames)
+        masks = sampler.keyed_mask(frames)  # 只记录原曲线在该帧有 key 的通道
 
         key_frames_dict = {obj_name: [] for obj_name in obj_list}
-        current_frame = start_frame
-        time = OpenMaya.MTime()
-
-        while current_frame <= end_frame:
-            time.setValue(current_frame)
-            OpenMayaAnim.MAnimControl.setCurrentTime(time)
-
-            for obj_name in obj_list:
-                obj = OpenMaya.MObject()
-                try:
-                    sel.getDependNode(sel.getIndex(obj_name), obj)
-                except RuntimeError:
-                    continue
-
-                if self.translate_check.isChecked():
-                    for attr in ["translateX", "translateY", "translateZ"]:
-                        anim_curve = get_anim_curve(obj, attr)
-                        if anim_curve and anim_curve.isKeyframe(OpenMaya.MTime(current_frame)):
-                            key_frames_dict[obj_name].append({
-                                'frame': current_frame,
-                                attr: get_attr_value(obj, attr)
-                            })
-
-                if self.rotate_check.isChecked():
-                    for attr in ["rotateX", "rotateY", "rotateZ"]:
-                        anim_curve = get_anim_curve(obj, attr)
-                        if anim_curve and anim_curve.isKeyframe(OpenMaya.MTime(current_frame)):
-                            key_frames_dict[obj_name].append({
-                                'frame': current_frame,
-                                attr: get_attr_value(obj, attr)
-                            })
-
-                if self.scale_check.isChecked():
-                    for attr in ["scaleX", "scaleY", "scaleZ"]:
-                        anim_curve = get_anim_curve(obj, attr)
-                        if anim_curve and anim_curve.isKeyframe(OpenMaya.MTime(current_frame)):
-                            key_frames_dict[obj_name].append({
-                                'frame': current_frame,
-                                attr: get_attr_value(obj, attr)
-                            })
-
-            current_frame += n
-
-        # 确保记录最后一帧
-        if current_frame - n < end_frame:
-            time.setValue(end_frame)
-            OpenMayaAnim.MAnimControl.setCurrentTime(time)
-
-            for obj_name in obj_list:
-                obj = OpenMaya.MObject()
-                try:
-                    sel.getDependNode(sel.getIndex(obj_name), obj)
-                except RuntimeError:
-                    continue
-
-                if self.translate_check.isChecked():
-                    for attr in ["translateX", "translateY", "translateZ"]:
-                        anim_curve = get_anim_curve(obj, attr)
-                        if anim_curve and anim_curve.isKeyframe(OpenMaya.MTime(end_frame)):
-                            key_frames_dict[obj_name].append({
-                                'frame': end_frame,
-                                attr: get_attr_value(obj, attr)
-                            })
-
-                if self.rotate_check.isChecked():
-                    for attr in ["rotateX", "rotateY", "rotateZ"]:
-                        anim_curve = get_anim_curve(obj, attr)
-                        if anim_curve and anim_curve.isKeyframe(OpenMaya.MTime(end_frame)):
-                            key_frames_dict[obj_name].append({
-                                'frame': end_frame,
-                                attr: get_attr_value(obj, attr)
-                            })
-
-                if self.scale_check.isChecked():
-                    for attr in ["scaleX", "scaleY", "scaleZ"]:
-                        anim_curve = get_anim_curve(obj, attr)
-                        if anim_curve and anim_curve.isKeyframe(OpenMaya.MTime(end_frame)):
-                            key_frames_dict[obj_name].append({
-                                'frame': end_frame,
-                                attr: get_attr_value(obj, attr)
-                            })
-
+        for fi, frame in enumerate(frames):
+            for (obj_name, attr), col, mask in zip(sampler.channels, values, masks):
+                if mask[fi]:
+                    key_frames_dict[obj_name].append({'frame': frame, attr: col[fi]})
+        self.last_sampler = sampler
         return key_frames_dict
 
     def apply_keyframes(self, obj_list, key_frames_dict, start_frame, end_frame, n, layer_name):
-        """将记录的关键帧数据应用到对象列表上"""
+        """将记录的关键帧数据应用到对象列表上（stepped key，每个通道整条曲线一次写入动画层）"""
         self.unmute_and_unlock_layer(layer_name)
+        jobs = []
         for obj_name in obj_list:
-            key_frames = key_frames_dict.get(obj_name, [])
-            for kf in key_frames:
+            channels = {}
+            for kf in key_frames_dict.get(obj_name, []):
                 frame_start = kf['frame']
-                frame_end = frame_start + n
-                if frame_start >= start_frame and frame_start < end_frame:
-                    for frame in range(frame_start, min(frame_end, end_frame + 1)):
-                        for attr, value in kf.items():
-                            if attr == 'frame':
-                                continue
-                            if cmds.getAttr(f"{obj_name}.{attr}", lock=True):
-                                cmds.warning(f"Skipping locked attribute: {obj_name}.{attr}")
-                                continue
-                            cmds.setKeyframe(obj_name, at=attr, t=frame, v=value, animLayer=layer_name)
+                if not (start_frame <= frame_start < end_frame):
+                    continue
+                frame_end = min(frame_start + n, end_frame + 1) - 1
+                for attr, value in kf.items():
+                    if attr == 'frame':
+                        continue
+                    channels.setdefault(attr, {})[frame_start] = (frame_end, value)
+            for attr, holds in channels.items():
+                intervals = [(f0, f1, v) for f0, (f1, v) in holds.items()]
+                jobs.append((f"{obj_name}.{attr}", intervals))
+        # 每段保持只写一个 step key，每个通道整条曲线一次写入动画层
+        return dropframe_sampler.write_layer_curves(jobs, layer_name)
 
     def remove_nokeyframe_obj(self,selected_set,start_frame,end_frame):
         # 遍历对象列表，移除在勾选属性范围内没有关键帧的对象
@@ -337,11 +256,16 @@ class DropFrameTool(QtWidgets.QWidget):
             if has_keyframes:
                 filtered_set.append(obj)
         return filtered_set
-    def show_completion_message(self, object_count, elapsed_time):
+    def show_completion_message(self, object_count, elapsed_time, channel_count=0, timings=None):
         """弹出完成提示窗口"""
+        elapsed = max(elapsed_time, 1e-9)
+        text = (f"Processed {object_count} objects in {elapsed_time:.2f} seconds.\n"
+                f"{object_count / elapsed:.1f} objects/sec, {channel_count / elapsed:.1f} channels/sec")
+        if timings:
+            text += "\n" + ", ".join(f"{name} {sec:.2f}s" for name, sec in timings.items())
         msg_box = QtWidgets.QMessageBox(self)
         msg_box.setWindowTitle("Process Completed")
-        msg_box.setText(f"Processed {object_count} objects in {elapsed_time:.2f} seconds.")
+        msg_box.setText(text)
         msg_box.setIcon(QtWidgets.QMessageBox.Information)
         msg_box.exec_()
 
@@ -371,6 +295,9 @@ class DropFrameTool(QtWidgets.QWidget):
             cmds.warning("No objects with keyframes found in the selected set.")
             return
 
+        # 记录关键帧（先于加入新层：未分层的通道可以直接对曲线求值）
+        key_frames_dict = self.record_keyframes(selected_set, start_frame, end_frame, n)
+
         # 确保动画层存在
         layer_name = f"F{n}_{self.layer_name_base}"
         layer_name = self.ensure_animation_layer_exists(layer_name)
@@ -382,23 +309,24 @@ class DropFrameTool(QtWidgets.QWidget):
         # 确保动画层包含所有选中的对象
         self.ensure_objects_in_layer(selected_set, layer_name)
 
-        # 记录关键帧
-        key_frames_dict = self.record_keyframes(selected_set, start_frame, end_frame, n)
-
         # 应用关键帧
-        self.apply_keyframes(selected_set, key_frames_dict, start_frame, end_frame, n, layer_name)
+        write_result = self.apply_keyframes(selected_set, key_frames_dict, start_frame, end_frame, n, layer_name)
 
         # 记录结束时间
         end_time = time.time()
 
         # 打印消耗时间和对象数量
         elapsed_time = end_time - start_time
-        print(f"Processed {len(selected_set)} objects in {elapsed_time:.2f} seconds.")
+        timings = dict(self.last_sampler.timings)
+        timings["write"] = write_result["seconds"]
+        channel_count = len(self.last_sampler)
+        print(f"Processed {len(selected_set)} objects / {channel_count} channels in {elapsed_time:.2f} seconds.")
+        print("  " + ", ".join(f"{name} {sec:.3f}s" for name, sec in timings.items()))
 
         print(f"已完成集合中所有对象的降帧动画处理。")
 
         # 弹出完成提示窗口
-        self.show_completion_message(len(selected_set), elapsed_time)
+        self.show_completion_message(len(selected_set), elapsed_time, channel_count, timings)
 # 在 Maya 中显示窗口
 if __name__ == "__main__":
     try:
@@ -1,6 +1,15 @@
 import maya.cmds as cmds
+import maya.utils
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+import inspect
 import sys
 
+try:
+    from PySide2 import QtCore
+except ImportError:
+    from PySide6 import QtCore
+
 maya_python_version = sys.version_info[:3]
 if maya_python_version == (3, 7, 7):
     subsyspath = 'S:\Public\qiu_yi\py3716\Lib\site-packages'
@@ -14,9 +23,121 @@ import os.path
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
-from PIL import Image
 import json
 
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import thumbnail_cache
+
+KEY_COLOR_ON = (1, 0, 0)            # 当前帧有 key 且值一致
+KEY_COLOR_CHANGED = (1, 0.5, 0.5)   # 有 key，但当前帧没有 / 值已改
+KEY_COLOR_NONE = (0.45, 0.45, 0.45)
+
+
+class BSRowDispatcher(object):
+    """
+    一个 blendShape 节点一个调度器，代替每个 target 三个 scriptJob。
+    属性变化 / 换帧 / 曲线编辑 / 撤销只把 target 标脏，下一个 UI tick 统一刷新：
+    整个节点的权重和 key 状态用 OpenMaya 一次读完，只重画状态变了的行。
+    """
+
+    def __init__(self, bs_name, items):
+        self.bs_name = bs_name
+        self.rows = []
+        self.plugs = {}           # item -> weight[i] MPlug
+        self.index_to_item = {}   # weight 逻辑索引 -> item
+        self.dirty = set()
+        self.painted = {}         # item -> (value, color)，上一次画上去的状态
+        self.scheduled = False
+        self.callback_ids = []
+
+        sel = om2.MSelectionList()
+        sel.add(bs_name)
+        self.node = sel.getDependNode(0)
+        fn = om2.MFnDependencyNode(self.node)
+        self.weight_attr = fn.attribute("weight")
+        for item in items:
+            try:
+                plug = fn.findPlug(item, False)
+            except RuntimeError:
+                continue
+            self.rows.append(item)
+            self.plugs[item] = plug
+            if plug.isElement:
+                self.index_to_item[plug.logicalIndex()] = item
+
+        self.callback_ids.append(om2.MNodeMessage.addAttributeChangedCallback(
+            self.node, self.on_attribute_changed))
+        self.callback_ids.append(om2.MEventMessage.addEventCallback(
+            "timeChanged", self.mark_all))
+        self.callback_ids.append(om2.MConditionMessage.addConditionCallback(
+            "UndoAvailable", self.mark_all))
+        self.callback_ids.append(oma2.MAnimMessage.addAnimCurveEditedCallback(
+            self.mark_all))
+
+    def on_attribute_changed(self, msg, plug, other_plug, *args):
+        if plug.isElement and plug.array().attribute() == self.weight_attr:
+            item = self.index_to_item.get(plug.logicalIndex())
+            if item is not None:
+                self.dirty.add(item)
+                self.schedule()
+
+    def mark_all(self, *args):
+        self.dirty.update(self.rows)
+        self.schedule()
+
+    def schedule(self):
+        # 同一个 tick 里的所有回调只排一次刷新
+        if not self.scheduled and self.callback_ids:
+            self.scheduled = True
+            QtCore.QTimer.singleShot(0, self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        if not self.dirty or not self.callback_ids:
+            return
+        dirty, self.dirty = self.dirty, set()
+        now = oma2.MAnimControl.currentTime()
+        for item in self.rows:
+            if item not in dirty:
+                continue
+            state = self.read_state(self.plugs[item], now)
+            if self.painted.get(item) == state:
+                continue
+            if not self.paint(item, state):
+                self.dispose()  # 界面已经删掉
+                return
+            self.painted[item] = state
+
+    @staticmethod
+    def read_state(plug, now):
+        value = plug.asDouble()
+        color = KEY_COLOR_NONE
+        src = plug.source()
+        if not src.isNull and src.node().hasFn(om2.MFn.kAnimCurve):
+            curve = oma2.MFnAnimCurve(src.node())
+            index = curve.find(now)
+            if index is not None:
+                color = KEY_COLOR_ON if abs(curve.value(index) - value) < 1e-6 else KEY_COLOR_CHANGED
+            elif curve.numKeys:
+                color = KEY_COLOR_CHANGED
+        return round(value, 3), color
+
+    def paint(self, item, state):
+        value, color = state
+        prefix = self.bs_name + item
+        if not cmds.control(prefix + "button", exists=True):
+            return False
+        cmds.floatSliderGrp(prefix + "slider", edit=True, value=value)
+        cmds.textFieldGrp(prefix + "textFieldGrp", edit=True, text=value)
+        cmds.button(prefix + "button", edit=True, backgroundColor=list(color))
+        return True
+
+    def dispose(self):
+        if self.callback_ids:
+            om2.MMessage.removeCallbacks(self.callback_ids)
+            self.callback_ids = []
+        self.dirty.clear()
+
 
 class JCQ_BS_image_Viewer():
 
@@ -31,6 +152,7 @@ class JCQ_BS_image_Viewer():
         self.sheet_list = None
         self.project_option_menu = None
         self.default_Image_Path = 'S:\\Public\\qiu_yi\\JCQ_Tool\\data\\images\\'
+        self.dispatchers = {}  # tab 名 -> BSRowDispatcher
 
     def errerwindow(self, text):
         error_window = cmds.window("error window", title="error", widthHeight=(400, 200))
@@ -204,70 +326,25 @@ class JCQ_BS_image_Viewer():
                 if cmds.checkBox(self.checkBox_selectBS, q=True, value=True) == True:
                     cmds.select(BSName)
 
-            def createsmallimage(image_path, item, imageType):
-                try:
-                    # 尝试打开第一个文件
-                    original_image = Image.open(image_path + "\\" + item + "." + imageType)
-                except FileNotFoundError:
-                    # 如果第一个文件不存在，切换到第二个路径并打开文件
-                    try:
-                        print("Error: " + image_path + "\\" + item + "." + imageType + " not found!")
-                        original_image = Image.open(self.default_Image_Path + "noimage.png")
-                    except FileNotFoundError:
-                        # 如果两个路径都不存在文件，打印错误消息并退出程序
-                        print("Error: image file not found!")
-                        sys.exit(1)
-                resized_image = original_image.resize((list_height, list_height))
-                resized_image.save(self.default_Image_Path + "small.png")
-                return self.default_Image_Path + "small.png"
-
-            def update_data(BSName, ShapesNames):
-                for item in ShapesNames:
-                    data_now = cmds.getAttr(BSName + "." + item)
-                    cmds.floatSliderGrp(BSName +item + "slider", edit=True, value=float("{:.3f}".format(cmds.getAttr(data_now))))
-                    cmds.textFieldGrp(BSName +item + "textFieldGrp", edit=True, text=float("{:.3f}".format(cmds.getAttr(data_now))))
-                    current_time = cmds.currentTime(query=True)
-                    key_count = cmds.keyframe(BSName + "." + item, time=(current_time, current_time), query=True, keyframeCount=True)
-                    if key_count == 1:
-                        cmds.button(item + "button", edit=True, backgroundColor=[1, 0, 0])
-                    else:
-                        if cmds.keyframe(BSName + "." + item, query=True, keyframeCount=True) > 0:
-                            cmds.button(item + "button", edit=True, backgroundColor=[1, 0.5, 0.5])
-                        else:
-                            cmds.button(item + "button", edit=True, backgroundColor=[0.45, 0.45, 0.45])
-
-            def update_data_v2(BSName, item):
-                def attribute_changed_callback(BSName, item, *args, ):
-                    attribute_value = cmds.getAttr(BSName + "." + item)
-                    current_time = cmds.currentTime(query=True)
-                    key_count = cmds.keyframe(BSName + "." + item, time=(current_time, current_time), query=True, keyframeCount=True)
-                    data_now = cmds.getAttr(BSName + "." + item)
-
-                    cmds.floatSliderGrp(BSName +item + "slider", edit=True, value=float("{:.3f}".format(data_now)))
-                    cmds.textFieldGrp(BSName +item + "textFieldGrp", edit=True, text=float("{:.3f}".format(data_now)))
-
-                    if key_count >= 1:
-                        key_now = cmds.keyframe(BSName + "." + item, query=True, time=(current_time, current_time), valueChange=True)
-                        # print(data_now)
-                        # print(key_now)
-                        if key_now[0] == data_now:
-                            cmds.button(BSName +item + "button", edit=True, backgroundColor=[1, 0, 0])
-                        else:
-                            cmds.button(BSName +item + "button", edit=True, backgroundColor=[1, 0.5, 0.5])
-
-
-                    else:
-                        if cmds.keyframe(BSName + "." + item, query=True, keyframeCount=True) > 0:
-                            cmds.button(BSName +item + "button", edit=True, backgroundColor=[1, 0.5, 0.5])
+            thumbs = thumbnail_cache.get_cache()
+            thumb_size = (list_height, list_height)
 
-                        else:
-                            cmds.button(BSName +item + "button", edit=True, backgroundColor=[0.45, 0.45, 0.45])
+            def set_picture(control, path):
+                if cmds.control(control, exists=True):
+                    cmds.picture(control, edit=True, image=path)
 
-                cmds.scriptJob(attributeChange=[BSName + "." + item, lambda BSName=BSName, item=item: attribute_changed_callback(BSName, item)])
-                cmds.scriptJob(ct=["UndoAvailable", lambda BSName=BSName, item=item: attribute_changed_callback(BSName, item)])
-                cmds.scriptJob(event=["timeChanged", lambda BSName=BSName, item=item: attribute_changed_callback(BSName, item)])
+            def createsmallimage(image_path, item, imageType, control):
+                # 本地缩略图缓存；没有时先用占位图，后台生成好再换上
+                path = thumbs.request(image_path + "\\" + item + "." + imageType, thumb_size,
+                                      thumbnail_cache.MODE_STRETCH,
+                                      fallback=self.default_Image_Path + "noimage.png",
+                                      on_ready=lambda p, c=control: set_picture(c, p),
+                                      deliver=maya.utils.executeDeferred)
+                if path:
+                    set_picture(control, path)
 
             # 创建新窗口
+            self.dispose_dispatcher(selected_item)
             cmds.setParent(self.main_tabs)
             tab_names = cmds.tabLayout(self.main_tabs, query=True, childArray=True)
 
@@ -299,12 +376,15 @@ class JCQ_BS_image_Viewer():
                 self.errerwindow(BSName + "dont exist")
                 return
 
+            rows = []
             for item in ShapesNames:
                 cmds.rowLayout(numberOfColumns=6, columnWidth6=(150, list_height, list_height, 150, 50, 50))
                 if cmds.objExists(BSName + "." + item):
                     cmds.text(label=item)
-                    cmds.picture(image=createsmallimage(image_path, "default", imageType), height=list_height)
-                    cmds.picture(image=createsmallimage(image_path, item, imageType), height=list_height)
+                    default_picture = cmds.picture(image=thumbs.placeholder(thumb_size), height=list_height)
+                    createsmallimage(image_path, "default", imageType, default_picture)
+                    item_picture = cmds.picture(image=thumbs.placeholder(thumb_size), height=list_height)
+                    createsmallimage(image_path, item, imageType, item_picture)
                     try:
                         slider_value = float("{:.3f}".format(cmds.getAttr(BSName + "." + item)))
                     except:
@@ -319,18 +399,25 @@ class JCQ_BS_image_Viewer():
                                                   textChangedCommand=lambda text, x=item: textFieldchange(x, text))
                     button = cmds.button(BSName + item + "button", label="key",
                                          command=lambda label, BSName=BSName, item=item: btnsetkey(label, BSName, item))
-                    update_data_v2(BSName, item)
+                    rows.append(item)
                     cmds.setParent('..')
                 else:
                     cmds.text(label=item+" dont exist",height=list_height)
                     cmds.setParent('..')
-            try:
-                update_data(BSName, ShapesNames)
-            except:
-                pass
+            # 整个 blendShape 一个调度器，先整体刷一次按钮颜色
+            dispatcher = BSRowDispatcher(BSName, rows)
+            self.dispatchers[selected_item] = dispatcher
+            dispatcher.mark_all()
 
             cmds.tabLayout(self.main_tabs, edit=True, selectTab=selected_item + 'scrolllayout')
 
+    def dispose_dispatcher(self, tab_name=None):
+        names = [tab_name] if tab_name else list(self.dispatchers)
+        for name in names:
+            dispatcher = self.dispatchers.pop(name, None)
+            if dispatcher:
+                dispatcher.dispose()
+
     def create_Window(self):
         def update_sheet_list():
             selected_project = cmds.optionMenu(self.sheet_list, query=True, value=True)
@@ -414,6 +501,9 @@ class JCQ_BS_image_Viewer():
                             (GraphEditor_Button, 'left', 5, ShapeEditor_Button)
                         ])
 
+        # 窗口关掉时移除所有回调
+        cmds.scriptJob(uiDeleted=[window, lambda: self.dispose_dispatcher()])
+
         # 显示主窗口
         cmds.showWindow(window)
 
@@ -8,6 +8,14 @@ import os
 import glob
 import re
 import json
+import sys
+import inspect
+
+# test/ 下的共用模块（a2f_stream 不依赖 maya，MB 里同样可用）
+_TEST_DIR = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+if _TEST_DIR not in sys.path:
+    sys.path.append(_TEST_DIR)
+import a2f_stream
 A2FfacsNames = [
     "browLowerL",
     "browLowerR",
@@ -512,11 +520,10 @@ def PopulateLayout(mainLyt,*args):
             ed_Jpathfullface.Text  = filePopup.FullFilename
             print ("the path is " + ed_Jpath.Text)
             #change dataframe lb
-            with open (ed_Jpath.Text) as f:
-                facs_data = json.loads(f.read())
-                jsonframedata = str(facs_data["numFrames"])
-                jsonframedata_lb.Caption = ".josn file frame length is : " + jsonframedata
-                jsonframedatafullface_lb.Caption = ".josn file frame length is : " + jsonframedata
+            # 只读头部，不解析 weightMat
+            jsonframedata = str(a2f_stream.read_header(ed_Jpath.Text).get("numFrames", 0))
+            jsonframedata_lb.Caption = ".josn file frame length is : " + jsonframedata
+            jsonframedatafullface_lb.Caption = ".josn file frame length is : " + jsonframedata
 
     def GetLastSelectetdModels():
         selectedModels = FBModelList()
@@ -611,15 +618,14 @@ def PopulateLayout(mainLyt,*args):
         #print("import json to set mouth blendshapes key")
         setkeytimes = 0
         
-        with open (importjsonpath) as f:
+        # weightMat 分块读取（array('f')，按行展开），内存与 take 长度无关
+        with a2f_stream.open_a2f(importjsonpath) as reader:
             startframe = ed_startframe.Text
             keyMp = ed_mp.Text
             
-            facs_data = json.loads(f.read())
-            facsNames = facs_data["facsNames"]
-            numPoses = facs_data["numPoses"]
-            numFrames = facs_data["numFrames"]
-            weightMat = facs_data["weightMat"]
+            facsNames = reader.facsNames
+            numPoses = reader.numPoses
+            numFrames = reader.numFrames
             selectM = GetLastSelectetdModels()
             global jsontype
             #judge face type
@@ -683,26 +689,29 @@ def PopulateLayout(mainLyt,*args):
             #key slelct mesh from Json
             if selectM != None :
                 print ("key on select")
-                for fr in range(numFrames) :
-                    for i in range(numPoses):
-                        if  selectM.PropertyList.Find(str(facsNames[i])) is not None:
-                            selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
-                            selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), weightMat[fr][i]*100*float(keyMp))
-                            setkeytimes = setkeytimes +1
-                            if facsNames[i] == "Mouth_Down" :
+                for start, n, flat in reader.chunks(stop=numFrames):
+                    for r in range(n):
+                        fr = start + r
+                        row = flat[r*numPoses:(r+1)*numPoses]
+                        for i in range(numPoses):
+                            if  selectM.PropertyList.Find(str(facsNames[i])) is not None:
                                 selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
-                                selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), weightMat[fr][i]*30*float(keyMp))
+                                selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), row[i]*100*float(keyMp))
                                 setkeytimes = setkeytimes +1
+                                if facsNames[i] == "Mouth_Down" :
+                                    selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
+                                    selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), row[i]*30*float(keyMp))
+                                    setkeytimes = setkeytimes +1
 
-                            if facsNames[i] == "Mouth_Down_Lower_L" :
-                                selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
-                                selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), weightMat[fr][i]*30*float(keyMp))
-                                setkeytimes = setkeytimes +1
+                                if facsNames[i] == "Mouth_Down_Lower_L" :
+                                    selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
+                                    selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), row[i]*30*float(keyMp))
+                                    setkeytimes = setkeytimes +1
 
-                            if facsNames[i] == "Mouth_Down_Lower_R" :
-                                selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
-                                selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), weightMat[fr][i]*30*float(keyMp))
-                                setkeytimes = setkeytimes +1
+                                if facsNames[i] == "Mouth_Down_Lower_R" :
+                                    selectM.PropertyList.Find(str(facsNames[i])).SetAnimated(True)
+                                    selectM.PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), row[i]*30*float(keyMp))
+                                    setkeytimes = setkeytimes +1
             else:
                 print("key for name")
                 nousemeshcount = 0
@@ -729,16 +738,19 @@ def PopulateLayout(mainLyt,*args):
                                     pass  
                             else:
                                 pass
-                for fr in range(numFrames) :
-                    for i in range(numPoses):
-                        if  facsNames[i] in TargerShapes:
-                            for j in range(meshcount):
-                                if meshlist[j] is not None :
-                                    if  meshlist[j].PropertyList.Find(str(facsNames[i])) is not None:
-                                        meshlist[j].PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), weightMat[fr][i]*100*float(keyMp))
-                                        setkeytimes = setkeytimes +1
-                                else:
-                                    pass
+                for start, n, flat in reader.chunks(stop=numFrames):
+                    for r in range(n):
+                        fr = start + r
+                        row = flat[r*numPoses:(r+1)*numPoses]
+                        for i in range(numPoses):
+                            if  facsNames[i] in TargerShapes:
+                                for j in range(meshcount):
+                                    if meshlist[j] is not None :
+                                        if  meshlist[j].PropertyList.Find(str(facsNames[i])) is not None:
+                                            meshlist[j].PropertyList.Find(str(facsNames[i])).GetAnimationNode().FCurve.KeyAdd(FBTime(0, 0, 0,fr+int(startframe)), row[i]*100*float(keyMp))
+                                            setkeytimes = setkeytimes +1
+                                    else:
+                                        pass
             
             onetimetime = FBTime(0,0,0,int(ed_startframe.Text),0)
             twotimetime = FBTime(0,0,0,int(ed_startframe.Text)+1,0)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""Bulk anim-curve writer shared by the A2F / ARKit facial importers.
+
+Every importer used to key one frame at a time (setAttr + setKeyframe per
+channel per frame). Here each channel is written as a whole curve:
+
+- free plug      : createNode animCurveT* -> one setAttr on .ktv[0:N-1] -> connectAttr
+- existing curve : clear per policy -> one setKeyframe with all times -> one setAttr on .ktv
+- tangents       : one keyTangent edit over the written range
+
+Everything goes through cmds, so an import stays a single undo step.
+
+    import a2f_curve_writer as acw
+    acw.write_curves([("blendShape1.jawOpen", values), ...], times, ott="linear")
+    acw.write_chunked(plugs, ((times, columns) for ...))   # streamed takes (a2f_stream)
+"""
+import bisect
+import re
+import time
+
+import maya.cmds as cmds
+
+CLEAR_RANGE = "range"  # drop existing keys inside [first, last] of the import (default)
+CLEAR_ALL = "all"      # drop every existing key on the curve
+CLEAR_NONE = "none"    # keep existing keys; imported keys replace keys at the same time
+
+CLEAR_POLICIES = (CLEAR_RANGE, CLEAR_ALL, CLEAR_NONE)
+TANGENT_TYPES = ("auto", "linear", "spline", "clamped", "flat", "step", "plateau")
+
+_CURVE_TYPES = {"doubleLinear": "animCurveTL", "doubleAngle": "animCurveTA"}
+
+
+def _find_curve(plug):
+    """(anim curve driving plug or None, plug has any input)"""
+    src = cmds.listConnections(plug, s=True, d=False, skipConversionNodes=True) or []
+    if not src:
+        return None, False
+    if cmds.nodeType(src[0]).startswith("animCurveT"):
+        return src[0], True
+    # anim layer / pairBlend etc.: let setKeyframe resolve the right curve
+    return None, True
+
+
+def _layer_curve(layer, plug):
+    """plug 在动画层 layer 上的曲线（还没有 key 时为 None）"""
+    curves = cmds.animLayer(layer, q=True, findCurveForPlug=plug) or []
+    return curves[0] if curves else None
+
+
+def _curve_name(plug):
+    node, attr = plug.split(".", 1)
+    return re.sub(r"\W", "_", "%s_%s" % (node.split("|")[-1].split(":")[-1], attr))
+
+
+def _set_ktv(curve, first, times, values):
+    flat = [x for tv in zip(times, values) for x in tv]
+    cmds.setAttr("%s.ktv[%d:%d]" % (curve, first, first + len(times) - 1), *flat)
+
+
+def write_curve(plug, times, values, itt="auto", ott="auto", clear=CLEAR_RANGE, layer=None):
+    """Write one channel in bulk; times must be ascending. Returns the curve name.
+
+    layer: write to the plug's curve on that animation layer instead of the base curve."""
+    if len(times) != len(values):
+        raise ValueError("times/values length mismatch on %s" % plug)
+    if not len(times):
+        return None
+    if clear not in CLEAR_POLICIES:
+        raise ValueError("unknown clear policy: %s" % clear)
+    times = [float(t) for t in times]
+    values = [float(v) for v in values]
+
+    tangent_start = times[0]
+    if layer:
+        curve, driven = _layer_curve(layer, plug), True
+    else:
+        curve, driven = _find_curve(plug)
+    if not driven:
+        curve_type = _CURVE_TYPES.get(cmds.getAttr(plug, type=True), "animCurveTU")
+        curve = cmds.createNode(curve_type, n=_curve_name(plug), skipSelect=True)
+        _set_ktv(curve, 0, times, values)
+        cmds.connectAttr(curve + ".output", plug, f=True)
+    else:
+        if layer and not curve:
+            pass  # 层上还没有曲线：没有可清除的 key，也不能碰底层曲线
+        elif clear == CLEAR_NONE and curve:
+            old_t = cmds.keyframe(curve, q=True, timeChange=True) or []
+            old_v = cmds.keyframe(curve, q=True, valueChange=True) or []
+            merged = dict(zip(old_t, old_v))
+            merged.update(zip(times, values))
+            times = sorted(merged)
+            values = [merged[t] for t in times]
+            cmds.cutKey(curve, clear=True)
+        # CLEAR_NONE without a direct curve (anim layer) falls back to CLEAR_RANGE
+        elif clear == CLEAR_ALL:
+            cmds.cutKey(curve or plug, clear=True)
+        else:
+            cmds.cutKey(curve or plug, time=(times[0], times[-1]), clear=True)
+        if layer:
+            cmds.setKeyframe(plug, time=times, animLayer=layer)
+            curve = curve or _layer_curve(layer, plug)
+        else:
+            cmds.setKeyframe(plug, time=times)
+            curve = curve or (cmds.keyframe(plug, q=True, name=True) or [None])[0]
+        if not curve:
+            raise RuntimeError("no anim curve for %s" % plug)
+        all_times = cmds.keyframe(curve, q=True, timeChange=True) or []
+        first = bisect.bisect_left(all_times, times[0] - 1e-6)
+        _set_ktv(curve, first, times, values)
+        if first > 0:
+            # 分块导入时前一块的末帧切线要按新邻居重算
+            tangent_start = all_times[first - 1]
+
+    cmds.keyTangent(curve, e=True, time=(tangent_start, times[-1]), itt=itt, ott=ott)
+    return curve
+
+
+def write_curves(channels, times, itt="auto", ott="auto", clear=CLEAR_RANGE, verbose=True):
+    """Write many channels sharing one time axis inside one undo chunk with refresh suspended.
+
+    channels: iterable of (plug, values). Missing plugs are reported, not raised.
+    Returns {"curves": [...], "keys": int, "failed": [(plug, error)], "seconds": float}."""
+    channels = list(channels)
+    return write_chunked([plug for plug, _ in channels],
+                         [(times, [values for _, values in channels])],
+                         itt, ott, clear, verbose)
+
+
+def write_chunked(plugs, chunks, itt="auto", ott="auto", clear=CLEAR_RANGE, verbose=True):
+    """Like write_curves, but the time axis arrives in consecutive chunks (a2f_stream).
+
+    chunks: iterable of (times, [values per plug]) in ascending time order. The clear
+    policy applies to the first chunk; later chunks only replace their own range,
+    so the whole import is still one undo step."""
+    result = {"curves": [], "keys": 0, "failed": [], "seconds": 0.0}
+    curves, failed = {}, {}
+    t0 = time.perf_counter()
+    cmds.undoInfo(openChunk=True, chunkName="a2f_curve_writer")
+    cmds.refresh(suspend=True)
+    try:
+        policy = clear
+        for times, columns in chunks:
+            for plug, values in zip(plugs, columns):
+                if plug in failed:
+                    continue
+                try:
+                    if plug not in curves and not cmds.objExists(plug):
+                        raise RuntimeError("plug does not exist")
+                    curves[plug] = write_curve(plug, times, values, itt, ott, policy)
+                    result["keys"] += len(times)
+                except Exception as e:
+                    failed[plug] = e
+                    curves.pop(plug, None)
+            if clear != CLEAR_NONE:
+                policy = CLEAR_RANGE
+    finally:
+        cmds.refresh(suspend=False)
+        cmds.undoInfo(closeChunk=True)
+    result["curves"] = [curves[p] for p in plugs if p in curves]
+    result["failed"] = [(p, failed[p]) for p in plugs if p in failed]
+    result["seconds"] = time.perf_counter() - t0
+    if verbose:
+        for plug, e in result["failed"]:
+            print(u"[curve writer] 失败: %s : %s" % (plug, e))
+        print(u"[curve writer] curves=%d keys=%d failed=%d  %.3fs"
+              % (len(result["curves"]), result["keys"], len(result["failed"]), result["seconds"]))
+    return result
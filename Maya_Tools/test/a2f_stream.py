@@ -0,0 +1,580 @@
+# -*- coding: utf-8 -*-
+"""Streaming reader / writer for A2F / ARKit facial JSON (weightMat frames x poses).
+
+json.loads() on a long take builds one Python float per sample before anything is
+keyed. A2FReader parses the small header keys normally, but only remembers where
+weightMat starts; frames are then parsed chunk by chunk into flat array('f')
+(row-major, n x numPoses), so peak memory is one chunk, not one take.
+
+No maya import: MotionBuilder (MB_FaceKey) uses the same module.
+
+    import a2f_stream
+    with a2f_stream.A2FReader(path) as rd:
+        for start, n, flat in rd.chunks(512):
+            ...                                   # flat[r * rd.numPoses + p]
+
+    with a2f_stream.A2FWriter(out, facsNames) as wr:
+        wr.write_chunk(flat)                      # or wr.write_rows(rows)
+
+Binary cache (.a2fb, next to the source file): pose-major float32 columns plus a
+JSON header (names, fps, audio path), mmap'd on open so a column is a zero-copy
+memoryview. open_a2f() picks the cache when it is newer than the source; both
+readers expose the same header properties and chunks().
+
+    a2f_stream.json_to_cache(json_path)            # or csv_to_cache(csv_path)
+    with a2f_stream.open_a2f(json_path) as rd:     # A2FCache or A2FReader
+        ...
+"""
+import csv
+import json
+import mmap
+import os
+import re
+import struct
+from array import array
+
+CHUNK_FRAMES = 512
+_BUF_SIZE = 1 << 20
+_WS = b" \t\r\n"
+
+_STRUCT_TOK = re.compile(br'["\[\]{}]')
+_STRING_TOK = re.compile(br'\\.|"', re.S)
+_LITERAL_END = re.compile(br'[,\]}\s]')
+
+
+class _Scanner(object):
+    """缓冲扫描：只保留未消费部分，取值时按需补读"""
+
+    def __init__(self, f, buf_size=_BUF_SIZE):
+        self.f = f
+        self.buf_size = buf_size
+        self.buf = b""
+        self.pos = 0
+        self.base = f.tell()
+
+    def _more(self):
+        data = self.f.read(self.buf_size)
+        if not data:
+            return False
+        self.base += self.pos
+        self.buf = self.buf[self.pos:] + data
+        self.pos = 0
+        return True
+
+    def tell(self):
+        return self.base + self.pos
+
+    def seek(self, offset):
+        self.f.seek(offset)
+        self.buf, self.pos, self.base = b"", 0, offset
+
+    def peek(self):
+        """跳过空白，返回下一个字节（b'' 表示 EOF）"""
+        while True:
+            buf, i = self.buf, self.pos
+            while i < len(buf) and buf[i] in _WS:
+                i += 1
+            self.pos = i
+            if i < len(buf):
+                return buf[i:i + 1]
+            if not self._more():
+                return b""
+
+    def expect(self, ch):
+        got = self.peek()
+        if got != ch:
+            raise ValueError("expected %r at byte %d, got %r" % (ch, self.tell(), got))
+        self.pos += 1
+
+    def take_value(self, keep=True):
+        """扫过一个完整 JSON 值；keep=False 时不保留内容（用于跳过 weightMat）"""
+        c = self.peek()
+        if not c:
+            raise ValueError("unexpected end of file")
+        out = []
+        i = self.pos
+        if c not in b'[{"':
+            while True:
+                m = _LITERAL_END.search(self.buf, i)
+                if m:
+                    i = m.start()
+                    break
+                i = len(self.buf)
+                if keep:
+                    out.append(self.buf[self.pos:i])
+                self.pos = i
+                if not self._more():
+                    break
+                i = self.pos
+        else:
+            depth, in_str = 0, False
+            while True:
+                m = (_STRING_TOK if in_str else _STRUCT_TOK).search(self.buf, i)
+                if m is None:
+                    i = len(self.buf)
+                    if in_str and self.buf.endswith(b"\\"):
+                        i -= 1  # 转义符落在缓冲末尾，补读后再配对
+                    if keep:
+                        out.append(self.buf[self.pos:i])
+                    self.pos = i
+                    if not self._more():
+                        raise ValueError("unterminated value at byte %d" % self.tell())
+                    i = self.pos
+                    continue
+                i = m.end()
+                tok = m.group()
+                if in_str:
+                    if tok == b'"':
+                        in_str = False
+                        if depth == 0:
+                            break
+                elif tok == b'"':
+                    in_str = True
+                elif tok in b"[{":
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        break
+        if keep:
+            out.append(self.buf[self.pos:i])
+        self.pos = i
+        return b"".join(out) if keep else None
+
+    def take_row(self):
+        """读一行 [a, b, ...]，返回括号内的原始字节"""
+        self.expect(b"[")
+        while True:
+            j = self.buf.find(b"]", self.pos)
+            if j >= 0:
+                row = self.buf[self.pos:j]
+                self.pos = j + 1
+                return row
+            if not self._more():
+                raise ValueError("unterminated weightMat row at byte %d" % self.tell())
+
+
+class A2FReader(object):
+    """Header keys are parsed on open; weightMat is only read through chunks()."""
+
+    def __init__(self, path, buf_size=_BUF_SIZE):
+        self.path = path
+        self.header = {}
+        self._mat_offset = None
+        self._f = open(path, "rb")
+        try:
+            self._scan = _Scanner(self._f, buf_size)
+            self._read_header()
+        except Exception:
+            self._f.close()
+            raise
+
+    def _read_header(self):
+        sc = self._scan
+        sc.expect(b"{")
+        if sc.peek() == b"}":
+            return
+        while True:
+            key = json.loads(sc.take_value().decode("utf-8"))
+            sc.expect(b":")
+            if key == "weightMat":
+                self._mat_offset = sc.tell()
+                # 常见导出里 weightMat 在最后；numFrames 已知就不必扫完整个矩阵
+                if "numFrames" in self.header and "facsNames" in self.header:
+                    return
+                sc.take_value(keep=False)
+            else:
+                self.header[key] = json.loads(sc.take_value().decode("utf-8"))
+            c = sc.peek()
+            sc.pos += 1
+            if c == b"}":
+                return
+            if c != b",":
+                raise ValueError("bad JSON object in %s at byte %d" % (self.path, sc.tell()))
+
+    @property
+    def facsNames(self):
+        return self.header.get("facsNames") or []
+
+    @property
+    def numPoses(self):
+        return self.header.get("numPoses") or len(self.facsNames)
+
+    @property
+    def numFrames(self):
+        return self.header.get("numFrames", 0)
+
+    @property
+    def fps(self):
+        return self.header.get("exportFps")
+
+    def chunks(self, chunk_frames=CHUNK_FRAMES, start=0, stop=None):
+        """逐块产出 (start_frame, n, array('f'))，array 按行展开 n x numPoses。
+        stop 默认 numFrames（与旧代码 weightMat[:numFrames] 一致）。"""
+        if self._mat_offset is None:
+            return
+        if stop is None:
+            stop = self.header.get("numFrames", float("inf"))
+        width = self.numPoses
+        sc = self._scan
+        sc.seek(self._mat_offset)
+        sc.expect(b"[")
+        fr = 0
+        flat, n = array("f"), 0
+        while fr < stop:
+            c = sc.peek()
+            if c == b",":
+                sc.pos += 1
+                c = sc.peek()
+            if c != b"[":
+                break  # ']' 或文件尾：矩阵结束
+            row = sc.take_row()
+            if fr >= start:
+                before = len(flat)
+                if row.strip():
+                    flat.extend(map(float, row.split(b",")))
+                if len(flat) - before != width:
+                    raise ValueError("frame %d has %d values, expected %d"
+                                     % (fr, len(flat) - before, width))
+                n += 1
+                if n == chunk_frames:
+                    yield fr - n + 1, n, flat
+                    flat, n = array("f"), 0
+            fr += 1
+        if n:
+            yield fr - n, n, flat
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def as_rows(flat, width):
+    """把块展开成行列表（无 numpy 时给纯 Python 求解用）"""
+    return [flat[r:r + width] for r in range(0, len(flat), width)]
+
+
+class A2FWriter(object):
+    """Chunked writer producing the same layout A2F exports (and csvtojson writes).
+
+    numFrames is written up front when given, otherwise after weightMat once it is
+    known; A2FReader handles both orders."""
+
+    def __init__(self, path, facsNames, exportFps=60, trackPath="", numFrames=None,
+                 precision=6, extra=None):
+        self.facsNames = list(facsNames)
+        self.width = len(self.facsNames)
+        self.frames = 0
+        self._declared = numFrames
+        self._fmt = "%%.%dg" % precision
+        self._f = open(path, "w")
+        header = {"exportFps": exportFps, "trackPath": trackPath, "numPoses": self.width}
+        if numFrames is not None:
+            header["numFrames"] = numFrames
+        header["facsNames"] = self.facsNames
+        header.update(extra or {})
+        self._f.write("{\n")
+        for k, v in header.items():
+            self._f.write("    %s: %s,\n" % (json.dumps(k), json.dumps(v)))
+        self._f.write('    "weightMat": [')
+
+    def write_rows(self, rows):
+        fmt = self._fmt
+        lines = []
+        for row in rows:
+            if len(row) != self.width:
+                raise ValueError("row %d has %d values, expected %d"
+                                 % (self.frames, len(row), self.width))
+            lines.append("%s\n        [%s]" % ("," if self.frames else "",
+                                              ", ".join(fmt % v for v in row)))
+            self.frames += 1
+        self._f.write("".join(lines))
+
+    def write_chunk(self, flat):
+        """flat: 按行展开的 n x numPoses 序列（A2FReader.chunks 的输出可直接回写）"""
+        if len(flat) % self.width:
+            raise ValueError("chunk size %d is not a multiple of %d" % (len(flat), self.width))
+        self.write_rows(as_rows(flat, self.width))
+
+    def close(self):
+        if self._f.closed:
+            return
+        self._f.write("\n    ]")
+        if self._declared is None:
+            self._f.write(',\n    "numFrames": %d' % self.frames)
+        elif self._declared != self.frames:
+            print(u"[a2f_stream] numFrames=%d 但写入了 %d 帧" % (self._declared, self.frames))
+        self._f.write("\n}\n")
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ---------------------------------------------------------------------------
+# .a2fb 列式缓存
+#   [magic 'A2FB'][u16 version][u16 reserved][u32 header_len][header json][pad 4]
+#   [float32 pose 0: numFrames][float32 pose 1: numFrames]...
+# ---------------------------------------------------------------------------
+CACHE_EXT = ".a2fb"
+_CACHE_MAGIC = b"A2FB"
+_CACHE_VERSION = 1
+_CACHE_HEAD = struct.Struct("<4sHHI")
+
+
+def _pad4(n):
+    return -n % 4
+
+
+def cache_path_for(path):
+    return os.path.splitext(path)[0] + CACHE_EXT
+
+
+def is_cache(path):
+    with open(path, "rb") as f:
+        return f.read(4) == _CACHE_MAGIC
+
+
+class A2FCache(object):
+    """mmap'd .a2fb reader; column(p) is a zero-copy float32 memoryview of one pose."""
+
+    def __init__(self, path):
+        self.path = path
+        self._data = None
+        self._f = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._f.close()
+            raise
+        try:
+            magic, version, _, hlen = _CACHE_HEAD.unpack_from(self._mm, 0)
+            if magic != _CACHE_MAGIC or version > _CACHE_VERSION:
+                raise ValueError("not an a2f cache (v%d): %s" % (_CACHE_VERSION, path))
+            start = _CACHE_HEAD.size
+            self.header = json.loads(self._mm[start:start + hlen].decode("utf-8"))
+            base = start + hlen + _pad4(hlen)
+            size = 4 * self.numFrames * self.numPoses
+            if base + size > len(self._mm):
+                raise ValueError("truncated a2f cache: %s" % path)
+            self._data = memoryview(self._mm)[base:base + size].cast("f")
+        except Exception:
+            self.close()
+            raise
+
+    @property
+    def facsNames(self):
+        return self.header.get("facsNames") or []
+
+    @property
+    def numPoses(self):
+        return self.header.get("numPoses") or len(self.facsNames)
+
+    @property
+    def numFrames(self):
+        return self.header.get("numFrames", 0)
+
+    @property
+    def fps(self):
+        return self.header.get("exportFps")
+
+    def column(self, pose, start=0, stop=None):
+        """一个 pose 的帧序列（零拷贝，close 前需先释放）"""
+        n = self.numFrames
+        stop = n if stop is None else min(stop, n)
+        return self._data[pose * n + start:pose * n + stop]
+
+    def as_numpy(self):
+        """frames x poses 的 numpy 视图（零拷贝）；无 numpy 时抛 ImportError。
+        视图还活着时 close() 不会报错，映射留到视图被回收为止"""
+        import numpy as np
+        return np.frombuffer(self._data, dtype=np.float32).reshape(self.numPoses, self.numFrames).T
+
+    def chunks(self, chunk_frames=CHUNK_FRAMES, start=0, stop=None):
+        """与 A2FReader.chunks 相同的行展开块，现有导入代码不用改"""
+        width = self.numPoses
+        stop = self.numFrames if stop is None else min(stop, self.numFrames)
+        for s in range(start, stop, chunk_frames):
+            n = min(chunk_frames, stop - s)
+            flat = array("f", bytes(4 * n * width))
+            for p in range(width):
+                flat[p::width] = array("f", self.column(p, s, s + n))
+            yield s, n, flat
+
+    def close(self):
+        if self._f.closed:
+            return
+        # 外部还持有 column() / as_numpy() 视图时 release / close 会抛 BufferError，
+        # 这时映射交给 GC（视图释放后自动解除）
+        if self._data is not None:
+            try:
+                self._data.release()
+            except BufferError:
+                pass
+            self._data = None
+        try:
+            self._mm.close()
+        except BufferError:
+            pass
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_cache(path, facsNames, numFrames, chunks, exportFps=60, trackPath="", source=""):
+    """chunks: (start, n, 行展开 flat) 序列，按列写入缓存；source 记录源文件名。
+    先写临时文件再替换，写到一半的缓存不会被 open_a2f 当成新缓存。"""
+    width = len(facsNames)
+    header = json.dumps({"exportFps": exportFps, "trackPath": trackPath, "numPoses": width,
+                         "numFrames": numFrames, "facsNames": list(facsNames),
+                         "layout": "pose-major float32", "source": source}).encode("utf-8")
+    base = _CACHE_HEAD.size + len(header) + _pad4(len(header))
+    tmp = path + ".tmp"
+    written = 0
+    with open(tmp, "w+b") as f:
+        f.write(_CACHE_HEAD.pack(_CACHE_MAGIC, _CACHE_VERSION, 0, len(header)))
+        f.write(header + b"\0" * _pad4(len(header)))
+        f.truncate(base + 4 * width * numFrames)
+        if width and numFrames:
+            mm = mmap.mmap(f.fileno(), 0)
+            try:
+                for start, n, flat in chunks:
+                    n = min(n, numFrames - start)
+                    if n <= 0:
+                        break
+                    for p in range(width):
+                        off = base + 4 * (p * numFrames + start)
+                        mm[off:off + 4 * n] = array("f", flat[p::width][:n]).tobytes()
+                    written = start + n
+                mm.flush()
+            finally:
+                mm.close()
+    if written != numFrames:
+        os.remove(tmp)
+        raise ValueError("expected %d frames, got %d" % (numFrames, written))
+    os.replace(tmp, path)
+    return path
+
+
+def open_a2f(path, build_cache=False):
+    """缓存比源文件新就用 A2FCache，否则流式读源 JSON（build_cache=True 时顺便生成缓存）"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == CACHE_EXT:
+        return A2FCache(path)
+    cache = cache_path_for(path)
+    if os.path.isfile(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+        try:
+            rd = A2FCache(cache)
+        except (ValueError, OSError, struct.error) as e:
+            print(u"[a2f_stream] 缓存无效，改读源文件: %s (%s)" % (cache, e))
+        else:
+            # 同名 .csv / .json 共用一个缓存路径，只认自己生成的
+            if rd.header.get("source", os.path.basename(path)) == os.path.basename(path):
+                return rd
+            rd.close()
+    if build_cache:
+        convert = csv_to_cache if ext == ".csv" else json_to_cache
+        return A2FCache(convert(path, cache))
+    if ext == ".csv":
+        raise ValueError("CSV needs a cache first (csv_to_cache): %s" % path)
+    return A2FReader(path)
+
+
+def read_header(path):
+    """只读头部（facsNames / numFrames / exportFps ...），不解析 weightMat"""
+    with open_a2f(path) as rd:
+        return dict(rd.header)
+
+
+# --- converters ---------------------------------------------------------------
+def json_to_cache(json_path, cache_path=None):
+    cache_path = cache_path or cache_path_for(json_path)
+    with A2FReader(json_path) as rd:
+        num = rd.header.get("numFrames")
+        if num is None:
+            num = sum(n for _, n, _ in rd.chunks())
+        return write_cache(cache_path, rd.facsNames, num, rd.chunks(stop=num),
+                           rd.header.get("exportFps", 60), rd.header.get("trackPath", ""),
+                           os.path.basename(json_path))
+
+
+def cache_to_json(cache_path, json_path, precision=6):
+    with A2FCache(cache_path) as rd, A2FWriter(json_path, rd.facsNames, rd.fps or 60,
+                                               rd.header.get("trackPath", ""), rd.numFrames,
+                                               precision) as wr:
+        for _, _, flat in rd.chunks():
+            wr.write_chunk(flat)
+    return json_path
+
+
+def _csv_layout(csv_path, first_col):
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        headers = next(reader)
+        num = sum(1 for row in reader if row)
+    # LiveLink 的 EyeBlinkLeft -> A2F 风格 eyeBlinkLeft
+    names = [name[0].lower() + name[1:] for name in headers[first_col:] if name]
+    return names, num
+
+
+def _csv_chunks(rows, first_col, width, chunk_frames=CHUNK_FRAMES):
+    flat, start, n = array("f"), 0, 0
+    for row in rows:
+        if not row:
+            continue
+        values = row[first_col:first_col + width]
+        if len(values) != width:
+            raise ValueError("CSV frame %d has %d values, expected %d" % (start + n, len(values), width))
+        flat.extend(map(float, values))
+        n += 1
+        if n == chunk_frames:
+            yield start, n, flat
+            flat, start, n = array("f"), start + n, 0
+    if n:
+        yield start, n, flat
+
+
+def csv_to_cache(csv_path, cache_path=None, exportFps=60, trackPath="", first_col=2):
+    """LiveLink iPhone CSV（Timecode, BlendShapeCount, 各 blendshape...）-> .a2fb"""
+    cache_path = cache_path or cache_path_for(csv_path)
+    names, num = _csv_layout(csv_path, first_col)
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)
+        return write_cache(cache_path, names, num, _csv_chunks(reader, first_col, len(names)),
+                           exportFps, trackPath, os.path.basename(csv_path))
+
+
+def csv_to_json(csv_path, json_path, exportFps=60, trackPath="", first_col=2):
+    names, num = _csv_layout(csv_path, first_col)
+    with open(csv_path, newline="", encoding="utf-8") as f, \
+            A2FWriter(json_path, names, exportFps, trackPath, num) as wr:
+        reader = csv.reader(f)
+        next(reader)
+        for _, _, flat in _csv_chunks(reader, first_col, len(names)):
+            wr.write_chunk(flat)
+    return json_path
+
+
+def cache_to_csv(cache_path, csv_path):
+    """写回 LiveLink 风格 CSV；Timecode 列写帧号（缓存不保存时间码）"""
+    with A2FCache(cache_path) as rd, open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        width = rd.numPoses
+        writer.writerow(["Timecode", "BlendShapeCount"] + [n[0].upper() + n[1:] for n in rd.facsNames])
+        for start, n, flat in rd.chunks():
+            writer.writerows([start + r, width] + ["%.6g" % v for v in flat[r * width:(r + 1) * width]]
+                             for r in range(n))
+    return csv_path
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""Put OpenMaya edits on Maya's undo queue.
+
+MDGModifier.doIt(), MFnSkinCluster.setWeights(), MFnAnimCurve edits ... are not
+recorded by Maya, so Ctrl+Z inside an undo chunk only reverts the cmds calls
+around them. commit(undo, redo) records an edit that has already been done as
+one jcqApiUndo command (this file is also the plug-in that defines it): Ctrl+Z
+calls undo(), redo calls redo(), in order with the rest of the chunk.
+
+    mod.doIt()
+    api_undo.commit(mod.undoIt, mod.doIt)
+
+The plug-in is loaded on first use. Maya loads plug-ins as a separate module,
+so the pending edit is handed over through the importable api_undo module.
+"""
+import os
+import sys
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om2
+
+COMMAND = "jcqApiUndo"
+_pending = []   # commit() -> ApiUndoCommand.doIt()
+
+
+def maya_useNewAPI():
+    """
+    The presence of this function tells Maya that the plugin produces, and
+    expects to be passed, objects created using the Maya Python API 2.0.
+    """
+    pass
+
+
+class ApiUndoCommand(om2.MPxCommand):
+    """接管一个已经做完的 API 编辑：undoIt / redoIt 调 commit 传进来的函数"""
+
+    def __init__(self):
+        super(ApiUndoCommand, self).__init__()
+        self.undo = None
+        self.redo = None
+
+    @staticmethod
+    def creator():
+        return ApiUndoCommand()
+
+    def doIt(self, args):
+        pending = sys.modules["api_undo"]._pending
+        if not pending:
+            raise RuntimeError("%s: nothing to record (use api_undo.commit)" % COMMAND)
+        self.undo, self.redo = pending.pop()
+
+    def undoIt(self):
+        self.undo()
+
+    def redoIt(self):
+        self.redo()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(obj):
+    pluginFn = om2.MFnPlugin(obj, "JCQ", "1.0", "Any")
+    pluginFn.registerCommand(COMMAND, ApiUndoCommand.creator)
+
+
+def uninitializePlugin(obj):
+    pluginFn = om2.MFnPlugin(obj)
+    pluginFn.deregisterCommand(COMMAND)
+
+
+def plugin_path():
+    return os.path.splitext(os.path.abspath(__file__))[0] + ".py"
+
+
+def ensure_loaded():
+    path = plugin_path()
+    if not cmds.pluginInfo(path, query=True, loaded=True):
+        cmds.loadPlugin(path, quiet=True)
+
+
+def commit(undo, redo):
+    """把已经执行过的 API 编辑登记到 undo 队列（可以在 undoInfo chunk 里）"""
+    ensure_loaded()
+    _pending.append((undo, redo))
+    try:
+        getattr(cmds, COMMAND)()
+    finally:
+        del _pending[:]
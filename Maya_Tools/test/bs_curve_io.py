@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+"""Bulk read / rebuild of blendShape weight anim curves for the BS animation JSON tools.
+
+The exporter used to run listConnections + keyframe x2 + keyTangent x6 per key of
+every target. Here the weight plugs are walked once through the API, and each
+curve is read key by key with MFnAnimCurve (no command parsing, no per-key
+keyTangent queries). The per-target lists keep the exporter's JSON keys.
+
+    import bs_curve_io
+    snap = bs_curve_io.snapshot_bs_curves("blendShape1", 0, 120)
+    snap["key_times_list"][i]      # array('d') for snap["blendshapeNames"][i]
+
+The importer goes the other way: rebuild_bs_curves() merges the JSON keys with
+what is on each curve (range clearing included), then writes each curve with one
+MFnAnimCurve.addKeys plus per-key tangent sets. The MDGModifier (new curves) and
+the MAnimCurveChange (key edits) are recorded with api_undo, so the import is one
+Ctrl+Z like the old cmds import; dry_run only returns the diff.
+"""
+import time
+from array import array
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+
+import api_undo
+
+# snapshot 字段（与 JSON 键名一致）；数值列为 array('d')，切线类型列为 str 列表
+NUMERIC_FIELDS = ("key_times_list", "key_values_list", "in_weights_list", "out_weights_list",
+                  "in_angles_list", "out_angles_list")
+TANGENT_FIELDS = ("in_tangents_list", "out_tangents_list")
+# 写回时每个 key 比较/写入的字段
+KEY_FIELDS = ("key_values_list", "in_tangents_list", "out_tangents_list", "in_angles_list",
+              "in_weights_list", "out_angles_list", "out_weights_list")
+
+
+def _tangent_names():
+    """MFnAnimCurve 切线枚举 -> keyTangent 使用的名字（旧版本没有的枚举跳过）"""
+    names = {}
+    for attr, name in (("kTangentFixed", "fixed"), ("kTangentLinear", "linear"),
+                       ("kTangentFlat", "flat"), ("kTangentSmooth", "spline"),
+                       ("kTangentStep", "step"), ("kTangentStepNext", "stepnext"),
+                       ("kTangentSlow", "slow"), ("kTangentFast", "fast"),
+                       ("kTangentClamped", "clamped"), ("kTangentPlateau", "plateau"),
+                       ("kTangentAuto", "auto"), ("kTangentAutoMix", "automix"),
+                       ("kTangentAutoEase", "autoease"), ("kTangentAutoCustom", "autocustom")):
+        if hasattr(oma2.MFnAnimCurve, attr):
+            names[getattr(oma2.MFnAnimCurve, attr)] = name
+    return names
+
+
+_TANGENT_NAMES = _tangent_names()
+_TANGENT_TYPES = dict((name, enum) for enum, name in _TANGENT_NAMES.items())
+
+
+def _weight_plugs(bs_node):
+    sel = om2.MSelectionList()
+    sel.add(bs_node)
+    fn = om2.MFnDependencyNode(sel.getDependNode(0))
+    weights = fn.findPlug("weight", False)
+    result = []
+    for i in range(weights.numElements()):
+        plug = weights.elementByPhysicalIndex(i)
+        name = plug.partialName(useAlias=True, useLongNames=True)
+        src = plug.source()
+        curve = src.node() if not src.isNull and src.node().hasFn(om2.MFn.kAnimCurve) else None
+        result.append((name, plug, curve))
+    return result
+
+
+def weight_curves(bs_node):
+    """一次遍历 blendShape.weight：[(target 名, animCurve MObject 或 None)]，顺序同 listAttr(bs.w, m=True)"""
+    return [(name, curve) for name, _, curve in _weight_plugs(bs_node)]
+
+
+def read_curve(curve_obj, start=None, end=None):
+    """读一条曲线 [start, end] 内的关键帧；返回 {字段: 列}（字段见 NUMERIC_FIELDS / TANGENT_FIELDS）"""
+    fn = oma2.MFnAnimCurve(curve_obj)
+    time_unit = om2.MTime.uiUnit()
+    angle_unit = om2.MAngle.uiUnit()
+    out = dict((k, array("d")) for k in NUMERIC_FIELDS)
+    out.update((k, []) for k in TANGENT_FIELDS)
+    curve_name = None
+    for i in range(fn.numKeys):
+        t = fn.input(i).asUnits(time_unit)
+        if (start is not None and t < start - 1e-6) or (end is not None and t > end + 1e-6):
+            continue
+        out["key_times_list"].append(t)
+        out["key_values_list"].append(fn.value(i))
+        for side, is_in in (("in", True), ("out", False)):
+            angle, weight = fn.getTangentAngleWeight(i, is_in)
+            out[side + "_angles_list"].append(angle.asUnits(angle_unit))
+            out[side + "_weights_list"].append(weight)
+            tangent = (fn.inTangentType if is_in else fn.outTangentType)(i)
+            name = _TANGENT_NAMES.get(tangent)
+            if name is None:
+                # 未知枚举（global 等）回退到命令查询，保证写回时 keyTangent 认得
+                curve_name = curve_name or fn.name()
+                flag = {"inTangentType": True} if is_in else {"outTangentType": True}
+                name = cmds.keyTangent(curve_name, q=True, index=(i, i), **flag)[0]
+            out[side + "_tangents_list"].append(name)
+    return out
+
+
+def snapshot_bs_curves(bs_node, start=None, end=None, skip_empty=False):
+    """所有 weight 曲线一次读出。返回 {"blendshapeNames": [...], 各字段: [每个 target 一列]}
+    只包含有曲线的 target（与旧导出一致）；skip_empty=True 时范围内无 key 的也跳过。"""
+    snap = {"blendshapeNames": []}
+    for field in NUMERIC_FIELDS + TANGENT_FIELDS:
+        snap[field] = []
+    for name, curve in weight_curves(bs_node):
+        if curve is None:
+            continue
+        data = read_curve(curve, start, end)
+        if skip_empty and not data["key_times_list"]:
+            continue
+        snap["blendshapeNames"].append(name)
+        for field, column in data.items():
+            snap[field].append(column)
+    return snap
+
+
+def snapshot_to_json(snap):
+    """array 列转成 list，供 json.dump"""
+    return dict((k, [list(c) for c in v] if k in NUMERIC_FIELDS else v) for k, v in snap.items())
+
+
+# ---------------------------------------------------------------------------
+# rebuild (importer)
+# ---------------------------------------------------------------------------
+def _keys_of(data, i=None):
+    """{time: (value, itt, ott, in_angle, in_weight, out_angle, out_weight)}"""
+    cols = [data[f] if i is None else data[f][i] for f in KEY_FIELDS]
+    times = data["key_times_list"] if i is None else data["key_times_list"][i]
+    return dict((round(float(t), 6), tuple(c[j] for c in cols)) for j, t in enumerate(times))
+
+
+def _same_key(a, b, tol=1e-4):
+    return all(x == y if isinstance(x, str) else abs(float(x) - float(y)) <= tol for x, y in zip(a, b))
+
+
+def _in_range(t, clear_range):
+    start, end = clear_range
+    return t >= start - 1e-6 and (end is None or t <= end + 1e-6)
+
+
+def diff_keys(existing, incoming, clear_range=None):
+    """existing / incoming: _keys_of 的结果。返回 added / changed / removed / unchanged 计数"""
+    stats = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+    for t, key in incoming.items():
+        if t not in existing:
+            stats["added"] += 1
+        elif _same_key(existing[t], key):
+            stats["unchanged"] += 1
+        else:
+            stats["changed"] += 1
+    if clear_range is not None:
+        stats["removed"] = sum(1 for t in existing if t not in incoming and _in_range(t, clear_range))
+    return stats
+
+
+def _write_keys(fn, incoming, remove_times, change):
+    time_unit = om2.MTime.uiUnit()
+    angle_unit = om2.MAngle.uiUnit()
+    # 先删掉要替换 / 清除的 key（倒序，索引不乱）
+    for i in range(fn.numKeys - 1, -1, -1):
+        if round(fn.input(i).asUnits(time_unit), 6) in remove_times:
+            fn.remove(i, change)
+    times = sorted(incoming)
+    if not times:
+        return
+    fn.addKeys(om2.MTimeArray([om2.MTime(t, time_unit) for t in times]),
+               om2.MDoubleArray([incoming[t][0] for t in times]),
+               oma2.MFnAnimCurve.kTangentAuto, oma2.MFnAnimCurve.kTangentAuto,
+               True, change)
+    auto = oma2.MFnAnimCurve.kTangentAuto
+    for t in times:
+        _, itt, ott, ia, iw, oa, ow = incoming[t]
+        i = fn.find(om2.MTime(t, time_unit))
+        if i is None:
+            continue
+        # 与旧导入顺序一致：先角度/权重，再切线类型
+        fn.setTangent(i, om2.MAngle(ia, angle_unit), iw, True, change)
+        fn.setTangent(i, om2.MAngle(oa, angle_unit), ow, False, change)
+        fn.setInTangentType(i, _TANGENT_TYPES.get(itt, auto), change)
+        fn.setOutTangentType(i, _TANGENT_TYPES.get(ott, auto), change)
+
+
+def rebuild_bs_curves(bs_node, snap, clear_range=None, dry_run=False):
+    """把 snapshot（导出 JSON）写回 bs_node 的 weight 曲线。
+
+    clear_range=(start, end or None)：范围内的已有 key 先清掉（原 cutKey）；None 时只替换同一时间的 key。
+    dry_run=True 只统计差异，不改场景；否则整个重建是 Maya 撤销队列里的一步。
+    返回 {"diff": {target: stats}, "missing": [...], "seconds"}"""
+    t0 = time.perf_counter()
+    targets = dict((name, (plug, curve)) for name, plug, curve in _weight_plugs(bs_node))
+    jobs, missing = [], []
+    for i, name in enumerate(snap["blendshapeNames"]):
+        if name not in targets:
+            missing.append(name)
+            continue
+        plug, curve = targets[name]
+        existing = _keys_of(read_curve(curve)) if curve is not None else {}
+        incoming = _keys_of(snap, i)
+        jobs.append((name, plug, curve, existing, incoming))
+
+    result = {"diff": {}, "missing": missing, "seconds": 0.0}
+    for name, _, _, existing, incoming in jobs:
+        result["diff"][name] = diff_keys(existing, incoming, clear_range)
+    if dry_run:
+        result["seconds"] = time.perf_counter() - t0
+        return result
+
+    # 新曲线一次性建好（名字沿用旧导入：<bs>_<target>_animCurve）
+    mod = om2.MDGModifier()
+    fns = {}
+    for name, plug, curve, _, _ in jobs:
+        fn = oma2.MFnAnimCurve()
+        if curve is None:
+            obj = fn.create(plug, oma2.MFnAnimCurve.kAnimCurveTU, mod)
+            mod.renameNode(obj, "%s_%s_animCurve" % (bs_node.split("|")[-1].split(":")[-1], name))
+        else:
+            fn.setObject(curve)
+        fns[name] = fn
+    change = oma2.MAnimCurveChange()
+
+    def undo():
+        change.undoIt()
+        mod.undoIt()
+
+    def redo():
+        mod.doIt()
+        change.redoIt()
+
+    try:
+        mod.doIt()
+        for name, _, _, existing, incoming in jobs:
+            remove = set(t for t in existing if t in incoming or
+                         (clear_range is not None and _in_range(t, clear_range)))
+            _write_keys(fns[name], incoming, remove, change)
+    except Exception:
+        undo()  # 写到一半失败：已改的 key 和新建的曲线都撤掉
+        raise
+    api_undo.commit(undo, redo)
+    result["seconds"] = time.perf_counter() - t0
+    return result
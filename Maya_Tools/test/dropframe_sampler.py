@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""Playhead-free sampling and bulk layer write for the Drop Frame tools
+(DropFrameTool2.DropFrameTool and RomeoTool.add_dropframe_tab).
+
+Recording used to move the playhead to every step frame (the whole scene
+re-evaluates each time) and re-resolve plugs / anim curves per object x attr x
+frame. ChannelSampler resolves every channel once, then:
+
+- channel driven straight by an anim curve -> MFnAnimCurve.evaluate(t)
+- anything else (anim layers, constraints...) -> plug evaluated under an
+  MDGContext for t; the current time never changes
+
+Values come back in UI units (same as cmds.getAttr), ready for setKeyframe /
+.ktv. write_layer_curves() then writes each channel's held intervals to the layer
+as stepped keys (one per interval) with one bulk write per curve (a2f_curve_writer).
+
+    sampler = dropframe_sampler.ChannelSampler(objs, dropframe_sampler.trs_attrs(True, True, False))
+    values = sampler.sample(frames)          # one array('d') per sampler.channels entry
+    mask = sampler.keyed_mask(frames)        # one bytearray per channel: base curve keyed there
+"""
+import time
+from array import array
+
+import maya.cmds as cmds
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+
+import a2f_curve_writer
+
+T_ATTRS = ("translateX", "translateY", "translateZ")
+R_ATTRS = ("rotateX", "rotateY", "rotateZ")
+S_ATTRS = ("scaleX", "scaleY", "scaleZ")
+
+_MAX_BLEND_DEPTH = 32
+
+
+def trs_attrs(use_t, use_r, use_s):
+    return (T_ATTRS if use_t else ()) + (R_ATTRS if use_r else ()) + (S_ATTRS if use_s else ())
+
+
+def step_frames(start, end, n):
+    """start, start+n, ... 以及 end（与旧工具一致：最后一段不足 n 时补 end）"""
+    frames = list(range(int(start), int(end) + 1, int(n)))
+    if frames and frames[-1] < end:
+        frames.append(end)
+    return frames
+
+
+def _child_index(plug):
+    parent = plug.parent()
+    for i in range(parent.numChildren()):
+        if parent.child(i) == plug:
+            return i
+    return -1
+
+
+def base_curve(plug):
+    """驱动 plug 的 BaseAnimation 曲线：(MFnAnimCurve 或 None, 是否直连)。
+    动画层下沿 animBlendNode*.inputA 往上找。"""
+    src = plug.source()
+    for depth in range(_MAX_BLEND_DEPTH):
+        if src.isNull:
+            return None, False
+        node = src.node()
+        if node.hasFn(om2.MFn.kAnimCurve):
+            return oma2.MFnAnimCurve(node), depth == 0
+        fn = om2.MFnDependencyNode(node)
+        if not fn.typeName.startswith("animBlendNode"):
+            return None, False
+        input_a = fn.findPlug("inputA", False)
+        if input_a.isCompound:
+            if not src.isChild:
+                return None, False
+            input_a = input_a.child(_child_index(src))
+        src = input_a.source()
+    return None, False
+
+
+def _unit_scale(plug):
+    """内部单位 -> UI 单位的比例（旋转: 弧度 -> 度，位移: cm -> 当前单位；其它 1.0）"""
+    attr = plug.attribute()
+    if attr.hasFn(om2.MFn.kUnitAttribute):
+        unit_type = om2.MFnUnitAttribute(attr).unitType()
+        if unit_type == om2.MFnUnitAttribute.kAngle:
+            return om2.MAngle(1.0).asUnits(om2.MAngle.uiUnit())
+        if unit_type == om2.MFnUnitAttribute.kDistance:
+            return om2.MDistance(1.0).asUnits(om2.MDistance.uiUnit())
+    return 1.0
+
+
+def _eval_plugs_at(plugs, mtime):
+    ctx = om2.MDGContext(mtime)
+    if hasattr(om2, "MDGContextGuard"):
+        with om2.MDGContextGuard(ctx):
+            return [p.asDouble() for p in plugs]
+    return [p.asDouble(ctx) for p in plugs]
+
+
+class ChannelSampler(object):
+    """Resolve (object, attr) channels once; sample them at arbitrary frames.
+
+    Resolution fills compact per-channel tables (curve handle, plug, unit scale,
+    direct / context index arrays); sample() and keyed_mask() only evaluate."""
+
+    def __init__(self, objs, attrs):
+        t0 = time.perf_counter()
+        # channels: [(obj, attr)]，下面各表与其同序
+        self.channels = []
+        self.missing = []
+        self._plugs = []
+        self._curves = []                 # MFnAnimCurve 或 None（BaseAnimation 曲线）
+        self._scale = array("d")          # 内部单位 -> UI 单位
+        self._direct = array("i")         # 直连曲线的通道：evaluate
+        self._context = array("i")        # 其余通道：MDGContext 求值
+        sel = om2.MSelectionList()
+        nodes = []
+        for obj in objs:
+            sel.clear()
+            try:
+                sel.add(obj)
+                nodes.append((obj, sel.getDependNode(0)))
+            except RuntimeError:
+                self.missing.append(obj)
+        for obj, node in nodes:
+            fn = om2.MFnDependencyNode(node)
+            for attr in attrs:
+                try:
+                    plug = fn.findPlug(attr, False)
+                except RuntimeError:
+                    continue
+                curve, direct = base_curve(plug)
+                (self._direct if direct else self._context).append(len(self.channels))
+                self.channels.append((obj, attr))
+                self._plugs.append(plug)
+                self._curves.append(curve)
+                self._scale.append(_unit_scale(plug))
+        self.timings = {"resolve": time.perf_counter() - t0}
+
+    def __len__(self):
+        return len(self.channels)
+
+    def objects(self):
+        return list(dict.fromkeys(obj for obj, _ in self.channels))
+
+    @staticmethod
+    def _mtimes(frames):
+        unit = om2.MTime.uiUnit()
+        return [om2.MTime(f, unit) for f in frames]
+
+    def sample(self, frames):
+        """每个通道一列 array('d')（UI 单位），与 frames 对齐"""
+        t0 = time.perf_counter()
+        mtimes = self._mtimes(frames)
+        out = [None] * len(self.channels)
+        for ci in self._direct:
+            out[ci] = array("d", map(self._curves[ci].evaluate, mtimes))
+        if self._context:
+            cols = [array("d") for _ in self._context]
+            plugs = [self._plugs[ci] for ci in self._context]
+            for t in mtimes:
+                for col, v in zip(cols, _eval_plugs_at(plugs, t)):
+                    col.append(v)
+            for ci, col in zip(self._context, cols):
+                out[ci] = col
+        for ci, k in enumerate(self._scale):
+            if k != 1.0:
+                out[ci] = array("d", [v * k for v in out[ci]])
+        self.timings["sample"] = time.perf_counter() - t0
+        return out
+
+    def keyed_mask(self, frames):
+        """每个通道一个 bytearray：BaseAnimation 曲线在该帧有 key 为 1（旧 isKeyframe 判断）"""
+        t0 = time.perf_counter()
+        mtimes = self._mtimes(frames)
+        masks = []
+        for curve in self._curves:
+            if curve is None:
+                masks.append(bytearray(len(frames)))
+            else:
+                find = curve.find
+                masks.append(bytearray(find(t) is not None for t in mtimes))
+        self.timings["key mask"] = time.perf_counter() - t0
+        return masks
+
+    def has_keys_in(self, ci, start, end):
+        """BaseAnimation 曲线在 [start, end] 内有 key；找不到曲线时回退 cmds.keyframe"""
+        curve = self._curves[ci]
+        if curve is None:
+            return bool(cmds.keyframe("%s.%s" % self.channels[ci], q=True, time=(start, end)))
+        if not curve.numKeys:
+            return False
+        unit = om2.MTime.uiUnit()
+        i = curve.findClosest(om2.MTime(start, unit))
+        for j in (i, i + 1):
+            if j < curve.numKeys and start - 1e-6 <= curve.input(j).asUnits(unit) <= end + 1e-6:
+                return True
+        return False
+
+
+def stepped_keys(intervals):
+    """[(start, end, value)]（end 含）-> (times, values, release_times)
+
+    每段只在起点放一个 out-tangent 为 step 的 key，整数帧上与逐帧写入完全一致。
+    段后有空档或是最后一段时，在段尾（单帧段就是起点本身）放普通 key，
+    空档里的插值与旧的逐帧写入相同；这些时间在 release_times 里。
+    与下一段重叠时由下一段覆盖（与逐帧写入的先后顺序一致）。"""
+    ivs = sorted(intervals)
+    times, values, release = [], [], []
+    for i, (f0, f1, v) in enumerate(ivs):
+        nxt = ivs[i + 1][0] if i + 1 < len(ivs) else None
+        if nxt is not None and nxt <= f1:
+            f1 = nxt - 1
+        if f1 < f0:
+            continue
+        times.append(f0)
+        values.append(v)
+        if nxt is None or nxt > f1 + 1:
+            if f1 > f0:
+                times.append(f1)
+                values.append(v)
+            release.append(f1)
+    return times, values, release
+
+
+def write_layer_curves(jobs, layer, verbose=True):
+    """jobs: [(plug, [(start, end, value)])]，每条曲线一次写进动画层（stepped_keys），
+    锁定属性每通道只查一次。
+    返回 {"curves", "keys", "dense_keys", "skipped": [plug], "failed": [(plug, e)], "seconds"}"""
+    result = {"curves": 0, "keys": 0, "dense_keys": 0, "skipped": [], "failed": [], "seconds": 0.0}
+    t0 = time.perf_counter()
+    cmds.undoInfo(openChunk=True, chunkName="dropframe_write")
+    cmds.refresh(suspend=True)
+    try:
+        for plug, intervals in jobs:
+            times, values, release = stepped_keys(intervals)
+            if not times:
+                continue
+            try:
+                if cmds.getAttr(plug, lock=True):
+                    result["skipped"].append(plug)
+                    continue
+                curve = a2f_curve_writer.write_curve(plug, times, values, itt="auto", ott="step", layer=layer)
+                if release:
+                    cmds.keyTangent(curve, e=True, time=[(t, t) for t in release], ott="auto")
+                result["curves"] += 1
+                result["keys"] += len(times)
+                result["dense_keys"] += sum(f1 - f0 + 1 for f0, f1, _ in intervals)
+            except Exception as e:
+                result["failed"].append((plug, e))
+    finally:
+        cmds.refresh(suspend=False)
+        cmds.undoInfo(closeChunk=True)
+    result["seconds"] = time.perf_counter() - t0
+    if verbose:
+        for plug in result["skipped"]:
+            cmds.warning("Skipping locked attribute: %s" % plug)
+        for plug, e in result["failed"]:
+            print(u"[dropframe] 写入失败: %s : %s" % (plug, e))
+        print(u"[dropframe] curves=%d keys=%d (逐帧需要 %d)  %.3fs"
+              % (result["curves"], result["keys"], result["dense_keys"], result["seconds"]))
+    return result
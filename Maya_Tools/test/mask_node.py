@@ -13,13 +13,16 @@
 ###############################################################################
 __version__ = "1.0.2"
 import getpass
+import os
 import time
 
+_LOAD_START = time.perf_counter()  # 插件加载计时（模块导入 + initializePlugin）
+
 import maya.api.OpenMaya as om
+import maya.api.OpenMayaAnim as oma
 import maya.api.OpenMayaRender as omr
 import maya.api.OpenMayaUI as omui
 import maya.cmds as cmds
-import pymel.core as pm
 
 LABEL_ATTRS = [("topLeftLabel", "tll"),
                ("topCenterLabel", "tcl"),
@@ -37,6 +40,11 @@ DATA_ATTRS = [("topLeftData", "tld"),
               ("bottomRightData", "brd"),
               ("centerData", "cd")]
 
+# cameraMode：Any 为旧行为（camera 里任一摄像机存在就在所有视图显示），
+# List 只在 camera 列出的摄像机里显示，All 所有摄像机都显示
+CAMERA_MODES = ["Any", "List", "All"]
+CAMERA_MODE_ANY, CAMERA_MODE_LIST, CAMERA_MODE_ALL = range(len(CAMERA_MODES))
+
 DATA_ITEMS = [
     (u'无', 'None'),
     (u'摄像机名称', 'Camera'),
@@ -54,6 +62,123 @@ DATA_ITEMS = [
 ]
 
 
+class ZShotMaskFieldCache(object):
+    """
+    HUD 字段缓存（所有 mask_node 共用）。
+
+    静态字段（用户名、日期、文件名、帧范围）只在场景/播放范围变化的回调里失效，
+    绘制时直接取缓存；帧相关字段（当前帧）按 (帧, 摄像机) 每帧只算一次。
+    摄像机名/焦距字段不缓存：停在同一帧改焦距或改名也要马上刷新，每次只是一次 MFnCamera 读取。
+    绘制路径只用 OpenMaya：defaultResolution 的 MPlug 和场景摄像机名集合都缓存，
+    摄像机增删/改名的回调里失效。
+    """
+
+    STATIC_FIELDS = {
+        'FileName': lambda: os.path.basename(
+            cmds.file(q=True, sceneName=True)).rsplit('.', 1)[0],
+        'FrameRange': lambda: '{:.0f}/{:.0f}'.format(
+            oma.MAnimControl.animationStartTime().value,
+            oma.MAnimControl.animationEndTime().value),
+        'EndFrame': lambda: oma.MAnimControl.animationEndTime().value,
+        'Date': lambda: time.strftime("%Y/%m/%d", time.localtime()),
+        'User': lambda: getpass.getuser(),
+    }
+    NODE_FIELDS = ('None', 'TaskType', 'AssetVersion')  # 每个节点自己的属性，不进帧缓存
+    CAMERA_FIELDS = ('Camera', 'Camera int', 'focal length + CurFrame',
+                     'focal length + CurFrame (int)')  # 每次绘制直接读摄像机
+    SCENE_MESSAGES = ("kAfterNew", "kAfterOpen", "kAfterSave", "kAfterImport",
+                      "kAfterReference", "kAfterRemoveReference")
+    OPTION_EVENTS = ("playbackRangeChanged", "playbackRangeSliderChanged",
+                     "timeUnitChanged")
+    DATE_TIMEOUT = 60.0  # 日期跨天没有回调，超时后重算
+
+    def __init__(self):
+        self.static = {}
+        self.date_time = 0.0
+        self.frame = None
+        self.frame_values = {}
+        self.resolution_plug = None
+        self.cameras = None
+        self.callback_ids = []
+        self.stats = {"draws": 0, "seconds": 0.0, "ui_seconds": 0.0,
+                      "load_seconds": 0.0}
+
+    def invalidate(self, *args):
+        self.static.clear()
+        self.frame = None
+        self.frame_values = {}
+        self.resolution_plug = None
+        self.cameras = None
+
+    def invalidate_cameras(self, *args):
+        self.cameras = None
+
+    def device_aspect_ratio(self):
+        if self.resolution_plug is None:
+            sel = om.MSelectionList()
+            sel.add("defaultResolution")
+            self.resolution_plug = om.MFnDependencyNode(
+                sel.getDependNode(0)).findPlug("deviceAspectRatio", False)
+        return self.resolution_plug.asFloat()
+
+    def camera_names(self):
+        """场景里所有摄像机 transform 的短名和全路径（代替 listCameras）"""
+        if self.cameras is None:
+            names = set()
+            it = om.MItDag(om.MItDag.kDepthFirst, om.MFn.kCamera)
+            while not it.isDone():
+                path = it.getPath()
+                path.pop()
+                names.add(path.partialPathName())
+                names.add(path.fullPathName())
+                it.next()
+            self.cameras = names
+        return self.cameras
+
+    def static_value(self, key):
+        if key == 'Date' and time.time() - self.date_time > self.DATE_TIMEOUT:
+            self.static.pop('Date', None)
+        if key not in self.static:
+            self.static[key] = self.STATIC_FIELDS[key]()
+            if key == 'Date':
+                self.date_time = time.time()
+        return self.static[key]
+
+    def frame_memo(self, frame, camera_path):
+        """当前帧下该摄像机的字段表；多视图同一帧各摄像机各一张，换帧全部清掉"""
+        if frame != self.frame:
+            self.frame = frame
+            self.frame_values = {}
+        return self.frame_values.setdefault(camera_path.fullPathName(), {})
+
+    def register_callbacks(self):
+        self.remove_callbacks()
+        for name in self.SCENE_MESSAGES:
+            if hasattr(om.MSceneMessage, name):
+                self.callback_ids.append(om.MSceneMessage.addCallback(
+                    getattr(om.MSceneMessage, name), self.invalidate))
+        for event in self.OPTION_EVENTS:
+            try:
+                self.callback_ids.append(
+                    om.MEventMessage.addEventCallback(event, self.invalidate))
+            except RuntimeError:
+                pass  # 旧版本没有的事件
+        self.callback_ids.append(om.MDGMessage.addNodeAddedCallback(
+            self.invalidate_cameras, "camera"))
+        self.callback_ids.append(om.MDGMessage.addNodeRemovedCallback(
+            self.invalidate_cameras, "camera"))
+        self.callback_ids.append(om.MNodeMessage.addNameChangedCallback(
+            om.MObject.kNullObj, self.invalidate_cameras))
+
+    def remove_callbacks(self):
+        if self.callback_ids:
+            om.MMessage.removeCallbacks(self.callback_ids)
+            self.callback_ids = []
+
+
+FIELD_CACHE = ZShotMaskFieldCache()
+
+
 def maya_useNewAPI():
     """
     The presence of this function tells Maya that the plugin produces, and
@@ -89,6 +214,14 @@ class ZShotMaskLocator(omui.MPxLocatorNode):
         attr.keyable = False
         ZShotMaskLocator.addAttribute(camera_name)
 
+        attr = om.MFnEnumAttribute()
+        camera_mode = attr.create("cameraMode", "cmd", CAMERA_MODE_ANY)
+        for m, mode_name in enumerate(CAMERA_MODES):
+            attr.addField(mode_name, m)
+        attr.storable = True
+        attr.keyable = False
+        ZShotMaskLocator.addAttribute(camera_mode)
+
         for i, attr in enumerate(LABEL_ATTRS, 1):
             attr_long_name, attr_short_name = attr
             attr = om.MFnTypedAttribute()
@@ -248,6 +381,8 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
     def __init__(self, obj):
         super(ZShotMaskDrawOverride, self
               ).__init__(obj, ZShotMaskDrawOverride.draw)
+        self.hud_command_map = None
+        self.layouts = {}  # 摄像机全路径 -> (signature, layout)
 
     def supportedDrawAPIs(self):
         return (omr.MRenderer.kAllDevices)
@@ -259,16 +394,24 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
         return om.MBoundingBox()
 
     def prepareForDraw(self, obj_path, camera_path, frame_context, data):
+        start = time.perf_counter()
         if not isinstance(data, ZShotMaskData):
             data = ZShotMaskData()
 
         fnDagNode = om.MFnDagNode(obj_path)
 
         data.camera_name = fnDagNode.findPlug("camera", False).asString()
+        data.camera_list = self.parse_camera_list(data.camera_name)
+        data.camera_mode = fnDagNode.findPlug("cameraMode", False).asInt()
 
         data.text_fields = []
-        # 节点显示文字
-        hud_command_map = self.get_data(fnDagNode)
+        data.visible = self.camera_visible(camera_path, data)
+        if not data.visible:
+            return data
+
+        # 节点显示文字：静态字段取缓存，摄像机字段直接读，帧相关字段每帧只算一次
+        memo = FIELD_CACHE.frame_memo(
+            oma.MAnimControl.currentTime().value, camera_path)
 
         for i in range(len(LABEL_ATTRS)):
             label_attr = LABEL_ATTRS[i][0]
@@ -277,7 +420,7 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
             label = fnDagNode.findPlug(label_attr, False).asString()
             data_index = fnDagNode.findPlug(data_attr, False).asInt()
             key = DATA_ITEMS[data_index][1]
-            value = str(hud_command_map[key]())
+            value = self.field_value(key, fnDagNode, memo, camera_path)
 
             data.text_fields.append('{}{}'.format(label, value))
 
@@ -312,6 +455,8 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
         data.top_border = fnDagNode.findPlug("topBorder", False).asBool()
         data.bottom_border = fnDagNode.findPlug("bottomBorder", False).asBool()
 
+        FIELD_CACHE.stats["draws"] += 1
+        FIELD_CACHE.stats["seconds"] += time.perf_counter() - start
         return data
 
     def hasUIDrawables(self):
@@ -320,29 +465,89 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
     def addUIDrawables(self, obj_path, draw_manager, frame_context, data):
         if not isinstance(data, ZShotMaskData):
             return
-
+        start = time.perf_counter()
+        try:
+            self.draw_mask(draw_manager, frame_context, data)
+        finally:
+            FIELD_CACHE.stats["ui_seconds"] += time.perf_counter() - start
+
+    def draw_mask(self, draw_manager, frame_context, data):
+        if not data.visible:
+            return
         camera_path = frame_context.getCurrentCameraPath()
-        camera = om.MFnCamera(camera_path)
-        if not data.camera_name or not self.camera_exists(data.camera_name):
+        layout = self.camera_layout(camera_path, frame_context, data)
+        if layout is None:
             return
+        background_size = layout["background_size"]
 
-        camera_aspect_ratio = camera.aspectRatio()
-        device_aspect_ratio = pm.getAttr("defaultResolution.deviceAspectRatio")
+        draw_manager.beginDrawable()
+        draw_manager.setFontName(data.font_name)
+        draw_manager.setFontSize(layout["font_size"])
+        draw_manager.setColor(data.font_color)
 
+        if data.top_border:
+            self.draw_border(draw_manager, layout["top_border"],
+                             background_size, data.border_color)
+        if data.bottom_border:
+            self.draw_border(draw_manager, layout["bottom_border"],
+                             background_size, data.border_color)
+
+        for (position, alignment), text in zip(layout["text"], data.text_fields):
+            self.draw_text(draw_manager, position, text, alignment,
+                           background_size, color=data.border_color)
+
+        # Draw Error Asset Name
+        draw_manager.setColor(data.fontErrorColor)
+        draw_manager.setFontSize(layout["error_font_size"])
+        error_text_lst = data.text_fields[6].split(';')
+        if error_text_lst:
+            origin_x, origin_y = layout["error_origin"]
+            for index, error_text in enumerate(error_text_lst):
+                self.draw_text(draw_manager,
+                               om.MPoint(origin_x,
+                                         origin_y - index * layout["error_step"]),
+                               error_text,
+                               omr.MUIDrawManager.kLeft,
+                               background_size)
+
+        draw_manager.endDrawable()
+
+    def camera_layout(self, camera_path, frame_context, data):
+        """
+        每个摄像机缓存一份遮罩布局（遮罩框、边框高度、字号、文字位置）。
+        视口大小、摄像机 film fit / overscan / 宽高比、分辨率或遮罩缩放参数变了才重算。
+        """
+        camera = om.MFnCamera(camera_path)
         vp_x, vp_y, vp_width, vp_height = frame_context.getViewportDimensions()
+        signature = (vp_width, vp_height, camera.filmFit, camera.overscan,
+                     camera.aspectRatio(), FIELD_CACHE.device_aspect_ratio(),
+                     data.border_scale, data.font_scale, data.text_padding)
+        key = camera_path.fullPathName()
+        cached = self.layouts.get(key)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        layout = self.compute_layout(signature)
+        self.layouts[key] = (signature, layout)
+        return layout
+
+    @staticmethod
+    def compute_layout(signature):
+        (vp_width, vp_height, film_fit, overscan, camera_aspect_ratio,
+         device_aspect_ratio, border_scale, font_scale, text_padding) = signature
+
         vp_half_width = 0.5 * vp_width
         vp_half_height = 0.5 * vp_height
         vp_aspect_ratio = vp_width / float(vp_height)
 
         scale = 1
 
-        if camera.filmFit == om.MFnCamera.kHorizontalFilmFit:
-            mask_width = vp_width / camera.overscan
+        if film_fit == om.MFnCamera.kHorizontalFilmFit:
+            mask_width = vp_width / overscan
             mask_height = mask_width / device_aspect_ratio
-        elif camera.filmFit == om.MFnCamera.kVerticalFilmFit:
-            mask_height = vp_height / camera.overscan
+        elif film_fit == om.MFnCamera.kVerticalFilmFit:
+            mask_height = vp_height / overscan
             mask_width = mask_height * device_aspect_ratio
-        elif camera.filmFit == om.MFnCamera.kFillFilmFit:
+        elif film_fit == om.MFnCamera.kFillFilmFit:
             if vp_aspect_ratio < camera_aspect_ratio:
                 if camera_aspect_ratio < device_aspect_ratio:
                     scale = camera_aspect_ratio / vp_aspect_ratio
@@ -351,10 +556,10 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
             elif camera_aspect_ratio > device_aspect_ratio:
                 scale = device_aspect_ratio / camera_aspect_ratio
 
-            mask_width = vp_width / camera.overscan * scale
+            mask_width = vp_width / overscan * scale
             mask_height = mask_width / device_aspect_ratio
 
-        elif camera.filmFit == om.MFnCamera.kOverscanFilmFit:
+        elif film_fit == om.MFnCamera.kOverscanFilmFit:
             if vp_aspect_ratio < camera_aspect_ratio:
                 if camera_aspect_ratio < device_aspect_ratio:
                     scale = camera_aspect_ratio / vp_aspect_ratio
@@ -363,11 +568,11 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
             elif camera_aspect_ratio > device_aspect_ratio:
                 scale = device_aspect_ratio / camera_aspect_ratio
 
-            mask_height = vp_height / camera.overscan / scale
+            mask_height = vp_height / overscan / scale
             mask_width = mask_height * device_aspect_ratio
         else:
             om.MGlobal.displayError("[ZShotMask] Unknown Film Fit value")
-            return
+            return None
 
         mask_half_width = 0.5 * mask_width
         mask_x = vp_half_width - mask_half_width
@@ -376,66 +581,28 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
         mask_bottom_y = vp_half_height - mask_half_height
         mask_top_y = vp_half_height + mask_half_height
 
-        border_height = int(0.05 * mask_height * data.border_scale)
-        background_size = (int(mask_width), border_height)
-
-        draw_manager.beginDrawable()
-        draw_manager.setFontName(data.font_name)
-        draw_manager.setFontSize(
-            int((border_height - border_height * 0.15) * data.font_scale))
-        draw_manager.setColor(data.font_color)
-
-        if data.top_border:
-            self.draw_border(draw_manager,
-                             om.MPoint(mask_x, mask_top_y - border_height),
-                             background_size, data.border_color)
-        if data.bottom_border:
-            self.draw_border(draw_manager, om.MPoint(mask_x, mask_bottom_y),
-                             background_size, data.border_color)
-
-        self.draw_text(draw_manager, om.MPoint(mask_x + data.text_padding,
-                                               mask_top_y - border_height),
-                       data.text_fields[0], omr.MUIDrawManager.kLeft,
-                       background_size,color=data.border_color)
-        self.draw_text(draw_manager,
-                       om.MPoint(vp_half_width, mask_top_y - border_height),
-                       data.text_fields[1], omr.MUIDrawManager.kCenter,
-                       background_size,color=data.border_color)
-        self.draw_text(draw_manager,
-                       om.MPoint(mask_x + mask_width - data.text_padding,
-                                 mask_top_y - border_height),
-                       data.text_fields[2], omr.MUIDrawManager.kRight,
-                       background_size,color=data.border_color)
-        self.draw_text(draw_manager,
-                       om.MPoint(mask_x + data.text_padding, mask_bottom_y),
-                       data.text_fields[3], omr.MUIDrawManager.kLeft,
-                       background_size,color=data.border_color)
-        self.draw_text(draw_manager, om.MPoint(vp_half_width, mask_bottom_y),
-                       data.text_fields[4], omr.MUIDrawManager.kCenter,
-                       background_size,color=data.border_color)
-        self.draw_text(draw_manager,
-                       om.MPoint(mask_x + mask_width - data.text_padding,
-                                 mask_bottom_y), data.text_fields[5],
-                       omr.MUIDrawManager.kRight, background_size,color=data.border_color)
-
-        # Draw Error Asset Name
-        draw_manager.setColor(data.fontErrorColor)
-        draw_manager.setFontSize(
-            int((border_height - border_height * 0.15) * data.font_scale *
-                0.5))
-        error_text_lst = data.text_fields[6].split(';')
-        if error_text_lst:
-            for index, error_text in enumerate(error_text_lst):
-                self.draw_text(draw_manager,
-                               om.MPoint(mask_x + data.text_padding,
-                                         mask_top_y -
-                                         border_height * 2 - index *
-                                         border_height * 0.8),
-                               error_text,
-                               omr.MUIDrawManager.kLeft,
-                               background_size)
-
-        draw_manager.endDrawable()
+        border_height = int(0.05 * mask_height * border_scale)
+        top_y = mask_top_y - border_height
+        left = mask_x + text_padding
+        right = mask_x + mask_width - text_padding
+        return {
+            "background_size": (int(mask_width), border_height),
+            "font_size": int((border_height - border_height * 0.15) * font_scale),
+            "error_font_size": int((border_height - border_height * 0.15) *
+                                   font_scale * 0.5),
+            "top_border": om.MPoint(mask_x, top_y),
+            "bottom_border": om.MPoint(mask_x, mask_bottom_y),
+            # 与 text_fields[0:6] 对应：上左 / 上中 / 上右 / 下左 / 下中 / 下右
+            "text": [(om.MPoint(left, top_y), omr.MUIDrawManager.kLeft),
+                     (om.MPoint(vp_half_width, top_y), omr.MUIDrawManager.kCenter),
+                     (om.MPoint(right, top_y), omr.MUIDrawManager.kRight),
+                     (om.MPoint(left, mask_bottom_y), omr.MUIDrawManager.kLeft),
+                     (om.MPoint(vp_half_width, mask_bottom_y),
+                      omr.MUIDrawManager.kCenter),
+                     (om.MPoint(right, mask_bottom_y), omr.MUIDrawManager.kRight)],
+            "error_origin": (left, mask_top_y - border_height * 2),
+            "error_step": border_height * 0.8,
+        }
 
     def draw_border(self, draw_manager, position, background_size, color):
         draw_manager.text2d(position, ' ', alignment=omr.MUIDrawManager.kLeft,
@@ -451,72 +618,117 @@ class ZShotMaskDrawOverride(omr.MPxDrawOverride):
                                 backgroundColor=color)
 
     def camera_exists(self, name):
-        return name in pm.listCameras()
+        return name in FIELD_CACHE.camera_names()
+
+    @staticmethod
+    def parse_camera_list(value):
+        """camera 属性可以写多个摄像机，用 ; , 或空格分隔"""
+        return tuple(value.replace(',', ' ').replace(';', ' ').split())
+
+    def camera_visible(self, camera_path, data):
+        """按 cameraMode 判断当前摄像机是否显示遮罩"""
+        if data.camera_mode == CAMERA_MODE_ALL:
+            return True
+        if not data.camera_list:
+            return False
+        if data.camera_mode == CAMERA_MODE_LIST:
+            path = om.MDagPath(camera_path)
+            if path.node().hasFn(om.MFn.kCamera):
+                path.pop()
+            return (path.partialPathName() in data.camera_list or
+                    path.fullPathName() in data.camera_list)
+        return any(self.camera_exists(name) for name in data.camera_list)
+
+    def field_value(self, key, mask_node, memo, camera_path=None):
+        """字段显示值：静态字段走 FIELD_CACHE，节点属性和摄像机字段直接读，其余按帧缓存"""
+        if key in ZShotMaskFieldCache.STATIC_FIELDS:
+            return str(FIELD_CACHE.static_value(key))
+        if key in ZShotMaskFieldCache.NODE_FIELDS or key in ZShotMaskFieldCache.CAMERA_FIELDS:
+            return str(self.command_map()[key](mask_node, camera_path))
+        if key not in memo:
+            memo[key] = str(self.command_map()[key](mask_node, camera_path))
+        return memo[key]
 
     def get_data(self, mask_node):
         """
         下拉框对应的数据格式
 
         """
-        # 获取属性
-        hud_command_map = {
-            'FileName': lambda: pm.sceneName().basename().rsplit('.', 1)[0],
-            'Camera': lambda: self.get_current_camera(),
-            'Camera int': lambda: self.get_current_camera_int(),
-            'None': lambda: "",
-            'FrameRange': lambda: '{:.0f}/{:.0f}'.format(
-                pm.playbackOptions(q=1, ast=1),
-                pm.playbackOptions(q=1, aet=1)),
-            'Date': lambda: time.strftime("%Y/%m/%d", time.localtime()),
-            'TaskType': lambda: mask_node.findPlug(
-                'taskType', False).asString(),
-            'User': lambda: getpass.getuser(),
-            'CurFrame': lambda: int(pm.currentTime()),
-            'Cur_EndFrame': lambda: '{:.0f}/{:.0f}'.format(
-                pm.currentTime(), pm.playbackOptions(q=1, aet=1)),
-            'AssetVersion': lambda: mask_node.findPlug('errorAssetVersion',
-                                                       False).asString(),
-            'focal length + CurFrame': lambda: '{} {}'.format(self.get_current_camera2(), str(int(pm.currentTime())).zfill(4)),
-            'focal length + CurFrame (int)': lambda: '{} {}'.format(self.get_current_camera2_int(), str(int(pm.currentTime())).zfill(4)),
-        }
-        return hud_command_map
+        return dict((key, (lambda func=func: func(mask_node, None)))
+                    for key, func in self.command_map().items())
+
+    def command_map(self):
+        """字段名 -> func(mask_node, camera_path)，每个 draw override 只建一次"""
+        if self.hud_command_map is None:
+            self.hud_command_map = {
+                'Camera': lambda node, cam: self.get_current_camera(cam),
+                'Camera int': lambda node, cam: self.get_current_camera_int(cam),
+                'None': lambda node, cam: "",
+                'TaskType': lambda node, cam: node.findPlug(
+                    'taskType', False).asString(),
+                'CurFrame': lambda node, cam: int(self.current_frame()),
+                'Cur_EndFrame': lambda node, cam: '{:.0f}/{:.0f}'.format(
+                    self.current_frame(), FIELD_CACHE.static_value('EndFrame')),
+                'AssetVersion': lambda node, cam: node.findPlug('errorAssetVersion',
+                                                                False).asString(),
+                'focal length + CurFrame': lambda node, cam: '{} {}'.format(self.get_current_camera2(cam), str(int(self.current_frame())).zfill(4)),
+                'focal length + CurFrame (int)': lambda node, cam: '{} {}'.format(self.get_current_camera2_int(cam), str(int(self.current_frame())).zfill(4)),
+            }
+            for key in ZShotMaskFieldCache.STATIC_FIELDS:
+                self.hud_command_map[key] = (
+                    lambda node, cam, key=key: FIELD_CACHE.static_value(key))
+        return self.hud_command_map
+
+    @staticmethod
+    def current_frame():
+        return oma.MAnimControl.currentTime().value
+
+    @staticmethod
+    def camera_focal(camera_path=None):
+        """(摄像机 transform 名, 焦距)。绘制时用传进来的 camera_path（OpenMaya），
+        没有时回退到 lookThru 当前摄像机"""
+        if camera_path is None:
+            camera_name = cmds.lookThru(q=True)
+            return camera_name, cmds.getAttr("{}.focalLength".format(camera_name))
+        focal = om.MFnCamera(camera_path).focalLength
+        path = om.MDagPath(camera_path)
+        if path.node().hasFn(om.MFn.kCamera):
+            path.pop()
+        return path.partialPathName(), focal
 
     @staticmethod
-    def get_current_camera2():
-        camera_name = cmds.lookThru(q=True)
+    def get_current_camera2(camera_path=None):
+        camera_name, focal = ZShotMaskDrawOverride.camera_focal(camera_path)
         data_str = '{focal}{unit}'.format(
             camera_name=camera_name,
-            focal=round(cmds.getAttr("{}.focalLength".format(camera_name)), 3),
-            # unit=pm.currentUnit(query=True, linear=True))
+            focal=round(focal, 3),
             unit='mm')  # the camera focal length is measured in millimeters
         return data_str
 
     @staticmethod
-    def get_current_camera2_int():
-        camera_name = cmds.lookThru(q=True)
+    def get_current_camera2_int(camera_path=None):
+        camera_name, focal = ZShotMaskDrawOverride.camera_focal(camera_path)
         data_str = '{focal}{unit}'.format(
             camera_name=camera_name,
-            focal=int(round(cmds.getAttr("{}.focalLength".format(camera_name)), 3)),
-            # unit=pm.currentUnit(query=True, linear=True))
+            focal=int(round(focal, 3)),
             unit='mm')  # the camera focal length is measured in millimeters
         return data_str
 
     @staticmethod
-    def get_current_camera():
-        camera_name = cmds.lookThru(q=True)
+    def get_current_camera(camera_path=None):
+        camera_name, focal = ZShotMaskDrawOverride.camera_focal(camera_path)
         data_str = '{camera_name}:{focal}{unit}'.format(
             camera_name=camera_name,
-            focal=round(cmds.getAttr("{}.focalLength".format(camera_name)), 3),
-            # unit=pm.currentUnit(query=True, linear=True))
+            focal=round(focal, 3),
             unit='mm')  # the camera focal length is measured in millimeters
         return data_str
+
     @staticmethod
-    def get_current_camera_int():
-        camera_name = cmds.lookThru(q=True)
+    def get_current_camera_int(camera_path=None):
+        camera_name, focal = ZShotMaskDrawOverride.camera_focal(camera_path)
         data_str = '{camera_name}:{focal}{unit}'.format(
             camera_name=camera_name,
-            focal=int(round(cmds.getAttr("{}.focalLength".format(camera_name)), 3)),
-            # unit=pm.currentUnit(query=True, linear=True))
+            focal=int(round(focal, 3)),
             unit='mm')  # the camera focal length is measured in millimeters
         return data_str
 
@@ -533,6 +745,8 @@ def initializePlugin(obj):
     """
     """
     pluginFn = om.MFnPlugin(obj, "Chris Zurbrigg", "1.0.2", "Any")
+    FIELD_CACHE.invalidate()
+    FIELD_CACHE.register_callbacks()
 
     try:
         pluginFn.registerNode(ZShotMaskLocator.NAME,
@@ -554,11 +768,16 @@ def initializePlugin(obj):
         om.MGlobal.displayError("Failed to register draw override: {0}".format(
             ZShotMaskDrawOverride.NAME))
 
+    FIELD_CACHE.stats["load_seconds"] = time.perf_counter() - _LOAD_START
+    om.MGlobal.displayInfo("[ZShotMask] loaded in {:.3f}s".format(
+        FIELD_CACHE.stats["load_seconds"]))
+
 
 def uninitializePlugin(obj):
     """
     """
     pluginFn = om.MFnPlugin(obj)
+    FIELD_CACHE.remove_callbacks()
 
     try:
         omr.MDrawRegistry.deregisterDrawOverrideCreator(
@@ -576,15 +795,64 @@ def uninitializePlugin(obj):
             "Failed to unregister node: {0}".format(ZShotMaskLocator.NAME))
 
 
+def measure_playback_fps(frames=None, nodes=None):
+    """
+    逐帧 currentTime + refresh 走一遍，mask 显示 / 隐藏各量一次回放 fps。
+    frames 默认是播放范围，nodes 默认是场景里所有 mask_node。
+    返回 {"with_mask": fps, "without_mask": fps,
+          "prepare_ms" / "ui_ms": 每次 prepareForDraw / addUIDrawables 平均毫秒}
+    """
+    if frames is None:
+        frames = range(int(cmds.playbackOptions(q=True, min=True)),
+                       int(cmds.playbackOptions(q=True, max=True)) + 1)
+    frames = list(frames)
+    nodes = nodes or cmds.ls(type=ZShotMaskLocator.NAME) or []
+    if not frames:
+        return {}
+    current = cmds.currentTime(q=True)
+    visibility = dict((node, cmds.getAttr(node + ".visibility")) for node in nodes)
+
+    def run():
+        start = time.perf_counter()
+        for frame in frames:
+            cmds.currentTime(frame, update=True)
+            cmds.refresh(force=True)
+        return len(frames) / max(time.perf_counter() - start, 1e-9)
+
+    result = {}
+    try:
+        for node in nodes:
+            cmds.setAttr(node + ".visibility", True)
+        FIELD_CACHE.stats.update(draws=0, seconds=0.0, ui_seconds=0.0)
+        result["with_mask"] = run()
+        draws = FIELD_CACHE.stats["draws"]
+        result["prepare_ms"] = (FIELD_CACHE.stats["seconds"] / draws * 1000.0
+                                if draws else 0.0)
+        result["ui_ms"] = (FIELD_CACHE.stats["ui_seconds"] / draws * 1000.0
+                           if draws else 0.0)
+        for node in nodes:
+            cmds.setAttr(node + ".visibility", False)
+        result["without_mask"] = run()
+    finally:
+        for node, value in visibility.items():
+            cmds.setAttr(node + ".visibility", value)
+        cmds.currentTime(current, update=True)
+    print(u"[ZShotMask] {} 帧  有遮罩 {:.1f} fps  无遮罩 {:.1f} fps  "
+          u"prepareForDraw 平均 {:.3f} ms  addUIDrawables 平均 {:.3f} ms".format(
+              len(frames), result["with_mask"], result["without_mask"],
+              result["prepare_ms"], result["ui_ms"]))
+    return result
+
+
 if __name__ == "__main__":
-    pm.file(f=True, new=True)
+    cmds.file(f=True, new=True)
 
     plugin_name = "mask_node.py"
-    pm.evalDeferred(
-        ('if pm.pluginInfo("{0}", q=True, loaded=True): '
-         'pm.unloadPlugin("{0}")').format(plugin_name))
-    pm.evalDeferred(
-        ('if not pm.pluginInfo("{0}", q=True, loaded=True): '
-         'pm.loadPlugin("{0}")').format(plugin_name))
-
-    pm.evalDeferred('pm.createNode("zshotmask")')
+    cmds.evalDeferred(
+        ('if cmds.pluginInfo("{0}", q=True, loaded=True): '
+         'cmds.unloadPlugin("{0}")').format(plugin_name))
+    cmds.evalDeferred(
+        ('if not cmds.pluginInfo("{0}", q=True, loaded=True): '
+         'cmds.loadPlugin("{0}")').format(plugin_name))
+
+    cmds.evalDeferred('cmds.createNode("mask_node")')
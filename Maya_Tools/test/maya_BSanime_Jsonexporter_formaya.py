@@ -2,6 +2,12 @@ import maya.cmds as cmds
 from PySide2 import QtWidgets, QtGui, QtCore
 import json
 import os
+import sys
+import time
+import inspect
+
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import bs_curve_io
 
 
 class MR_Window(QtWidgets.QWidget):
@@ -177,146 +183,40 @@ class MR_Window(QtWidgets.QWidget):
         else:
             print("File does not exist.")
 
+        timings = []
+        t0 = time.perf_counter()
         if with_image:
             self.save_image()
+        timings.append(("image", time.perf_counter() - t0))
 
-        bslist = cmds.listAttr(BSname + '.w', m=True)
-        weightMat = []
-        """
-        if one_frame:
-            numFrames=1
-        else:
-            numFrames = int(endFrames)  - int(startFrames) +1
-
-        key_times = cmds.keyframe(f"{BSname}.{attr_name}", query=True, time=(startFrames, endFrames))
-
-        # 获取关键帧的值
-        key_values = cmds.keyframe(f"{BSname}.{attr_name}", query=True, valueChange=True, time=(startFrames, endFrames))
-
-
-        if not one_frame:
-            for i in range(int(startFrames), int(endFrames)+1):
-                cmds.currentTime(i, update=True, edit=True)
-                j = []
-                for k in bslist:
-                    bsweight = cmds.getAttr(BSname + "." + k)
-                    if bsweight <= 0.0001:
-                        bsweight = 0.0
-                    j.append(bsweight)
-                weightMat.append(j)
-        else:
-            cmds.currentTime(int(startFrames), update=True, edit=True)
-            j = []
-            for k in bslist:
-                bsweight = cmds.getAttr(BSname + "." + k)
-                j.append(bsweight)
-            weightMat.append(j)
-        """
-        blendshapeNames = []
-        key_times_list = []
-        key_values_list = []
-        in_tangents_list = []
-        out_tangents_list = []
-        in_weights_list = []
-        out_weights_list = []
-        in_angles_list = []
-        out_angles_list = []
-        in_tangents_locked_list = []
-        out_tangents_locked_list = []
-
-        for k in bslist:
-            anim_curves = cmds.listConnections(f"{BSname}.{k}", type="animCurve")
-
-            if anim_curves:
-                anim_curve = anim_curves[0]
-                key_time = cmds.keyframe(anim_curve, query=True, time=(startFrames, endFrames))
-                key_value = cmds.keyframe(anim_curve, query=True, time=(startFrames, endFrames), valueChange=True)
-
-                in_tangents = []
-                out_tangents = []
-                in_weights = []
-                out_weights = []
-                in_angles = []
-                out_angles = []
-                in_tangents_locked = []
-                out_tangents_locked = []
-
-                for index, time in enumerate(key_time):
-                    in_tangent = cmds.keyTangent(anim_curve, time=(time, time), query=True, inTangentType=True)[0]
-                    out_tangent = cmds.keyTangent(anim_curve, time=(time, time), query=True, outTangentType=True)[0]
-
-                    in_weight = cmds.keyTangent(anim_curve, time=(time, time), query=True, inWeight=True)[0]
-                    out_weight = cmds.keyTangent(anim_curve, time=(time, time), query=True, outWeight=True)[0]
-
-                    in_angle = cmds.keyTangent(anim_curve, time=(time, time), query=True, inAngle=True)[0]
-                    out_angle = cmds.keyTangent(anim_curve, time=(time, time), query=True, outAngle=True)[0]
-
-                    in_tangents.append(in_tangent)
-                    out_tangents.append(out_tangent)
-                    in_weights.append(in_weight)
-                    out_weights.append(out_weight)
-                    in_angles.append(in_angle)
-                    out_angles.append(out_angle)
-
-                blendshapeNames.append(k)
-                key_times_list.append(key_time)
-                key_values_list.append(key_value)
-                in_tangents_list.append(in_tangents)
-                out_tangents_list.append(out_tangents)
-                in_weights_list.append(in_weights)
-                out_weights_list.append(out_weights)
-                in_angles_list.append(in_angles)
-                out_angles_list.append(out_angles)
+        # 一次遍历 weight 插头，所有曲线按 key 批量读出（时间/值/切线/权重/角度）
+        t0 = time.perf_counter()
+        snap = bs_curve_io.snapshot_bs_curves(BSname, startFrames, endFrames)
+        timings.append(("read curves", time.perf_counter() - t0))
 
+        blendshapeNames = snap["blendshapeNames"]
+        num_keys = sum(len(t) for t in snap["key_times_list"])
         print("blendshapeNames")
         print(blendshapeNames)
 
-        print("key_times_list")
-        print(key_times_list)
-        print("key_values_list")
-        print(key_values_list)
-
-        print("in_tangents_list")
-        print(in_tangents_list)
-        print("out_tangents_list")
-        print(out_tangents_list)
-
-        print("in_weights_list")
-        print(in_weights_list)
-        print("out_weights_list")
-        print(out_weights_list)
-
-        print("in_angles_list")
-        print(in_angles_list)
-        print("out_angles_list")
-        print(out_angles_list)
-
-        # create json
-
+        # create json / save json（直接写文件，不再先拼整串）
+        t0 = time.perf_counter()
         pyjson = {}
-
-        pyjson['blendshapeNames'] = blendshapeNames
-        pyjson['key_times_list'] = key_times_list
-        pyjson['key_values_list'] = key_values_list
-        pyjson['in_tangents_list'] = in_tangents_list
-        pyjson['out_tangents_list'] = out_tangents_list
-        pyjson['in_weights_list'] = in_weights_list
-        pyjson['out_weights_list'] = out_weights_list
-        pyjson['in_angles_list'] = in_angles_list
-        pyjson['out_angles_list'] = out_angles_list
-
-        print(pyjson)
-
-        # save json
-        jsonfile = json.dumps(pyjson, indent=4, separators=(',', ':'))
+        for field in ("blendshapeNames", "key_times_list", "key_values_list",
+                      "in_tangents_list", "out_tangents_list", "in_weights_list",
+                      "out_weights_list", "in_angles_list", "out_angles_list"):
+            pyjson[field] = snap[field]
+        pyjson = bs_curve_io.snapshot_to_json(pyjson)
 
         # Check if the folder exists, create it if necessary
         if not os.path.exists(folder_path):
             os.makedirs(folder_path)
 
-        filenew = open(savepath, 'w')
-        filenew.write(jsonfile)
-        filenew.close()
+        with open(savepath, 'w') as filenew:
+            json.dump(pyjson, filenew, indent=4, separators=(',', ':'))
+        timings.append(("write json", time.perf_counter() - t0))
 
+        print("exported %d curves, %d keys -> %s" % (len(blendshapeNames), num_keys, savepath))
+        print("  " + "  ".join("%s %.3fs" % (name, sec) for name, sec in timings))
 
 bsaj_exporter = MR_Window()
\ No newline at end of file
@@ -2,6 +2,11 @@ import maya.cmds as cmds
 from PySide2 import QtWidgets, QtGui, QtCore
 import json
 import os
+import sys
+import inspect
+
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import bs_curve_io
 
 class MR_Window(QtWidgets.QWidget):
 
@@ -54,10 +59,13 @@ class MR_Window(QtWidgets.QWidget):
         #Auto_frame_btn = QtWidgets.QPushButton("Auto end frame")
         self.checkbox_Skip_df = QtWidgets.QCheckBox("delete exit key")
         self.checkbox_Skip_df.setChecked(True)
+        self.checkbox_dry_run = QtWidgets.QCheckBox("dry run")
+        self.checkbox_dry_run.setToolTip("只统计与现有曲线的差异，不修改场景")
         import_btn = QtWidgets.QPushButton("Import")
         layout.addWidget(set_frame_btn, 4, 0)
         #layout.addWidget(Auto_frame_btn, 4, 1)
         layout.addWidget(self.checkbox_Skip_df, 4, 2)
+        layout.addWidget(self.checkbox_dry_run, 4, 3)
         layout.addWidget(import_btn, 4, 4)
 
         # 为所有按钮连接临时函数
@@ -150,37 +158,33 @@ class MR_Window(QtWidgets.QWidget):
             in_angles_list = facs_data["in_angles_list"]
             out_angles_list = facs_data["out_angles_list"]
 
-        for i, k in enumerate(blendshapeNames):
-            anim_curve_attr = f"{bsname}.{k}"
-
-            # 仅执行一次cmds.listConnections命令
-            anim_curves = cmds.listConnections(anim_curve_attr, type="animCurve")
-
-            if anim_curves:
-                anim_curve = anim_curves[0]
-                if checkbox_Skip_df_status:
-                    cmds.cutKey(anim_curve, time=(start_frame, end_frame))
-                    # 因为cutKey可能会影响anim_curves，所以再次获取连接
-                    anim_curves = cmds.listConnections(anim_curve_attr, type="animCurve")
-
-            # 如果anim_curves为空或者cutKey操作后为空，创建新的关键帧
-            if not anim_curves:
-                # 创建一个新的animCurve节点
-                anim_curve = cmds.createNode('animCurveTU', name=f'{bsname}_{k}_animCurve')
-
-                # 将新创建的animCurve节点连接到所需的属性
-                cmds.connectAttr(f'{anim_curve}.output', f'{bsname}.{k}')
-
-                # 确保新创建的animCurve节点被添加到anim_curves列表中，以备后用
-                anim_curves = [anim_curve]
-
-            for j, time in enumerate(key_times_list[i]):
-                value = key_values_list[i][j]
-                cmds.setKeyframe(anim_curve, time=time, value=value,inTangentType="auto" ,outTangentType="auto")
-
-                cmds.keyTangent(anim_curve, edit=True, time=(time, time), inWeight=in_weights_list[i][j], outWeight=out_weights_list[i][j])
-                cmds.keyTangent(anim_curve, edit=True, time=(time, time), inAngle=in_angles_list[i][j], outAngle=out_angles_list[i][j])
-                cmds.keyTangent(anim_curve, edit=True, time=(time, time), inTangentType=in_tangents_list[i][j], outTangentType=out_tangents_list[i][j])
+        snap = {"blendshapeNames": blendshapeNames,
+                "key_times_list": key_times_list,
+                "key_values_list": key_values_list,
+                "in_tangents_list": in_tangents_list,
+                "out_tangents_list": out_tangents_list,
+                "in_weights_list": in_weights_list,
+                "out_weights_list": out_weights_list,
+                "in_angles_list": in_angles_list,
+                "out_angles_list": out_angles_list}
+        clear_range = (start_frame, end_frame) if checkbox_Skip_df_status else None
+        dry_run = self.checkbox_dry_run.isChecked()
+
+        # 每条曲线一次重建：清除范围（原 cutKey）+ 全部 key + 切线类型/角度/权重；Ctrl+Z 一步撤销
+        result = bs_curve_io.rebuild_bs_curves(bsname, snap, clear_range, dry_run=dry_run)
+
+        totals = dict.fromkeys(("added", "changed", "removed", "unchanged"), 0)
+        for name, stats in result["diff"].items():
+            for key in totals:
+                totals[key] += stats[key]
+            if dry_run and (stats["added"] or stats["changed"] or stats["removed"]):
+                print("  %-32s +%d ~%d -%d" % (name, stats["added"], stats["changed"], stats["removed"]))
+        for name in result["missing"]:
+            print("  target not found on %s: %s" % (bsname, name))
+        print("%s %d curves: added %d, changed %d, removed %d, unchanged %d, missing %d  %.3fs"
+              % ("[dry run]" if dry_run else "imported", len(result["diff"]), totals["added"],
+                 totals["changed"], totals["removed"], totals["unchanged"],
+                 len(result["missing"]), result["seconds"]))
 
 
 bsaj_importer= MR_Window()
\ No newline at end of file
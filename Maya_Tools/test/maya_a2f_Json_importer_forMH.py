@@ -1,7 +1,14 @@
 import json
+import os
+import sys
+import inspect
 import maya.cmds as mc
 import maya.cmds as cmds
 
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import a2f_curve_writer
+import a2f_stream
+
 
 
     
@@ -46,21 +53,20 @@ class MR_Window(object):
         fullpath = pathname + "\\" + filename + ".json"
         print("path name is " + fullpath)
         
-        with open (fullpath,"r") as f:
-         facs_data = json.loads(f.read())
-         facsNames = facs_data["facsNames"]
-         numPoses = facs_data["numPoses"]
-         numFrames = facs_data["numFrames"]
-         weightMat = facs_data["weightMat"]
+        with a2f_stream.open_a2f(fullpath) as reader:
+         facsNames = reader.facsNames
+         numPoses = reader.numPoses
          startFlame = cmds.textFieldGrp(self.startFlame, query=True, text=True)
          startFlame = float(startFlame)
          #print(startFlame,type(startFlame))
          #startFlame = float(startFlame)
          
          bsnode = blendshapename
-         for fr in range(numFrames) :
-            for i in range(numPoses):
-               mc.setKeyframe(bsnode+'.'+(facsNames[i]), v=weightMat[fr][i], t=fr + startFlame)
+         # weightMat 分块读取，每块按 blendshape 通道整段写入
+         chunks = (([fr + startFlame for fr in range(start, start + n)],
+                    [flat[i::numPoses] for i in range(numPoses)])
+                   for start, n, flat in reader.chunks())
+         a2f_curve_writer.write_chunked([bsnode+'.'+(facsNames[i]) for i in range(numPoses)], chunks)
         
         
      
@@ -1,14 +1,19 @@
-import json
+import os
+import sys
+import inspect
 import maya.cmds as mc
 
-with open (r'K:\shenron\11_Users\Q\anyheadtest\a2f_cache_ba.json', "r") as f:
-    facs_data = json.loads(f.read())
-    facsNames = facs_data["facsNames"]
-    numPoses = facs_data["numPoses"]
-    numFrames = facs_data["numFrames"]
-    weightMat = facs_data["weightMat"]
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import a2f_curve_writer
+import a2f_stream
+
+with a2f_stream.open_a2f(r'K:\shenron\11_Users\Q\anyheadtest\a2f_cache_ba.json') as reader:
+    facsNames = reader.facsNames
+    numPoses = reader.numPoses
 
     bsnode = 'blendShape1'
-    for fr in range(numFrames) :
-        for i in range(numPoses):
-            mc.setKeyframe(bsnode+'.'+facsNames[i], v=weightMat[fr][i], t=fr)
\ No newline at end of file
+    # weightMat is streamed in frame chunks; each chunk is one bulk write per blendshape target
+    def columns():
+        for start, n, flat in reader.chunks():
+            yield list(range(start, start + n)), [flat[i::numPoses] for i in range(numPoses)]
+    a2f_curve_writer.write_chunked([bsnode+'.'+facsNames[i] for i in range(numPoses)], columns())
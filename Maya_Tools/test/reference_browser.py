@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""Virtualized Qt browser for JCQ_ReferenceTool sheet tabs.
+
+create_Tab used to build one cmds rowLayout (2 texts, picture, button) per sheet
+row, so a sheet with a few hundred props meant a few thousand Maya controls and a
+thumbnail request per row before the tab showed up. Here a tab holds one
+QListView over a ReferenceModel:
+
+- rows are painted by ReferenceDelegate -- no widget per row, the "Import
+  Reference" button is drawn and hit-tested by the delegate
+- thumbnails are requested from thumbnail_cache only when a row is painted
+  (i.e. scrolled into view); workers hand the path back through a Qt signal
+- the search box filters on name / namespace / file as you type (all words must
+  match, case-insensitive) through ReferenceFilter
+
+    browser = reference_browser.ReferenceBrowser(on_import=import_reference,
+                                                 fallback=noimage, thumb_size=100)
+    browser.set_columns(columns)      # sheet_snapshot columns
+"""
+from collections import OrderedDict, namedtuple
+
+try:
+    from PySide2 import QtCore, QtGui, QtWidgets
+except ImportError:
+    from PySide6 import QtCore, QtGui, QtWidgets
+
+import thumbnail_cache
+
+ThumbnailRole = QtCore.Qt.UserRole + 1
+RowRole = QtCore.Qt.UserRole + 2
+
+BUTTON_LABEL = "Import Reference"
+BUTTON_WIDTH = (100, 160)   # 按钮最小 / 最大宽度
+ROW_PADDING = 2
+SEARCH_DELAY_MS = 120
+
+ReferenceRow = namedtuple("ReferenceRow", "number name namespace image file_path file_name search")
+
+
+def rows_from_columns(columns):
+    """sheet_snapshot 的 6 列 -> [ReferenceRow]（行号从 1 开始，与旧 tab 一致）"""
+    Name_ls, Namespace_ls, image_path_ls, image_name_ls, flie_path_ls, file_name_ls = columns
+    rows = []
+    for i, (name, namespace, image_path, image_name, file_path, file_name) in enumerate(
+            zip(Name_ls, Namespace_ls, image_path_ls, image_name_ls, flie_path_ls, file_name_ls)):
+        image = image_path + "\\" + image_name
+        if image.endswith("\\"):
+            image = ""
+        search = u" ".join((name, namespace, file_name)).lower()
+        rows.append(ReferenceRow(i + 1, name, namespace, image, file_path, file_name, search))
+    return rows
+
+
+class ReferenceModel(QtCore.QAbstractListModel):
+    """一行一个 ReferenceRow；ThumbnailRole 第一次被取（行第一次画出来）时才请求缩略图"""
+
+    # (源图, 缩略图尺寸, 缩略图路径)：工作线程发出，排队到主线程
+    thumbnailReady = QtCore.Signal(str, int, str)
+
+    def __init__(self, fallback=None, thumb_size=100, cache=None, parent=None):
+        super(ReferenceModel, self).__init__(parent)
+        self.rows = []
+        self.fallback = fallback
+        self.thumb_size = thumb_size
+        self.cache = cache or thumbnail_cache.get_cache()
+        self._thumbs = {}          # 源图 -> 缩略图路径（None = 生成中 / 没有）
+        self._rows_by_image = {}   # 源图 -> [row]
+        self.thumbnailReady.connect(self._on_thumbnail_ready)
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.rows = list(rows)
+        self._rows_by_image = {}
+        for row, record in enumerate(self.rows):
+            self._rows_by_image.setdefault(record.image, []).append(row)
+        self.endResetModel()
+
+    def set_thumb_size(self, size):
+        if size == self.thumb_size:
+            return
+        self.beginResetModel()
+        self.thumb_size = size
+        self._thumbs = {}
+        self.endResetModel()
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.rows[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return u"%d. %s" % (record.number, record.name)
+        if role == QtCore.Qt.ToolTipRole:
+            return record.file_path + "\\" + record.file_name
+        if role == ThumbnailRole:
+            return self.thumbnail(record.image)
+        if role == RowRole:
+            return record
+        return None
+
+    def thumbnail(self, image):
+        """缓存里有就返回路径；没有就交给后台生成，先返回 None（每张源图只请求一次）"""
+        if image in self._thumbs:
+            return self._thumbs[image]
+        self._thumbs[image] = None
+        size = self.thumb_size
+        path = self.cache.request(image or None, (size, size), thumbnail_cache.MODE_PAD,
+                                  fallback=self.fallback,
+                                  on_ready=lambda p, image=image, size=size: self._emit_ready(image, size, p))
+        if path:
+            self._thumbs[image] = path
+        return path
+
+    def _emit_ready(self, image, size, path):
+        try:
+            self.thumbnailReady.emit(image, size, path)
+        except RuntimeError:
+            pass  # tab 已经关掉，model 被删了
+
+    def _on_thumbnail_ready(self, image, size, path):
+        if size != self.thumb_size:
+            return  # 改尺寸之前发出的请求
+        self._thumbs[image] = path
+        for row in self._rows_by_image.get(image, ()):
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [ThumbnailRole])
+
+
+class ReferenceFilter(QtCore.QSortFilterProxyModel):
+    """搜索框过滤：空格分开的每个词都要出现在 名称 / namespace / 文件名 里"""
+
+    def __init__(self, parent=None):
+        super(ReferenceFilter, self).__init__(parent)
+        self.words = []
+
+    def set_text(self, text):
+        words = text.lower().split()
+        if words == self.words:
+            return
+        self.words = words
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if not self.words:
+            return True
+        search = self.sourceModel().rows[source_row].search
+        return all(word in search for word in self.words)
+
+
+class ReferenceDelegate(QtWidgets.QStyledItemDelegate):
+    """画一行：名称 | namespace | 缩略图 | Import Reference 按钮；按钮点击发 importRequested"""
+
+    importRequested = QtCore.Signal(object)   # ReferenceRow
+
+    def __init__(self, parent=None, max_pixmaps=256):
+        super(ReferenceDelegate, self).__init__(parent)
+        self.thumb_size = 100
+        self.name_width = 20
+        self.namespace_width = 20
+        self.max_pixmaps = max_pixmaps
+        self._pixmaps = OrderedDict()   # 缩略图路径 -> QPixmap（只留最近画过的）
+        self._pressed = None            # 按下按钮的行（QPersistentModelIndex）
+
+    def set_column_widths(self, rows, metrics):
+        self.name_width = max([metrics.horizontalAdvance(u"%d. %s" % (r.number, r.name)) for r in rows] + [0]) + 20
+        self.namespace_width = max([metrics.horizontalAdvance(r.namespace) for r in rows] + [0]) + 20
+
+    def pixmap(self, path):
+        pix = self._pixmaps.pop(path, None)
+        if pix is None:
+            pix = QtGui.QPixmap(path)
+        self._pixmaps[path] = pix
+        while len(self._pixmaps) > self.max_pixmaps:
+            self._pixmaps.popitem(last=False)
+        return pix
+
+    def _rects(self, rect):
+        x = rect.left()
+        name = QtCore.QRect(x, rect.top(), self.name_width, rect.height())
+        x += self.name_width
+        namespace = QtCore.QRect(x, rect.top(), self.namespace_width, rect.height())
+        x += self.namespace_width
+        thumb = QtCore.QRect(x, rect.top() + ROW_PADDING, self.thumb_size, self.thumb_size)
+        x += self.thumb_size + 20
+        width = min(max(rect.right() - x, BUTTON_WIDTH[0]), BUTTON_WIDTH[1])
+        button_height = min(rect.height() - 2 * ROW_PADDING, 24)
+        button = QtCore.QRect(x, rect.center().y() - button_height // 2, width, button_height)
+        return name, namespace, thumb, button
+
+    def sizeHint(self, option, index):
+        return QtCore.QSize(self.name_width + self.namespace_width + self.thumb_size + 20 + BUTTON_WIDTH[0],
+                            self.thumb_size + 2 * ROW_PADDING)
+
+    def paint(self, painter, option, index):
+        record = index.data(RowRole)
+        widget = option.widget
+        style = widget.style() if widget else QtWidgets.QApplication.style()
+        style.drawPrimitive(QtWidgets.QStyle.PE_PanelItemViewItem, option, painter, widget)
+        name_rect, namespace_rect, thumb_rect, button_rect = self._rects(option.rect)
+
+        painter.save()
+        align = QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter
+        metrics = option.fontMetrics
+        painter.drawText(name_rect, align, metrics.elidedText(
+            index.data(QtCore.Qt.DisplayRole), QtCore.Qt.ElideRight, name_rect.width() - 4))
+        painter.drawText(namespace_rect, align, metrics.elidedText(
+            record.namespace, QtCore.Qt.ElideRight, namespace_rect.width() - 4))
+
+        path = index.data(ThumbnailRole)
+        pix = self.pixmap(path) if path else None
+        if pix is not None and not pix.isNull():
+            painter.drawPixmap(thumb_rect.topLeft(), pix)
+        else:
+            painter.fillRect(thumb_rect, QtGui.QColor(*thumbnail_cache.PLACEHOLDER_COLOR))
+        painter.restore()
+
+        button = QtWidgets.QStyleOptionButton()
+        button.rect = button_rect
+        button.text = BUTTON_LABEL
+        button.state = QtWidgets.QStyle.State_Enabled
+        if self._pressed is not None and self._pressed == index:
+            button.state |= QtWidgets.QStyle.State_Sunken
+        else:
+            button.state |= QtWidgets.QStyle.State_Raised
+        style.drawControl(QtWidgets.QStyle.CE_PushButton, button, painter, widget)
+
+    def editorEvent(self, event, model, option, index):
+        if event.type() not in (QtCore.QEvent.MouseButtonPress, QtCore.QEvent.MouseButtonRelease,
+                                QtCore.QEvent.MouseButtonDblClick):
+            return False
+        if event.button() != QtCore.Qt.LeftButton:
+            return False
+        on_button = self._rects(option.rect)[3].contains(event.pos())
+        if isinstance(option.widget, QtWidgets.QAbstractItemView):
+            option.widget.viewport().update(option.rect)   # 按钮按下 / 弹起重画
+        if event.type() == QtCore.QEvent.MouseButtonRelease:
+            pressed, self._pressed = self._pressed, None
+            if pressed is not None and pressed == index and on_button:
+                self.importRequested.emit(index.data(RowRole))
+                return True
+            return pressed is not None
+        if on_button:
+            self._pressed = QtCore.QPersistentModelIndex(index)
+            return True
+        return False
+
+
+class ReferenceBrowser(QtWidgets.QWidget):
+    """搜索框 + 虚拟列表；on_import(namespace, path, file) 在点 Import Reference 时调用"""
+
+    def __init__(self, on_import=None, fallback=None, thumb_size=100, cache=None, parent=None):
+        super(ReferenceBrowser, self).__init__(parent)
+        self.on_import = on_import
+
+        self.model = ReferenceModel(fallback=fallback, thumb_size=thumb_size, cache=cache, parent=self)
+        self.proxy = ReferenceFilter(self)
+        self.proxy.setSourceModel(self.model)
+        self.delegate = ReferenceDelegate(self)
+        self.delegate.thumb_size = thumb_size
+        self.delegate.importRequested.connect(self._import)
+
+        self.search_field = QtWidgets.QLineEdit(self)
+        self.search_field.setPlaceholderText("search name / namespace / file")
+        self.search_field.setClearButtonEnabled(True)
+        self.count_label = QtWidgets.QLabel(self)
+
+        self.view = QtWidgets.QListView(self)
+        self.view.setModel(self.proxy)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setUniformItemSizes(True)   # 行高一致：只算一次，只画可见行
+        self.view.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.view.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
+        self.view.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+
+        # 连续输入时只在停顿后过滤一次
+        self._search_timer = QtCore.QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(SEARCH_DELAY_MS)
+        self._search_timer.timeout.connect(self._apply_search)
+        self.search_field.textChanged.connect(lambda *args: self._search_timer.start())
+        self.search_field.returnPressed.connect(self._apply_search)
+
+        top = QtWidgets.QHBoxLayout()
+        top.addWidget(self.search_field)
+        top.addWidget(self.count_label)
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(top)
+        layout.addWidget(self.view)
+
+    def set_columns(self, columns):
+        """换成新的表格数据（sheet_snapshot 列）；搜索条件保留"""
+        rows = rows_from_columns(columns)
+        self.delegate.set_column_widths(rows, self.view.fontMetrics())
+        self.model.set_rows(rows)
+        self._update_count()
+
+    def set_thumb_size(self, size):
+        self.delegate.thumb_size = size
+        self.model.set_thumb_size(size)
+
+    def _apply_search(self):
+        self._search_timer.stop()
+        self.proxy.set_text(self.search_field.text())
+        self._update_count()
+
+    def _update_count(self):
+        total = self.model.rowCount()
+        shown = self.proxy.rowCount()
+        self.count_label.setText(str(total) if shown == total else "%d / %d" % (shown, total))
+
+    def _import(self, record):
+        if self.on_import is not None:
+            self.on_import(record.namespace, record.file_path, record.file_name)
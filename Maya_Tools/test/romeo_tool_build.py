@@ -3,8 +3,13 @@ from PySide2 import QtWidgets, QtGui, QtCore
 import maya.cmds as cmds
 import maya.mel as mel
 import os, re
+import sys
+import inspect
 import time
 
+sys.path.append(os.path.dirname(inspect.getfile(inspect.currentframe())))
+import dropframe_sampler
+
 try:
     import metahuman_api as mh_api
 except Exception as e:
@@ -695,78 +700,41 @@ class RomeoTool(QtWidgets.QWidget):
                     keep.append(o)
             return keep
 
-        def _record_keyframes(objs, tmin, tmax, n, use_t, use_r, use_s):
+        def _record_keyframes(objs, tmin, tmax, n, use_t, use_r, use_s, stats):
             _mute_lock_other_layers()
             data = {o: [] for o in objs}
-            cur = tmin
-            t_attrs = ["translateX", "translateY", "translateZ"] if use_t else []
-            r_attrs = ["rotateX", "rotateY", "rotateZ"] if use_r else []
-            s_attrs = ["scaleX", "scaleY", "scaleZ"] if use_s else []
-            attrs_all = t_attrs + r_attrs + s_attrs
-
-            while cur <= tmax:
-                try:
-                    cmds.currentTime(cur, e=True)
-                except Exception:
-                    pass
-                for o in objs:
-                    entry = {'frame': int(cur)}
-                    has_any = False
-                    for a in attrs_all:
-                        plug = f"{o}.{a}"
-                        try:
-                            if cmds.keyframe(plug, q=True, time=(tmin, tmax)):
-                                val = cmds.getAttr(plug)
-                                entry[a] = val
-                                has_any = True
-                        except Exception:
-                            pass
-                    if has_any:
-                        data[o].append(entry)
-                cur += n
-
-            if (cur - n) < tmax:
-                try:
-                    cmds.currentTime(tmax, e=True)
-                except Exception:
-                    pass
-                for o in objs:
-                    entry = {'frame': int(tmax)}
-                    has_any = False
-                    for a in attrs_all:
-                        plug = f"{o}.{a}"
-                        try:
-                            if cmds.keyframe(plug, q=True, time=(tmin, tmax)):
-                                val = cmds.getAttr(plug)
-                                entry[a] = val
-                                has_any = True
-                        except Exception:
-                            pass
-                    if has_any:
-                        data[o].append(entry)
+            # 通道只解析一次，不移动时间轴（dropframe_sampler）
+            sampler = dropframe_sampler.ChannelSampler(objs, dropframe_sampler.trs_attrs(use_t, use_r, use_s))
+            keyed = [ci for ci in range(len(sampler)) if sampler.has_keys_in(ci, tmin, tmax)]
+            frames = dropframe_sampler.step_frames(tmin, tmax, n)
+            values = sampler.sample(frames)
+            keyed = [(sampler.channels[ci], values[ci]) for ci in keyed]
+            for fi, f in enumerate(frames):
+                entries = {}
+                for (o, a), col in keyed:
+                    entries.setdefault(o, {'frame': int(f)})[a] = col[fi]
+                for o, entry in entries.items():
+                    data[o].append(entry)
+            stats['channels'] = len(sampler)
+            stats['timings'] = dict(sampler.timings)
             return data
 
         def _apply_keyframes(objs, data, tmin, tmax, n, layer_name):
             _unmute_unlock(layer_name)
+            jobs = []
             for o in objs:
-                kfs = data.get(o, [])
-                for k in kfs:
+                channels = {}
+                for k in data.get(o, []):
                     f0 = int(k['frame'])
-                    f1 = min(f0 + n, tmax + 1)
-                    for f in range(f0, f1):
-                        for attr, val in k.items():
-                            if attr == 'frame':
-                                continue
-                            plug = f"{o}.{attr}"
-                            try:
-                                if cmds.getAttr(plug, lock=True):
-                                    continue
-                            except Exception:
-                                pass
-                            try:
-                                cmds.setKeyframe(o, at=attr, t=f, v=val, animLayer=layer_name)
-                            except Exception:
-                                pass
+                    f1 = min(f0 + n, tmax + 1) - 1
+                    for attr, val in k.items():
+                        if attr == 'frame':
+                            continue
+                        channels.setdefault(attr, {})[f0] = (f1, val)
+                for attr, holds in channels.items():
+                    jobs.append((f"{o}.{attr}", [(a, b, v) for a, (b, v) in holds.items()]))
+            # 每段保持只写一个 step key（末帧与上一段重叠时后者覆盖），每个通道一次写入动画层
+            return dropframe_sampler.write_layer_curves(jobs, layer_name, verbose=False)
 
         # —— 构建 UI ——
         tab = QtWidgets.QWidget()
@@ -865,15 +833,23 @@ class RomeoTool(QtWidgets.QWidget):
                 cmds.warning("No objects with keyframes found in the selected set.")
                 return
 
+            # 先采样再加层：未分层的通道可以直接对曲线求值
+            stats = {}
+            snap = _record_keyframes(objs, start_f, end_f, n, use_t, use_r, use_s, stats)
+
             layer_name = _ensure_anim_layer_exists(tab, f"F{n}_{layer_name_base}")
             _ensure_objects_in_layer(objs, layer_name)
-
-            snap = _record_keyframes(objs, start_f, end_f, n, use_t, use_r, use_s)
-            _apply_keyframes(objs, snap, start_f, end_f, n, layer_name)
+            written = _apply_keyframes(objs, snap, start_f, end_f, n, layer_name)
 
             elapsed = time.time() - t0
-            QtWidgets.QMessageBox.information(tab, "Process Completed",
-                                              f"Processed {len(objs)} objects in {elapsed:.2f} seconds.")
+            rate = max(elapsed, 1e-9)
+            timings = stats['timings']
+            timings['write'] = written['seconds']
+            QtWidgets.QMessageBox.information(
+                tab, "Process Completed",
+                f"Processed {len(objs)} objects in {elapsed:.2f} seconds.\n"
+                f"{len(objs) / rate:.1f} objects/sec, {stats['channels'] / rate:.1f} channels/sec\n"
+                + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
 
         ui['btn_refresh'].clicked.connect(_on_refresh)
         ui['btn_run'].clicked.connect(_on_run)
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""Batched Google Sheets reads with a local snapshot cache (JCQ_ReferenceTool).
+
+Create_Reference_tab used to run one spreadsheets().values().get per column
+(A, B, D, E, F, G) and did it again on every tab rebuild. Here:
+
+- all columns of a sheet come back in one values().batchGet (majorDimension=COLUMNS)
+- the result is stored as a JSON snapshot on disk together with an etag
+  (the Sheets values API has no ETag of its own, so the etag is a hash of the
+  returned ranges; the stub server sends it as a real ETag / honours If-None-Match)
+- a tab opens straight from the snapshot and refresh_async() re-fetches in a
+  background thread, calling back only when the content actually changed
+
+Offline / testing: set JCQ_SHEETS_ENDPOINT=http://127.0.0.1:8765 (or pass
+endpoint=) and run serve_stub("fixture.json") -- requests then go to the stub
+over plain REST instead of googleapiclient.
+
+    source = sheet_snapshot.SheetSource(service_factory=lambda: build('sheets', 'v4', credentials=creds))
+    store = sheet_snapshot.SnapshotStore()
+    columns, fresh = sheet_snapshot.load_or_fetch(source, store, sheet_id, "Props")
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    from urllib.parse import quote, urlencode, urlparse, parse_qs, unquote
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:  # py2 (MotionBuilder 旧版本)
+    from urllib import quote, urlencode, unquote
+    from urlparse import urlparse, parse_qs
+    from urllib2 import Request, urlopen, HTTPError
+
+REFERENCE_COLUMNS = ("A", "B", "D", "E", "F", "G")  # 名字 / namespace / 图片路径 / 图片名 / 文件路径 / 文件名
+START_ROW = 2
+ENDPOINT_ENV = "JCQ_SHEETS_ENDPOINT"
+CACHE_ENV = "JCQ_SHEET_CACHE"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".jcq_tool", "sheets")
+
+
+def a1_range(sheet, column, start_row=START_ROW):
+    """'Sheet name'!A2:A（表名统一加引号，带空格也能用）"""
+    return u"'%s'!%s%d:%s" % (sheet.replace("'", "''"), column, start_row, column)
+
+
+def content_etag(value_ranges):
+    text = json.dumps([vr.get("values", []) for vr in value_ranges], sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def reference_columns(value_ranges):
+    """
+    batchGet(COLUMNS) 的结果 -> 每列一个 list，与旧 sheet_item 一致：
+    第一列去掉空格子，其它列空格子为 ""，并补齐到第一列的长度。
+    """
+    cols = []
+    for vr in value_ranges:
+        values = vr.get("values") or [[]]
+        cols.append([u"%s" % v for v in values[0]])
+    if not cols:
+        return []
+    names = [v for v in cols[0] if v]
+    result = [names]
+    for col in cols[1:]:
+        result.append(col + [""] * (len(names) - len(col)))
+    return result
+
+
+class SheetSource(object):
+    """
+    Sheets 读取：默认走 googleapiclient（service_factory 第一次用到时才建），
+    设置了 endpoint 时走本地 stub 的 REST 接口。
+    """
+
+    def __init__(self, service_factory=None, endpoint=None, timeout=20):
+        self.service_factory = service_factory
+        self.endpoint = (endpoint or os.environ.get(ENDPOINT_ENV) or "").rstrip("/")
+        self.timeout = timeout
+        self._service = None
+        self._lock = threading.Lock()  # googleapiclient 的 http 对象不是线程安全的
+
+    @property
+    def service(self):
+        if self._service is None:
+            self._service = self.service_factory()
+        return self._service
+
+    def _rest(self, path, params=None, etag=None):
+        url = "%s/v4/spreadsheets/%s" % (self.endpoint, path)
+        if params:
+            url += "?" + urlencode(params, doseq=True)
+        request = Request(url)
+        if etag:
+            request.add_header("If-None-Match", etag)
+        try:
+            response = urlopen(request, timeout=self.timeout)
+        except HTTPError as e:
+            if e.code == 304:
+                return None, etag
+            raise
+        body = json.loads(response.read().decode("utf-8"))
+        return body, response.headers.get("ETag")
+
+    def batch_get(self, spreadsheet_id, ranges, etag=None):
+        """返回 (valueRanges, etag)；内容没变（etag 一致）时 valueRanges 为 None"""
+        if self.endpoint:
+            body, new_etag = self._rest(quote(spreadsheet_id, safe="") + "/values:batchGet",
+                                        {"ranges": list(ranges), "majorDimension": "COLUMNS"}, etag)
+            if body is None:
+                return None, etag
+            value_ranges = body.get("valueRanges", [])
+            new_etag = new_etag or content_etag(value_ranges)
+        else:
+            with self._lock:
+                body = self.service.spreadsheets().values().batchGet(
+                    spreadsheetId=spreadsheet_id, ranges=list(ranges),
+                    majorDimension="COLUMNS").execute()
+            value_ranges = body.get("valueRanges", [])
+            new_etag = content_etag(value_ranges)
+        if etag and new_etag == etag:
+            return None, etag
+        return value_ranges, new_etag
+
+    def sheet_names(self, spreadsheet_id):
+        if self.endpoint:
+            body, _ = self._rest(quote(spreadsheet_id, safe=""), {"fields": "sheets.properties.title"})
+        else:
+            with self._lock:
+                body = self.service.spreadsheets().get(spreadsheetId=spreadsheet_id).execute()
+        return [sheet.get('properties', {}).get('title', 'Sheet1') for sheet in body.get('sheets', [])]
+
+
+class SnapshotStore(object):
+    """每个 (spreadsheetId, sheet) 一个 JSON 快照：{"etag", "fetched", "columns"}；
+    每个 spreadsheet 另存一份表名列表"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get(CACHE_ENV) or DEFAULT_CACHE_DIR
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+    def path_for(self, spreadsheet_id, sheet):
+        key = hashlib.sha1((u"%s|%s" % (spreadsheet_id, sheet)).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def names_path(self, spreadsheet_id):
+        key = hashlib.sha1((u"sheets|%s" % spreadsheet_id).encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, key + ".names.json")
+
+    def _read(self, path):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write(self, path, data):
+        tmp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+        return data
+
+    def load(self, spreadsheet_id, sheet):
+        return self._read(self.path_for(spreadsheet_id, sheet))
+
+    def save(self, spreadsheet_id, sheet, columns, etag):
+        return self._write(self.path_for(spreadsheet_id, sheet),
+                           {"spreadsheetId": spreadsheet_id, "sheet": sheet, "etag": etag,
+                            "fetched": time.time(), "columns": columns})
+
+    def load_sheet_names(self, spreadsheet_id):
+        """缓存的表名列表（没有时 None）"""
+        snap = self._read(self.names_path(spreadsheet_id))
+        return snap["sheets"] if snap else None
+
+    def save_sheet_names(self, spreadsheet_id, names):
+        return self._write(self.names_path(spreadsheet_id),
+                           {"spreadsheetId": spreadsheet_id, "fetched": time.time(),
+                            "sheets": list(names)})
+
+
+def fetch(source, store, spreadsheet_id, sheet, columns=REFERENCE_COLUMNS, etag=None):
+    """一次 batchGet；内容有变化时写快照并返回新快照，没变返回 None"""
+    value_ranges, new_etag = source.batch_get(
+        spreadsheet_id, [a1_range(sheet, c) for c in columns], etag)
+    if value_ranges is None:
+        return None
+    return store.save(spreadsheet_id, sheet, reference_columns(value_ranges), new_etag)
+
+
+def load_or_fetch(source, store, spreadsheet_id, sheet, columns=REFERENCE_COLUMNS):
+    """(columns, from_cache)：有快照直接用，没有才同步拉一次"""
+    snap = store.load(spreadsheet_id, sheet)
+    if snap is not None:
+        return snap["columns"], True
+    return fetch(source, store, spreadsheet_id, sheet, columns)["columns"], False
+
+
+def run_async(work, on_done, deliver=None, on_error=None, name="sheet_snapshot"):
+    """后台线程跑 work()；结果不是 None 时 deliver(on_done, result)"""
+    deliver = deliver or (lambda func, *args: func(*args))
+
+    def run():
+        try:
+            result = work()
+        except Exception as e:
+            if on_error is not None:
+                deliver(on_error, e)
+            else:
+                print(u"[sheet snapshot] 后台刷新失败: %s : %s" % (name, e))
+            return
+        if result is not None:
+            deliver(on_done, result)
+
+    thread = threading.Thread(target=run, name=name)
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def refresh_async(source, store, spreadsheet_id, sheet, on_changed, deliver=None,
+                  columns=REFERENCE_COLUMNS, on_error=None):
+    """
+    后台线程重新拉取；内容变化时 deliver(on_changed, columns)
+    （Maya 里 deliver 传 maya.utils.executeDeferred，回到主线程改界面）。
+    """
+    snap = store.load(spreadsheet_id, sheet)
+    etag = snap.get("etag") if snap else None
+
+    def work():
+        new_snap = fetch(source, store, spreadsheet_id, sheet, columns, etag)
+        return new_snap["columns"] if new_snap is not None else None
+
+    return run_async(work, on_changed, deliver, on_error, name=u"refresh %s" % sheet)
+
+
+def load_sheet_names(source, store, spreadsheet_id):
+    """(表名列表, from_cache)：有缓存直接用，没有才同步拉"""
+    names = store.load_sheet_names(spreadsheet_id)
+    if names is not None:
+        return names, True
+    names = source.sheet_names(spreadsheet_id)
+    store.save_sheet_names(spreadsheet_id, names)
+    return names, False
+
+
+def refresh_sheet_names_async(source, store, spreadsheet_id, on_changed, deliver=None, on_error=None):
+    """后台重新拉表名；和缓存不一样时写缓存并 deliver(on_changed, names)"""
+    cached = store.load_sheet_names(spreadsheet_id)
+
+    def work():
+        names = source.sheet_names(spreadsheet_id)
+        if names == cached:
+            return None
+        store.save_sheet_names(spreadsheet_id, names)
+        return names
+
+    return run_async(work, on_changed, deliver, on_error, name=u"sheet names %s" % spreadsheet_id)
+
+
+# ---------------------------------------------------------------------------
+# stub server (offline testing)
+# ---------------------------------------------------------------------------
+def _parse_a1(a1):
+    """'Sheet'!B2:B -> (sheet, column, start_row)"""
+    sheet, _, cells = a1.rpartition("!")
+    if sheet.startswith("'") and sheet.endswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    first = cells.split(":")[0]
+    column = "".join(c for c in first if c.isalpha())
+    digits = "".join(c for c in first if c.isdigit())
+    return sheet, column, int(digits or 1)
+
+
+def _column_index(column):
+    index = 0
+    for c in column.upper():
+        index = index * 26 + (ord(c) - ord("A") + 1)
+    return index - 1
+
+
+def serve_stub(fixture, port=8765, host="127.0.0.1", block=True):
+    """
+    本地假 Sheets 服务。fixture: JSON 文件或 dict，
+    {spreadsheetId: {sheet 名: [[第 1 行各列], [第 2 行], ...]}}。
+    支持 spreadsheets.get（表名）和 values:batchGet（COLUMNS），带 ETag / 304。
+    block=False 时在后台线程里跑，返回 server（server.shutdown() 结束）。
+    """
+    try:
+        from http.server import BaseHTTPRequestHandler, HTTPServer
+    except ImportError:
+        from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+    if not isinstance(fixture, dict):
+        with open(fixture, "r") as f:
+            fixture = json.load(f)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, body, etag=None):
+            data = json.dumps(body).encode("utf-8")
+            if etag and self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            if etag:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = url.path.split("/")  # ['', 'v4', 'spreadsheets', '<id>[/values:batchGet]', ...]
+            if len(parts) < 4 or parts[1:3] != ["v4", "spreadsheets"]:
+                self.send_error(404)
+                return
+            spreadsheet_id = unquote(parts[3])
+            book = fixture.get(spreadsheet_id)
+            if book is None:
+                self.send_error(404, "unknown spreadsheet")
+                return
+            if len(parts) == 4:
+                self.send_json({"sheets": [{"properties": {"title": name}} for name in book]})
+                return
+            if parts[4] != "values:batchGet":
+                self.send_error(404)
+                return
+            value_ranges = []
+            for a1 in parse_qs(url.query).get("ranges", []):
+                sheet, column, start_row = _parse_a1(a1)
+                rows = book.get(sheet, [])[start_row - 1:]
+                ci = _column_index(column)
+                values = [row[ci] if ci < len(row) else "" for row in rows]
+                while values and values[-1] == "":
+                    values.pop()
+                value_ranges.append({"range": a1, "majorDimension": "COLUMNS",
+                                     "values": [values] if values else []})
+            self.send_json({"spreadsheetId": spreadsheet_id, "valueRanges": value_ranges},
+                           content_etag(value_ranges))
+
+    server = HTTPServer((host, port), Handler)
+    print(u"[sheet snapshot] stub server on http://%s:%d" % (host, server.server_port))
+    if block:
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+        return server
+    thread = threading.Thread(target=server.serve_forever, name="sheet_snapshot_stub")
+    thread.daemon = True
+    thread.start()
+    return server
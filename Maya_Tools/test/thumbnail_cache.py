@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""Local content-addressed thumbnail cache shared by JCQ_BSimageViewer and JCQ_ReferenceTool.
+
+Both tools used to open every source image with PIL, resize it and save it to one
+shared small.png on S: -- synchronously, once per row, with every row (and every
+user) racing on the same file. Here a thumbnail is keyed by
+(source path, mtime, size, thumbnail size, mode) and written once under a local
+cache dir; misses are generated by a small worker pool and handed back through a
+callback, so a tab can be built with placeholders and swap images in as they land.
+
+    cache = thumbnail_cache.get_cache()
+    pic = cmds.picture(image=cache.placeholder((100, 100)))
+    path = cache.request(src, (100, 100), thumbnail_cache.MODE_PAD, fallback=noimage,
+                         on_ready=lambda p: cmds.picture(pic, e=True, image=p),
+                         deliver=maya.utils.executeDeferred)
+    if path:   # already cached
+        cmds.picture(pic, e=True, image=path)
+
+No Maya import here (callbacks are delivered through `deliver`); PIL is imported
+only by the workers.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+MODE_STRETCH = "stretch"  # 直接缩放到目标尺寸（BSimageViewer）
+MODE_PAD = "pad"          # 保持比例缩放，左上角贴到透明底上（ReferenceTool）
+
+CACHE_ENV = "JCQ_THUMBNAIL_CACHE"
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".jcq_tool", "thumbnails")
+PLACEHOLDER_COLOR = (70, 70, 70, 255)
+
+
+def _source_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def cache_key(src, size, mode, stat):
+    text = u"%s|%d|%d|%dx%d|%s" % (os.path.normcase(os.path.abspath(src)), stat[0], stat[1],
+                                   size[0], size[1], mode)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def make_thumbnail(src, dst, size, mode=MODE_STRETCH):
+    """PIL 生成缩略图；先写临时文件再 os.replace，不会有半截文件被读到"""
+    from PIL import Image
+
+    width, height = size
+    original_image = Image.open(src)
+    if mode == MODE_PAD and original_image.size[0] != original_image.size[1]:
+        ratio = original_image.size[0] / float(original_image.size[1])
+        image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+        if ratio > 1:
+            resized_image = original_image.resize((width, int(height / ratio)))
+        else:
+            resized_image = original_image.resize((int(width * ratio), height))
+        image.paste(resized_image, (0, 0))
+    else:
+        image = original_image.resize((width, height))
+    tmp = "%s.%d.%d.tmp" % (dst, os.getpid(), threading.get_ident())
+    try:
+        image.save(tmp, format="PNG")
+        os.replace(tmp, dst)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return dst
+
+
+class ThumbnailCache(object):
+    """缩略图缓存 + 后台生成。同一张图同时被多行请求时只生成一次。"""
+
+    def __init__(self, cache_dir=None, workers=4):
+        self.cache_dir = cache_dir or os.environ.get(CACHE_ENV) or DEFAULT_CACHE_DIR
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = {}   # 缓存文件路径 -> [(on_ready, deliver)]
+        self.stats = {"hits": 0, "misses": 0, "failed": 0}
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".png")
+
+    def placeholder(self, size):
+        """纯色占位图（每个尺寸只生成一次，同步）"""
+        path = os.path.join(self.cache_dir, "placeholder_%dx%d.png" % tuple(size))
+        if not os.path.isfile(path):
+            from PIL import Image
+            tmp = "%s.%d.tmp" % (path, os.getpid())
+            Image.new("RGBA", tuple(size), PLACEHOLDER_COLOR).save(tmp, format="PNG")
+            os.replace(tmp, path)
+        return path
+
+    def resolve(self, src, fallback=None):
+        """(实际使用的源图, stat)；源图不存在时换成 fallback"""
+        stat = _source_stat(src) if src else None
+        if stat is None and fallback:
+            if src:
+                print("Error: " + src + " not found!")
+            src, stat = fallback, _source_stat(fallback)
+        return src, stat
+
+    def lookup(self, src, size, mode=MODE_STRETCH, fallback=None):
+        """已缓存就返回缩略图路径，否则 None（只 stat，不读图）"""
+        src, stat = self.resolve(src, fallback)
+        if stat is None:
+            return None
+        path = self.path_for(cache_key(src, size, mode, stat))
+        return path if os.path.isfile(path) else None
+
+    def get(self, src, size, mode=MODE_STRETCH, fallback=None):
+        """同步取缩略图（没有就当场生成）"""
+        src, stat = self.resolve(src, fallback)
+        if stat is None:
+            return None
+        path = self.path_for(cache_key(src, size, mode, stat))
+        if os.path.isfile(path):
+            self.stats["hits"] += 1
+            return path
+        self.stats["misses"] += 1
+        self._ensure_dir(path)
+        return make_thumbnail(src, path, size, mode)
+
+    def request(self, src, size, mode=MODE_STRETCH, fallback=None, on_ready=None, deliver=None):
+        """
+        已缓存直接返回路径；否则交给后台生成并返回 None，生成完调用
+        deliver(on_ready, path)（deliver 默认直接在工作线程调用，Maya 里传 executeDeferred）。
+        """
+        src, stat = self.resolve(src, fallback)
+        if stat is None:
+            return None
+        path = self.path_for(cache_key(src, size, mode, stat))
+        if os.path.isfile(path):
+            self.stats["hits"] += 1
+            return path
+        self.stats["misses"] += 1
+        with self._lock:
+            waiting = self._pending.get(path)
+            if waiting is not None:
+                waiting.append((on_ready, deliver))
+                return None
+            self._pending[path] = [(on_ready, deliver)]
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._pool.submit(self._build, src, path, tuple(size), mode)
+        return None
+
+    def _ensure_dir(self, path):
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            try:
+                os.makedirs(folder)
+            except OSError:
+                pass  # 其它线程刚建好
+
+    def _build(self, src, path, size, mode):
+        ok = True
+        try:
+            self._ensure_dir(path)
+            make_thumbnail(src, path, size, mode)
+        except Exception as e:
+            print(u"[thumbnail] 生成失败: %s : %s" % (src, e))
+            self.stats["failed"] += 1
+            ok = False
+        with self._lock:
+            waiting = self._pending.pop(path, None) or []
+        if not ok:
+            return
+        for on_ready, deliver in waiting:
+            if on_ready is None:
+                continue
+            if deliver is None:
+                on_ready(path)
+            else:
+                deliver(on_ready, path)
+
+    def shutdown(self, wait=False):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None
+
+
+_CACHE = None
+
+
+def get_cache():
+    """进程内共用的一个缓存 / 线程池"""
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ThumbnailCache()
+    return _CACHE
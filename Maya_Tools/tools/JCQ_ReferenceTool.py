@@ -1,4 +1,9 @@
+import time
+_IMPORT_START = time.perf_counter()
 import maya.cmds as cmds
+import maya.utils
+import inspect
+import importlib
 import sys
 # 获取 Maya 内置 Python 解释器的版本信息
 maya_python_version = sys.version_info[:3]
@@ -12,14 +17,31 @@ elif maya_python_version == (3, 9, 7):
 sys.path.insert(0,subsyspath)
 import io
 import os.path
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-from PIL import Image
 import json
+# google.oauth2 / googleapiclient 在第一次联网时才导入（_build_service）
+
+# test/ 下的共用模块
+_TEST_DIR = os.path.dirname(inspect.getfile(inspect.currentframe())).replace("tools", "test")
+if _TEST_DIR not in sys.path:
+    sys.path.append(_TEST_DIR)
+# 不 reload：进程里只有一个缩略图缓存 / 线程池，和 BSimageViewer 共用
+import thumbnail_cache
+import sheet_snapshot
+importlib.reload(sheet_snapshot)
+import reference_browser
+importlib.reload(reference_browser)
+from maya import OpenMayaUI as omui
+try:
+    from PySide2 import QtWidgets
+    from shiboken2 import getCppPointer, wrapInstance
+except ImportError:
+    from PySide6 import QtWidgets
+    from shiboken6 import getCppPointer, wrapInstance
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
 
 class JCQ_Reference_Tool():
     def __init__(self):
+        start = time.perf_counter()
         with open('S:\Public\qiu_yi\JCQ_Tool\data\proptool_projectfile.json', 'r') as f:
             self.project_dir = json.load(f)
         self.project_List = None
@@ -27,11 +49,37 @@ class JCQ_Reference_Tool():
         self.imagesize_textField = None
         self.SCOPES = ['https://www.googleapis.com/auth/spreadsheets.readonly']
         self.SERVICE_ACCOUNT_FILE = 'S:/Public/qiu_yi/JCQ_Tool/data/project-gomapy-d737ea76a8ff.json'
-        self.creds = service_account.Credentials.from_service_account_file(self.SERVICE_ACCOUNT_FILE, scopes=self.SCOPES)
-        self.service = build('sheets', 'v4', credentials=self.creds)
+        self.creds = None
+        # 表格数据：一次 batchGet + 本地快照（JCQ_SHEETS_ENDPOINT 指向 stub 时离线可用）
+        # Sheets 客户端第一次联网时才建
+        self.sheet_source = sheet_snapshot.SheetSource(service_factory=self._build_service)
+        self.sheet_store = sheet_snapshot.SnapshotStore()
         self.projectname_list = list(self.project_dir.keys())
         self.default_Image_Path = 'S:/Public/qiu_yi/JCQ_Tool/data/images/'
         self.main_tabLayout = None
+        self.browsers = {}  # 表名 -> (tab 的 paneLayout, ReferenceBrowser)
+        self.timings = {"module import": _IMPORT_SECONDS, "project list": time.perf_counter() - start}
+
+    @property
+    def service(self):
+        return self.sheet_source.service
+
+    def _build_service(self):
+        """导入 googleapiclient、读服务帐号凭据、建 Sheets 客户端，各步耗时打印出来"""
+        t0 = time.perf_counter()
+        from google.oauth2 import service_account
+        from googleapiclient.discovery import build
+        t1 = time.perf_counter()
+        self.creds = service_account.Credentials.from_service_account_file(self.SERVICE_ACCOUNT_FILE, scopes=self.SCOPES)
+        t2 = time.perf_counter()
+        service = build('sheets', 'v4', credentials=self.creds)
+        t3 = time.perf_counter()
+        self.timings.update({"google imports": t1 - t0, "credentials": t2 - t1, "discovery build": t3 - t2})
+        # 可能在后台线程里，打印放回主线程
+        maya.utils.executeDeferred(
+            print, "[Reference Tool] Sheets client: imports {:.3f}s, credentials {:.3f}s, discovery build {:.3f}s".format(
+                t1 - t0, t2 - t1, t3 - t2))
+        return service
 
     def errerwindow(self,text):
         error_window = cmds.window(title="Error", sizeable=True, resizeToFitChildren=True)
@@ -47,63 +95,6 @@ class JCQ_Reference_Tool():
             cmds.text(label=text, backgroundColor=(1, 0, 0), font="boldLabelFont", width=300, height=50)
             cmds.showWindow(error_window)
 
-        def sheet_item(sheet_id, sheet, start_column, end_column, ignore_empty_or_length):
-            range_string = f'{sheet}!{start_column}:{end_column}'
-            result = self.service.spreadsheets().values().get(spreadsheetId=sheet_id, range=range_string).execute()
-            values = result.get('values', [])
-            list = []
-            if not ignore_empty_or_length:
-                if values:
-                    for row in values:
-                        if row:  # 忽略空行
-                            list.append(row[0])
-                return list
-            else:
-                if values:
-                    for row in values:
-                        if row:  # 忽略空行
-                            list.append(row[0])
-                        else:
-                            list.append("")
-                    if len(list) < ignore_empty_or_length:
-                        for i in range(ignore_empty_or_length - len(list)):
-                            list.append("")
-                else:
-                    list = [''] * ignore_empty_or_length
-                return list
-
-        def createsmallimage(image_path):
-            if image_path and not image_path.endswith("\\"):
-                try:
-                    # 尝试打开第一个文件
-                    original_image = Image.open(image_path)
-                except FileNotFoundError:
-                    # 如果第一个文件不存在，切换到第二个路径并打开文件
-                    try:
-                        original_image = Image.open(self.default_Image_Path+"noimage.png")
-                    except FileNotFoundError:
-                        # 如果两个路径都不存在文件，打印错误消息并退出程序
-                        print("Error: image file not found!")
-                        sys.exit(1)
-            else:
-                original_image = Image.open(self.default_Image_Path+"noimage.png")
-
-            width, height = original_image.size
-            i = width / height
-            if i == 1:
-                resized_image = original_image.resize((list_height, list_height))
-                resized_image.save(self.default_Image_Path+"small.png")
-            else:
-                padded_image = Image.new('RGBA', (list_height, list_height), (0, 0, 0, 0))
-                if i > 1:
-                    resized_image = original_image.resize((list_height, int(list_height / i)))
-                else:
-                    resized_image = original_image.resize((int(list_height * i), list_height))
-                padded_image.paste(resized_image, (0, 0))
-                padded_image.save(self.default_Image_Path+"small.png")
-
-            return self.default_Image_Path+"small.png"
-
         def Import_Reference_btn(namespace, path, file):
             import os
             full_path = os.path.join(path, file)
@@ -132,39 +123,23 @@ class JCQ_Reference_Tool():
             except Exception as e:
                 print(f"File read fail: {e}")
 
-        def create_Tab(sheet_name):
-            tab_names = cmds.tabLayout(self.main_tabLayout, query=True, childArray=True)
-
-            def clear_layout(layout):
-                children = cmds.layout(sheet_name + 'scrolllayout', q=True, childArray=True)
-                if children:
-                    for child in children:
-                        cmds.deleteUI(child)
-                clearlayoutcount = True
-
-            if tab_names:
-                if sheet_name + 'scrolllayout' in tab_names:
-                    # cmds.tabLayout(self.main_tabLayout, edit=True, deleteTab=selected_item)
-                    # cmds.deleteUI(selected_item+'scrolllayout',uiTemplate=True)
-                    clear_layout(sheet_name + 'scrolllayout')
-                    cmds.setParent(sheet_name + 'scrolllayout')
-                    # return
-                else:
-                    scrollLayout = cmds.scrollLayout(
-                        sheet_name + 'scrolllayout',
-                        horizontalScrollBarThickness=16,
-                        verticalScrollBarThickness=16,
-                    )
-                    cmds.tabLayout(self.main_tabLayout, edit=True, tp="west", tabLabel=((scrollLayout, sheet),))
-                    cmds.setParent(sheet_name + 'scrolllayout')
-            else:
-                scrollLayout = cmds.scrollLayout(
-                    sheet_name + 'scrolllayout',
-                    horizontalScrollBarThickness=16,
-                    verticalScrollBarThickness=16,
-                )
-                cmds.tabLayout(self.main_tabLayout, edit=True, tp="west", tabLabel=((scrollLayout, sheet),))
-                cmds.setParent(sheet_name + 'scrolllayout')
+        def browser_tab(sheet_name):
+            # 每张表一个 tab，里面只有一个 Qt 虚拟列表（只画可见行，缩略图滚到才加载）
+            pane, browser = self.browsers.get(sheet_name, (None, None))
+            if pane is not None and cmds.paneLayout(pane, exists=True):
+                return pane, browser
+            cmds.setParent(self.main_tabLayout)
+            pane = cmds.paneLayout(sheet_name + 'browserlayout', configuration="single")
+            cmds.tabLayout(self.main_tabLayout, edit=True, tp="west", tabLabel=((pane, sheet_name),))
+            # 以 paneLayout 为父（生命周期交给 Maya 的 tab），再挂进 Maya layout
+            pane_ptr = omui.MQtUtil.findLayout(pane)
+            browser = reference_browser.ReferenceBrowser(on_import=Import_Reference_btn,
+                                                         fallback=self.default_Image_Path + "noimage.png",
+                                                         thumb_size=list_height,
+                                                         parent=wrapInstance(int(pane_ptr), QtWidgets.QWidget))
+            omui.MQtUtil.addWidgetToMayaLayout(int(getCppPointer(browser)[0]), int(pane_ptr))
+            self.browsers[sheet_name] = (pane, browser)
+            return pane, browser
 
         list_height = int(cmds.textFieldGrp(self.imagesize_textField, query=True, text=True))
         try:
@@ -180,56 +155,64 @@ class JCQ_Reference_Tool():
 
         project = cmds.optionMenu(self.project_List, query=True, value=True)
         sheet = cmds.optionMenu(self.sheet_list, query=True, value=True)
+        if not sheet:
+            errerwindow("sheet list is still loading, try again in a moment")
+            return
 
         sheetId = self.project_dir[project]
 
-        Name_ls = sheet_item(sheetId, sheet, "A2", "A", 0)
-        Namespace_ls = sheet_item(sheetId, sheet, "B2", "B", len(Name_ls))
-        image_path_ls = sheet_item(sheetId, sheet, "D2", "D", len(Name_ls))
-        image_name_ls = sheet_item(sheetId, sheet, "E2", "E", len(Name_ls))
-        flie_path_ls = sheet_item(sheetId, sheet, "F2", "F", len(Name_ls))
-        file_name_ls = sheet_item(sheetId, sheet, "G2", "G", len(Name_ls))
-
-        # print(Namespace_ls)
-
-        cmds.setParent(self.main_tabLayout)
-        create_Tab(sheet)
-
-        # 创建
-        if Name_ls:
-            Name_lsmax_len = max(len(max(Name_ls, key=len)) * 9+20, 20)
-            Namespace_lsmax_len = max(len(max(Namespace_ls, key=len)) * 9+20, 20)
-            x=1
-            for i in range(len(Name_ls)):
-                cmds.rowLayout(numberOfColumns=4, columnWidth4=(Name_lsmax_len, Namespace_lsmax_len, list_height + 20, 100), adjustableColumn=4,
-                               columnAttach=[(1, 'both', 0), (2, 'both', 0), (3, 'both', 0), (4, 'both', 0)])
-                n = i
-                cmds.text(label=str(x)+". "+Name_ls[n])
-                cmds.text(label=Namespace_ls[n])
-                cmds.picture(image=createsmallimage(image_path_ls[n] + "\\" + image_name_ls[n]), height=list_height)
-                # print(image_path_ls[n]+ "/" + image_name_ls[n])
-                button = cmds.button(Namespace_ls[n] + "button", label="Import Reference",
-                                     command=lambda x, namespace=Namespace_ls[n], path=flie_path_ls[n],
-                                                    file=file_name_ls[n]: Import_Reference_btn(
-                                         namespace, path, file))
-                cmds.setParent('..')
-                x=x+1
-        cmds.tabLayout(self.main_tabLayout, edit=True, selectTab=sheet + 'scrolllayout')
+        def build_tab(columns, select=True):
+            pane, browser = browser_tab(sheet)
+            browser.set_thumb_size(list_height)
+            browser.set_columns(columns)
+            if select:
+                cmds.tabLayout(self.main_tabLayout, edit=True, selectTab=pane)
+
+        def on_sheet_changed(columns):
+            # 后台刷新发现表格有变化：窗口还在就重建这个 tab（不切换当前 tab）
+            if cmds.tabLayout(self.main_tabLayout, exists=True):
+                print("[Reference Tool] {} updated from Google Sheets".format(sheet))
+                build_tab(columns, select=False)
+
+        # 有快照先用快照建 tab，再后台拉一次；没有快照才同步拉（一次 batchGet）
+        columns, from_cache = sheet_snapshot.load_or_fetch(self.sheet_source, self.sheet_store, sheetId, sheet)
+        build_tab(columns)
+        if from_cache:
+            sheet_snapshot.refresh_async(self.sheet_source, self.sheet_store, sheetId, sheet,
+                                         on_changed=on_sheet_changed, deliver=maya.utils.executeDeferred)
 
     def create_Window(self):
 
         def open_ReferenceEditor(*args):
             cmds.ReferenceEditor()
 
-        def change_prop_list(selection):
-            sheetId = self.project_dir[selection]
-            sheet_metadata = self.service.spreadsheets().get(spreadsheetId=sheetId).execute()
-            sheets = sheet_metadata.get('sheets', [])
-            all_sheet_names = [sheet.get('properties', {}).get('title', 'Sheet1') for sheet in sheets]
+        def fill_sheet_list(all_sheet_names):
+            if not cmds.optionMenu(self.sheet_list, exists=True):
+                return
+            current = None
+            if cmds.optionMenu(self.sheet_list, query=True, numberOfItems=True):
+                current = cmds.optionMenu(self.sheet_list, query=True, value=True)
             cmds.optionMenu(self.sheet_list, edit=True, deleteAllItems=True)
             for project_name in all_sheet_names:
                 cmds.menuItem(label=project_name, parent=self.sheet_list)
+            if current in all_sheet_names:
+                cmds.optionMenu(self.sheet_list, edit=True, value=current)
+
+        def change_prop_list(selection):
+            # 先用缓存的表名，后台再拉一次，有变化才更新下拉列表
+            sheetId = self.project_dir[selection]
+            fill_sheet_list(self.sheet_store.load_sheet_names(sheetId) or [])
+
+            def on_names_changed(all_sheet_names):
+                if (cmds.optionMenu(self.project_List, exists=True) and
+                        cmds.optionMenu(self.project_List, query=True, value=True) == selection):
+                    fill_sheet_list(all_sheet_names)
+
+            sheet_snapshot.refresh_sheet_names_async(self.sheet_source, self.sheet_store, sheetId,
+                                                     on_changed=on_names_changed,
+                                                     deliver=maya.utils.executeDeferred)
 
+        start = time.perf_counter()
         # 创建主窗口
         JCQ_RT_N = "JCQ_Reference_Tool"
         JCQ_RT_T = "JCQ Reference Tool"
@@ -277,6 +260,10 @@ class JCQ_Reference_Tool():
 
         # 显示主窗口
         cmds.showWindow(window)
+        self.timings["window"] = time.perf_counter() - start
+        print("[Reference Tool] start-up: " + ", ".join(
+            "{} {:.3f}s".format(k, self.timings[k]) for k in ("module import", "project list", "window")) +
+            " (Sheets client deferred until first fetch)")
 
 JCQ_BSimageViewer_GUI  = JCQ_Reference_Tool()
 JCQ_BSimageViewer_GUI.create_Window()
\ No newline at end of file
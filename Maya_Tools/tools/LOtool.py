@@ -7,7 +7,68 @@ from maya import OpenMayaUI as omui
 import shiboken2
 import getpass
 import json
+import sys
+import importlib
 import maya.mel as mel
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# test/ 下的共用模块（与 mask_node.py 同目录）
+_TEST_DIR = os.path.dirname(inspect.getfile(inspect.currentframe())).replace("tools", "test")
+if _TEST_DIR not in sys.path:
+    sys.path.append(_TEST_DIR)
+import a2f_curve_writer
+importlib.reload(a2f_curve_writer)
+import a2f_stream
+importlib.reload(a2f_stream)
+
+
+def compile_facs_mapping(setting_data, facsNames, use_defaults=True):
+    """把 LOarkit52.json 映射编译成 facs -> (controller, attr) 的稀疏系数表。
+    通道值 = default + Σ weight[facs] * (base - default)；返回 (channels, coeffs, offsets)
+    channels: [(controller, attr)]，coeffs: 每个 facs 一行 [(channel_index, base - default)]"""
+    default_value_map = setting_data.get("__defaultValues__", {}) if use_defaults else {}
+    channels, index = [], {}
+    coeffs = []
+    for facsName in facsNames:
+        row = []
+        for controller, attrs in (setting_data.get(facsName) or {}).items():
+            for attr, base_value in attrs.items():
+                key = (controller, attr)
+                if key not in index:
+                    index[key] = len(channels)
+                    channels.append(key)
+                default_val = default_value_map.get(controller, {}).get(attr, 0.0)
+                row.append((index[key], base_value - default_val))
+        coeffs.append(row)
+    offsets = [default_value_map.get(c, {}).get(a, 0.0) for c, a in channels]
+    return channels, coeffs, offsets
+
+
+def solve_facs_curves(weightMat, channels, coeffs, offsets):
+    """一次求出所有帧：values = weightMat(frames x facs) @ M(facs x channels) + offsets。
+    返回每个通道一条曲线的值列表（与 channels 同序）"""
+    if not channels:
+        return []
+    if np is not None:
+        m = np.zeros((len(coeffs), len(channels)))
+        for f, row in enumerate(coeffs):
+            for c, k in row:
+                m[f, c] += k
+        w = np.asarray(weightMat, dtype=float)
+        return (w @ m + np.asarray(offsets)).T.tolist()
+    # 无 numpy：按列累加（每个 facs 列只转置一次）
+    curves = [[off] * len(weightMat) for off in offsets]
+    for f, row in enumerate(coeffs):
+        if not row:
+            continue
+        col = [frame[f] for frame in weightMat]
+        for c, k in row:
+            curves[c] = [v + k * w for v, w in zip(curves[c], col)]
+    return curves
+
 
 class LOtool(QtWidgets.QWidget):
     def __init__(self):
@@ -91,6 +152,15 @@ class LOtool(QtWidgets.QWidget):
                 self.namespace_combo = QtWidgets.QComboBox()
                 self.update_namespace_list()
 
+                label_keys = QtWidgets.QLabel("Existing Keys / Tangent:")
+                self.clear_combo = QtWidgets.QComboBox()
+                for text, policy in (("Replace import range", a2f_curve_writer.CLEAR_RANGE),
+                                     ("Clear all keys", a2f_curve_writer.CLEAR_ALL),
+                                     ("Keep & merge", a2f_curve_writer.CLEAR_NONE)):
+                    self.clear_combo.addItem(text, policy)
+                self.tangent_combo = QtWidgets.QComboBox()
+                self.tangent_combo.addItems(a2f_curve_writer.TANGENT_TYPES)
+
                 self.checkbox_importWAV = QtWidgets.QCheckBox("Import WAV File")
                 self.checkbox_onlyFirstFrame = QtWidgets.QCheckBox("Only First Frame")
 
@@ -119,9 +189,13 @@ class LOtool(QtWidgets.QWidget):
                 namespace_layout.addWidget(refresh_button)
                 layout.addLayout(namespace_layout, 4, 1, 1, 2)
 
-                #layout.addWidget(self.checkbox_importWAV, 5, 0)
-                #layout.addWidget(self.checkbox_onlyFirstFrame, 5, 0)
-                layout.addWidget(button_import, 5, 1, 1, 2)
+                layout.addWidget(label_keys, 5, 0)
+                layout.addWidget(self.clear_combo, 5, 1)
+                layout.addWidget(self.tangent_combo, 5, 2)
+
+                #layout.addWidget(self.checkbox_importWAV, 6, 0)
+                #layout.addWidget(self.checkbox_onlyFirstFrame, 6, 0)
+                layout.addWidget(button_import, 6, 1, 1, 2)
 
                 self.setLayout(layout)
                 self.setWindowFlags(self.windowFlags() | QtCore.Qt.WindowStaysOnTopHint)
@@ -141,13 +215,58 @@ class LOtool(QtWidgets.QWidget):
                 for ns in sorted(namespaces):
                     self.namespace_combo.addItem(ns)
 
+            def write_solved_curves(self, a2f_reader, setting_data, startframe, namespace, use_defaults=True):
+                """weightMat 分块读取：每块一次矩阵求解，交给共用 curve writer 整段写入。
+                内存只与块大小有关，与 take 长度无关。
+                返回 (受影响的控制器, 失败通道 [(plug, error)])；数据损坏时撤掉已写入的部分再抛出"""
+                channels, coeffs, offsets = compile_facs_mapping(setting_data, a2f_reader.facsNames, use_defaults)
+                width = a2f_reader.numPoses
+                written = []  # 已写入的块；weightMat 边写边解析，坏数据可能在中途才报错
+
+                def solved_chunks():
+                    for start, n, flat in a2f_reader.chunks():
+                        if np is not None:
+                            rows = np.frombuffer(flat, dtype=np.float32).reshape(n, width)
+                        else:
+                            rows = a2f_stream.as_rows(flat, width)
+                        times = [startframe + start + i for i in range(n)]
+                        yield times, solve_facs_curves(rows, channels, coeffs, offsets)
+                        written.append(n)
+
+                jobs = []
+                for controller, attr in channels:
+                    ctrl = f"{namespace}:{controller}" if namespace else controller
+                    jobs.append(f"{ctrl}.{attr}")
+                tangent = self.tangent_combo.currentText()
+                try:
+                    result = a2f_curve_writer.write_chunked(
+                        jobs, solved_chunks(), itt="auto" if tangent == "step" else tangent, ott=tangent,
+                        clear=self.clear_combo.currentData())
+                except Exception:
+                    if written:
+                        cmds.undo()  # 撤掉 write_chunked 的整个 chunk，不留半截导入
+                    raise
+                failed = set(plug for plug, _ in result["failed"])
+                return set(plug.rsplit(".", 1)[0] for plug in jobs if plug not in failed), result["failed"]
+
+            def report_import(self, failed):
+                if not failed:
+                    QtWidgets.QMessageBox.information(self, "", "Import succeeded", QtWidgets.QMessageBox.Ok)
+                    return
+                lines = [f"{plug}: {e}" for plug, e in failed[:20]]
+                if len(failed) > 20:
+                    lines.append(f"... ({len(failed) - 20} more, see Script Editor)")
+                QtWidgets.QMessageBox.warning(
+                    self, "Import incomplete",
+                    f"{len(failed)} channel(s) failed:\n" + "\n".join(lines), QtWidgets.QMessageBox.Ok)
+
             def a2fjsonpath(self):
                 default_dir = r"K:\LO\11_Users\Q\100020702_1408room2_animation_A2F"
                 filePath, _ = QtWidgets.QFileDialog.getOpenFileName(
                     self,
                     "Select Facial Animation JSON",
                     default_dir,  # 设置默认路径
-                    "JSON Files (*.json)"
+                    "Facial Data (*.json *.a2fb)"
                 )
                 if filePath:
                     self.text_facialAnimPath.setText(filePath)
@@ -163,47 +282,28 @@ class LOtool(QtWidgets.QWidget):
                 a2f_json_path = self.text_facialAnimPath.text()
                 setting_path = 'S:/Public/qiu_yi/JCQ_Tool/data/LOarkit52.json'
                 try:
-                    with open(a2f_json_path, 'r') as file:
-                        a2f_json_data = json.load(file)
                     with open(setting_path, 'r') as file:
                         setting_data = json.load(file)
+                    a2f_reader = a2f_stream.open_a2f(a2f_json_path)
                 except Exception as e:
                     QtWidgets.QMessageBox.warning(self, "Load Error", str(e), QtWidgets.QMessageBox.Ok)
                     return
 
-                numFrames = a2f_json_data['numFrames']
-                facsNames = a2f_json_data['facsNames']
-                weightMat = a2f_json_data['weightMat']
                 selected_namespace = self.namespace_combo.currentText()
 
-                # === 提取默认值表 ===
-                default_value_map = setting_data.get("__defaultValues__", {})
-
-                for frame_index in range(numFrames):
-                    controller_values = {}
-                    for facsIndex, facsName in enumerate(facsNames):
-                        weight = weightMat[frame_index][facsIndex]
-                        if weight == 0: continue
-                        if facsName in setting_data:
-                            facs_values = setting_data[facsName]
-                            for controller, attrs in facs_values.items():
-                                for attr, base_value in attrs.items():
-                                    # === 应用默认值修正逻辑 ===
-                                    default_val = default_value_map.get(controller, {}).get(attr, 0.0)
-                                    final_value = weight * (base_value - default_val) + default_val
-
-                                    controller_values.setdefault(controller, {}).setdefault(attr, 0)
-                                    controller_values[controller][attr] += final_value
-
-                    for controller, attrs in controller_values.items():
-                        for attr, value in attrs.items():
-                            ctrl = f"{selected_namespace}:{controller}" if selected_namespace else controller
-                            try:
-                                cmds.setAttr(f"{ctrl}.{attr}", value)
-                                cmds.setKeyframe(f"{ctrl}.{attr}", time=startframe + frame_index)
-                                affected_controllers.add(ctrl.split('.')[0])
-                            except Exception as e:
-                                print(f"设置关键帧失败: {ctrl}.{attr} = {value}，错误：{e}")
+                with a2f_reader:
+                    if not a2f_reader.numFrames:
+                        QtWidgets.QMessageBox.warning(self, "", "No frames in JSON", QtWidgets.QMessageBox.Ok)
+                        return
+
+                    # === 映射只编译一次（含默认值修正），每块一次矩阵求解，每个通道整段写入 ===
+                    try:
+                        controllers, failed = self.write_solved_curves(
+                            a2f_reader, setting_data, startframe, selected_namespace)
+                    except Exception as e:
+                        QtWidgets.QMessageBox.warning(self, "Load Error", str(e), QtWidgets.QMessageBox.Ok)
+                        return
+                    affected_controllers |= controllers
 
                 set_name = f"{selected_namespace}A2FcontrolerSet" if selected_namespace else "A2FcontrolerSet"
                 if not cmds.objExists(set_name):
@@ -217,7 +317,7 @@ class LOtool(QtWidgets.QWidget):
                 else:
                     print(f"Set {set_name} 已存在，未添加任何对象。")
 
-                QtWidgets.QMessageBox.information(self, "", "Import succeeded", QtWidgets.QMessageBox.Ok)
+                self.report_import(failed)
 
 
             def browseFacialAnimation2(self):
@@ -232,43 +332,28 @@ class LOtool(QtWidgets.QWidget):
                 setting_path = 'S:/Public/qiu_yi/JCQ_Tool/data/LOarkit52.json'
                 #setting_path = 'S:/Public/qiu_yi/JCQ_Tool/data/LOarkit52_v2.json'
                 try:
-                    with open(a2f_json_path, 'r') as file:
-                        a2f_json_data = json.load(file)
                     with open(setting_path, 'r') as file:
                         setting_data = json.load(file)
+                    a2f_reader = a2f_stream.open_a2f(a2f_json_path)
                 except Exception as e:
                     QtWidgets.QMessageBox.warning(self, "Load Error", str(e), QtWidgets.QMessageBox.Ok)
                     return
 
-                numFrames = a2f_json_data['numFrames']
-                facsNames = a2f_json_data['facsNames']
-                weightMat = a2f_json_data['weightMat']
                 selected_namespace = self.namespace_combo.currentText()
 
-                for frame_index in range(numFrames):
-                    controller_values = {}
-                    for facsIndex, facsName in enumerate(facsNames):
-                        weight = weightMat[frame_index][facsIndex]
-                        if weight == 0: continue
-                        if facsName in setting_data:
-                            facs_values = setting_data[facsName]
-                            for controller, attrs in facs_values.items():
-                                #if "Eye" in controller: continue
-                                for attr, value in attrs.items():
-                                    weighted_value = weight * value
-                                    controller_values.setdefault(controller, {}).setdefault(attr, 0)
-                                    controller_values[controller][attr] += weighted_value
-                                    #controller_values[controller][attr] = max(-1.0, min(1.0, controller_values[controller][attr]))
-
-                    for controller, attrs in controller_values.items():
-                        for attr, value in attrs.items():
-                            ctrl = f"{selected_namespace}:{controller}" if selected_namespace else controller
-                            try:
-                                cmds.setAttr(f"{ctrl}.{attr}", value)
-                                cmds.setKeyframe(f"{ctrl}.{attr}", time=startframe + frame_index)
-                                affected_controllers.add(ctrl.split('.')[0])
-                            except Exception as e:
-                                print(f"设置关键帧失败: {ctrl}.{attr} = {value}，错误：{e}")
+                with a2f_reader:
+                    if not a2f_reader.numFrames:
+                        QtWidgets.QMessageBox.warning(self, "", "No frames in JSON", QtWidgets.QMessageBox.Ok)
+                        return
+
+                    # 无默认值修正：通道值 = Σ weight * value
+                    try:
+                        controllers, failed = self.write_solved_curves(
+                            a2f_reader, setting_data, startframe, selected_namespace, use_defaults=False)
+                    except Exception as e:
+                        QtWidgets.QMessageBox.warning(self, "Load Error", str(e), QtWidgets.QMessageBox.Ok)
+                        return
+                    affected_controllers |= controllers
 
                 set_name = f"{selected_namespace}A2FcontrolerSet" if selected_namespace else "A2FcontrolerSet"
                 if not cmds.objExists(set_name):
@@ -282,7 +367,7 @@ class LOtool(QtWidgets.QWidget):
                 else:
                     print(f"Set {set_name} 已存在，未添加任何对象。")
 
-                QtWidgets.QMessageBox.information(self, "", "Import succeeded", QtWidgets.QMessageBox.Ok)
+                self.report_import(failed)
 
         self.facial_importer_window = MyWindow()
 
@@ -1,11 +1,34 @@
 # -*- coding: utf-8 -*-
+import heapq
+import inspect
+import os
+import sys
+import time
+from array import array
+
 import maya.cmds as cmds
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
 try:
     from PySide6 import QtWidgets, QtCore, QtGui
 except ImportError:
     from PySide2 import QtWidgets, QtCore, QtGui
 from maya import OpenMayaUI as omui
 import shiboken2
+try:
+    import numpy as np
+    from scipy.spatial import cKDTree
+except ImportError:
+    np = cKDTree = None
+
+# test/ 下的共用模块
+_TEST_DIR = os.path.dirname(inspect.getfile(inspect.currentframe())).replace("tools", "test")
+if _TEST_DIR not in sys.path:
+    sys.path.append(_TEST_DIR)
+import api_undo
+
+BATCH_CHUNK = 20000        # 一次批量查询 / 混合的目标顶点数（控制内存）
+BARY_CANDIDATES = 8        # barycentric：每个目标点检查的候选三角形数（按三角形中心最近）
 
 
 def maya_main_window():
@@ -13,6 +36,226 @@ def maya_main_window():
     return shiboken2.wrapInstance(int(ptr), QtWidgets.QWidget)
 
 
+def spatial_engine():
+    """批量引擎（numpy + scipy cKDTree）可用时返回它的名字，否则逐顶点的纯 Python 引擎"""
+    return "numpy+cKDTree" if cKDTree is not None else "python"
+
+
+def closest_barycentric(p, a, b, c):
+    """p 到三角形 abc 的最近点的重心坐标 (u, v, w)，全部按最后一维向量化
+    （Ericson, Real-Time Collision Detection 5.1.5 的分区判断）"""
+    ab, ac = b - a, c - a
+    ap, bp, cp = p - a, p - b, p - c
+    d1, d2 = (ab * ap).sum(-1), (ac * ap).sum(-1)
+    d3, d4 = (ab * bp).sum(-1), (ac * bp).sum(-1)
+    d5, d6 = (ab * cp).sum(-1), (ac * cp).sum(-1)
+    va, vb, vc = d3 * d6 - d5 * d4, d5 * d2 - d1 * d6, d1 * d4 - d3 * d2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        denom = va + vb + vc
+        v, w = vb / denom, vc / denom
+        t_ab = d1 / (d1 - d3)
+        t_ac = d2 / (d2 - d6)
+        t_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+    u = 1.0 - v - w
+    # 按优先级倒着覆盖：A > B > AB > C > AC > BC > 面内
+    zero, one = np.zeros_like(u), np.ones_like(u)
+    regions = (
+        ((va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0), (zero, 1.0 - t_bc, t_bc)),
+        ((vb <= 0) & (d2 >= 0) & (d6 <= 0), (1.0 - t_ac, zero, t_ac)),
+        ((d6 >= 0) & (d5 <= d6), (zero, zero, one)),
+        ((vc <= 0) & (d1 >= 0) & (d3 <= 0), (1.0 - t_ab, t_ab, zero)),
+        ((d3 >= 0) & (d4 <= d3), (zero, one, zero)),
+        ((d1 <= 0) & (d2 <= 0), (one, zero, zero)),
+    )
+    for mask, (ru, rv, rw) in regions:
+        u, v, w = np.where(mask, ru, u), np.where(mask, rv, v), np.where(mask, rw, w)
+    bary = np.stack((u, v, w), -1)
+    bary[~np.isfinite(bary).all(-1)] = (1.0, 0.0, 0.0)   # 退化三角形
+    return bary
+
+
+class KDTree(object):
+    """Static 3D kd-tree over a list of (x, y, z) points."""
+
+    def __init__(self, points, leaf_size=8):
+        self.points = points
+        self.leaf_size = leaf_size
+        self.root = self._build(list(range(len(points))), 0)
+
+    def _build(self, idx, depth):
+        if len(idx) <= self.leaf_size:
+            return (None, None, None, None, idx)
+        axis = depth % 3
+        pts = self.points
+        idx.sort(key=lambda i: pts[i][axis])
+        mid = len(idx) // 2
+        return (axis, pts[idx[mid]][axis],
+                self._build(idx[:mid], depth + 1),
+                self._build(idx[mid:], depth + 1), None)
+
+    def query(self, p, k=1):
+        """Return the k nearest points as a sorted list of (squared distance, index)."""
+        px, py, pz = p[0], p[1], p[2]
+        pts = self.points
+        heap = []
+
+        def visit(node):
+            axis, split, lo, hi, leaf = node
+            if leaf is not None:
+                for i in leaf:
+                    q = pts[i]
+                    d2 = (q[0] - px) ** 2 + (q[1] - py) ** 2 + (q[2] - pz) ** 2
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d2, i))
+                    elif d2 < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d2, i))
+                return
+            diff = p[axis] - split
+            near, far = (lo, hi) if diff < 0 else (hi, lo)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        visit(self.root)
+        return sorted((-d2, i) for d2, i in heap)
+
+
+class SpatialSource(object):
+    """Closest-point lookup over one skinned source mesh, built once and
+    reused for every target the source feeds.
+
+    Two engines share it: batch_weights() answers all target points at once
+    with numpy + scipy cKDTree (source points / triangle centroids indexed
+    once); samples() + blend() are the per-vertex pure Python fallback
+    (kd-tree, Maya's mesh intersector). Every index is built lazily for the
+    modes that need it."""
+
+    def __init__(self, fn, dag, comp, n_vtx, infs):
+        self.infs = infs
+        weights, n_inf = fn.getWeights(dag, comp)
+        self.weights = array('d', weights)
+        self.n_inf = n_inf
+        self.dag = om2.MDagPath(dag)
+        self.mesh_fn = om2.MFnMesh(self.dag)
+        self._rows = None
+        self._kdtree = None
+        self._intersector = None
+        self._points = None
+        self._ctree = None
+        self._triangles = None
+
+    @property
+    def rows(self):
+        """稀疏行 [(influence 列, 权重), ...]（纯 Python 引擎用）"""
+        if self._rows is None:
+            n_inf, weights = self.n_inf, self.weights
+            self._rows = []
+            for b in range(0, len(weights), n_inf):
+                row = weights[b:b + n_inf]
+                self._rows.append([(c, w) for c, w in enumerate(row) if w > 0.0])
+        return self._rows
+
+    @property
+    def points(self):
+        if self._points is None:
+            self._points = np.array([(p.x, p.y, p.z) for p in self.mesh_fn.getPoints(om2.MSpace.kWorld)])
+        return self._points
+
+    @property
+    def ctree(self):
+        if self._ctree is None:
+            self._ctree = cKDTree(self.points)
+        return self._ctree
+
+    @property
+    def triangles(self):
+        """(三角形顶点表 (T, 3), 三角形中心的 cKDTree)"""
+        if self._triangles is None:
+            _, verts = self.mesh_fn.getTriangles()
+            tris = np.array(verts, dtype=np.int64).reshape(-1, 3)
+            self._triangles = (tris, cKDTree(self.points[tris].mean(axis=1)))
+        return self._triangles
+
+    def batch_samples(self, pts, mode, k=4):
+        """所有目标点一次查询：(源顶点 (n, m), 混合系数 (n, m))"""
+        n = len(pts)
+        if mode == "barycentric":
+            tris, tree = self.triangles
+            kc = min(BARY_CANDIDATES, len(tris))
+            _, cand = tree.query(pts, kc)
+            cand = cand.reshape(n, kc)
+            abc = self.points[tris[cand]]                      # (n, kc, 3 顶点, 3)
+            bary = closest_barycentric(pts[:, None, :], abc[..., 0, :], abc[..., 1, :], abc[..., 2, :])
+            q = (bary[..., None] * abc).sum(axis=2)            # 每个候选三角形上的最近点
+            best = ((q - pts[:, None, :]) ** 2).sum(-1).argmin(axis=1)
+            rows = np.arange(n)
+            return tris[cand[rows, best]], bary[rows, best]
+        kk = 1 if mode == "closest" else min(k, len(self.points))
+        d, idx = self.ctree.query(pts, kk)
+        d, idx = d.reshape(n, kk), idx.reshape(n, kk)
+        if kk == 1:
+            return idx, np.ones_like(d)
+        with np.errstate(divide="ignore"):
+            inv = 1.0 / d
+        exact = d[:, 0] < 1e-6   # 与逐顶点引擎一致：重合时只取那个点
+        inv[exact] = 0.0
+        inv[exact, 0] = 1.0
+        return idx, inv / inv.sum(axis=1, keepdims=True)
+
+    def batch_weights(self, pts, mode, k=4):
+        """(n, 3) 世界坐标 -> (n, n_inf) 归一化权重；按 BATCH_CHUNK 分块控制内存"""
+        src = np.frombuffer(self.weights, dtype=np.float64).reshape(-1, self.n_inf)
+        out = np.zeros((len(pts), self.n_inf))
+        for start in range(0, len(pts), BATCH_CHUNK):
+            idx, f = self.batch_samples(pts[start:start + BATCH_CHUNK], mode, k)
+            acc = out[start:start + len(idx)]
+            for j in range(idx.shape[1]):
+                acc += f[:, j, None] * src[idx[:, j]]
+            np.clip(acc, 0.0, None, out=acc)
+            total = acc.sum(axis=1, keepdims=True)
+            np.divide(acc, total, out=acc, where=total > 0.0)
+        return out
+
+    @property
+    def kdtree(self):
+        if self._kdtree is None:
+            pts = self.mesh_fn.getPoints(om2.MSpace.kWorld)
+            self._kdtree = KDTree([(p.x, p.y, p.z) for p in pts])
+        return self._kdtree
+
+    @property
+    def intersector(self):
+        if self._intersector is None:
+            self._intersector = om2.MMeshIntersector()
+            self._intersector.create(self.dag.node(), self.dag.inclusiveMatrix())
+        return self._intersector
+
+    def samples(self, p, mode, k=4):
+        """Source vertices and blend factors for world-space point p."""
+        if mode == "barycentric":
+            pom = self.intersector.getClosestPoint(om2.MPoint(p[0], p[1], p[2]))
+            u, v = pom.barycentricCoords
+            tri = self.mesh_fn.getPolygonTriangleVertices(pom.face, pom.triangle)
+            return list(zip(tri, (u, v, 1.0 - u - v)))
+        if mode == "closest":
+            return [(self.kdtree.query(p, 1)[0][1], 1.0)]
+        hits = self.kdtree.query(p, k)
+        if hits[0][0] < 1e-12:
+            return [(hits[0][1], 1.0)]
+        inv = [(i, 1.0 / d2 ** 0.5) for d2, i in hits]
+        total = sum(w for _, w in inv)
+        return [(i, w / total) for i, w in inv]
+
+    def blend(self, samples):
+        acc = {}
+        for vi, f in samples:
+            if f <= 0.0:
+                continue
+            for c, w in self.rows[vi]:
+                acc[c] = acc.get(c, 0.0) + f * w
+        return acc
+
+
 class CrossDragList(QtWidgets.QListWidget):
 
     orderChanged = QtCore.Signal()
@@ -90,6 +333,26 @@ class SkinWeightCopier(QtWidgets.QWidget):
         self.cb_per_vertex.setChecked(False)
         main.addWidget(self.cb_per_vertex)
 
+        tl = QtWidgets.QHBoxLayout()
+        tl.addWidget(QtWidgets.QLabel("Mismatched topology:"))
+        self.cmb_transfer = QtWidgets.QComboBox()
+        for label, mode in (("Maya copySkinWeights", "maya"),
+                            ("Barycentric (closest point on surface)", "barycentric"),
+                            ("Closest vertex", "closest"),
+                            ("k-nearest vertices (smooth)", "knearest")):
+            self.cmb_transfer.addItem(label, mode)
+        tl.addWidget(self.cmb_transfer, 1)
+        tl.addWidget(QtWidgets.QLabel("k"))
+        self.sp_k = QtWidgets.QSpinBox()
+        self.sp_k.setRange(2, 32)
+        self.sp_k.setValue(4)
+        tl.addWidget(self.sp_k)
+        main.addLayout(tl)
+
+        self.cb_compare = QtWidgets.QCheckBox("Time against Maya copySkinWeights (%s engine)" % spatial_engine())
+        self.cb_compare.setChecked(False)
+        main.addWidget(self.cb_compare)
+
         lists_layout = QtWidgets.QHBoxLayout()
 
         self.left_list = CrossDragList()
@@ -123,9 +386,69 @@ class SkinWeightCopier(QtWidgets.QWidget):
         bl.addWidget(btn_reload)
         main.addLayout(bl)
 
+        # mesh uuid -> skinCluster uuid (or None); cleared by scene callbacks
+        self._skin_cache = {}
+        self._callback_ids = []
+        self._install_callbacks()
+
         self.reload_from_selection()
         self.show()
 
+    def _install_callbacks(self):
+        clear = lambda *args: self._skin_cache.clear()
+        self._callback_ids = [
+            om2.MDGMessage.addNodeAddedCallback(clear, "skinCluster"),
+            om2.MDGMessage.addNodeRemovedCallback(clear, "skinCluster"),
+            om2.MSceneMessage.addCallback(om2.MSceneMessage.kAfterOpen, clear),
+            om2.MSceneMessage.addCallback(om2.MSceneMessage.kAfterNew, clear),
+        ]
+
+    def _remove_callbacks(self):
+        for cid in self._callback_ids:
+            try:
+                om2.MMessage.removeCallback(cid)
+            except Exception:
+                pass
+        self._callback_ids = []
+
+    def closeEvent(self, event):
+        self._remove_callbacks()
+        self._skin_cache.clear()
+        super(SkinWeightCopier, self).closeEvent(event)
+
+    def showEvent(self, event):
+        if not self._callback_ids:
+            self._install_callbacks()
+        super(SkinWeightCopier, self).showEvent(event)
+
+    def _item_uuid(self, item):
+        uid = item.data(QtCore.Qt.UserRole)
+        if uid is None and cmds.objExists(item.text()):
+            uid = (cmds.ls(item.text(), uuid=True) or [None])[0]
+            item.setData(QtCore.Qt.UserRole, uid)
+        return uid
+
+    def _skin_cluster(self, item):
+        """skinCluster of the item's mesh (None if unskinned); history is only
+        walked for meshes not already in the uuid cache. The cache holds the
+        skinCluster's uuid, resolved to its current name on every read, so a
+        renamed skinCluster is still found."""
+        uid = self._item_uuid(item)
+        if uid is None:
+            return None
+        if uid in self._skin_cache:
+            skc_uid = self._skin_cache[uid]
+            if skc_uid is None:
+                return None
+            names = cmds.ls(skc_uid)
+            if names:
+                return names[0]
+            del self._skin_cache[uid]   # skinCluster deleted behind our back
+        obj = (cmds.ls(uid, long=True) or [item.text()])[0]
+        skcs = cmds.ls(cmds.listHistory(obj, pruneDagObjects=True) or [], type="skinCluster")
+        self._skin_cache[uid] = (cmds.ls(skcs[0], uuid=True) or [None])[0] if skcs else None
+        return skcs[0] if skcs else None
+
     def reload_from_selection(self):
         sel = cmds.ls(selection=True) or []
         self.left_list.clear()
@@ -152,11 +475,7 @@ class SkinWeightCopier(QtWidgets.QWidget):
                 if r: self._set_bad(r)
                 continue
 
-            obj = l.text()
-            his = cmds.listHistory(obj) or []
-            has_skin = any(cmds.nodeType(n) == "skinCluster" for n in his)
-
-            if has_skin:
+            if self._skin_cluster(l):
                 self._set_good(l)
                 self._set_good(r)
             else:
@@ -186,70 +505,181 @@ class SkinWeightCopier(QtWidgets.QWidget):
             cmds.delete(nodes)
         cmds.dagPose(cmds.ls(), bindPose=True, save=True)
 
+    @staticmethod
+    def _is_mesh(node):
+        if cmds.nodeType(node) == "mesh":
+            return True
+        return bool(cmds.listRelatives(node, shapes=True, noIntermediate=True, type="mesh"))
+
+    def _skin_handles(self, skc, mesh):
+        """(MFnSkinCluster, shape dagPath, 全顶点 component, 顶点数, 影响长名列表)；
+        只支持 mesh，其它几何抛 RuntimeError（调用方回退 copySkinWeights）"""
+        sl = om2.MSelectionList()
+        sl.add(skc)
+        sl.add(mesh)
+        fn = oma2.MFnSkinCluster(sl.getDependNode(0))
+        dag = sl.getDagPath(1)
+        if dag.apiType() == om2.MFn.kTransform:
+            dag.extendToShape()
+        if not dag.hasFn(om2.MFn.kMesh):
+            raise RuntimeError("not a mesh (%s)" % dag.node().apiTypeStr)
+        n_vtx = om2.MFnMesh(dag).numVertices
+        comp_fn = om2.MFnSingleIndexedComponent()
+        comp = comp_fn.create(om2.MFn.kMeshVertComponent)
+        comp_fn.setCompleteData(n_vtx)
+        infs = [p.fullPathName() for p in fn.influenceObjects()]
+        return fn, dag, comp, n_vtx, infs
+
+    @staticmethod
+    def _set_weights(fn, dag, comp, n_inf, values):
+        """整矩阵写入，旧权重一并取回并登记到 undo 队列（Ctrl+Z 写回旧权重，redo 重写新权重）"""
+        cols = om2.MIntArray(list(range(n_inf)))
+        new = om2.MDoubleArray(values)
+        old = fn.setWeights(dag, comp, cols, new, False, True)
+        api_undo.commit(lambda: fn.setWeights(dag, comp, cols, old, False),
+                        lambda: fn.setWeights(dag, comp, cols, new, False))
+
     def _copy_weights_per_vertex(self, source, target, skc_src, skc_tgt):
-        v_src = cmds.polyEvaluate(source, v=True)
-        v_tgt = cmds.polyEvaluate(target, v=True)
+        """Whole-matrix copy by vertex index: one getWeights on the source,
+        influence columns remapped by name, one setWeights on the target.
+        Returns the copied vertex count, or 0 if the topology differs."""
+        fn_s, dag_s, comp_s, v_src, infs_s = self._skin_handles(skc_src, source)
+        fn_t, dag_t, comp_t, v_tgt, infs_t = self._skin_handles(skc_tgt, target)
         if v_src != v_tgt:
-            return False
-
-        joints = cmds.skinCluster(skc_src, q=True, inf=True)
-        tgt_infs = cmds.skinCluster(skc_tgt, q=True, inf=True)
-
-        for j in joints:
-            if j not in tgt_infs:
-                cmds.skinCluster(skc_tgt, e=True, ai=j, lw=False, wt=0.0)
-
-        for j in joints:
-            for idx in range(v_src):
-                vtx_s = f"{source}.vtx[{idx}]"
-                vtx_t = f"{target}.vtx[{idx}]"
-                try:
-                    w = cmds.skinPercent(skc_src, vtx_s, q=True, t=j)
-                except:
-                    continue
-                cmds.skinPercent(skc_tgt, vtx_t, transformValue=[(j, float(w))], normalize=False)
+            return 0
+
+        missing = [j for j in infs_s if j not in infs_t]
+        if missing:
+            cmds.skinCluster(skc_tgt, e=True, ai=missing, lw=False, wt=0.0)
+            fn_t, dag_t, comp_t, v_tgt, infs_t = self._skin_handles(skc_tgt, target)
+
+        src, n_s = fn_s.getWeights(dag_s, comp_s)
+        src = array('d', src)
+        n_t = len(infs_t)
+        remap = [infs_t.index(j) for j in infs_s]
+
+        dst = array('d', bytes(8 * v_tgt * n_t))
+        for col_s, col_t in enumerate(remap):
+            dst[col_t::n_t] = src[col_s::n_s]
+
+        self._set_weights(fn_t, dag_t, comp_t, n_t, dst)
+        return v_tgt
+
+    def _transfer_weights_spatial(self, source, target, skc_src, skc_tgt, mode, k, index_cache):
+        """Closest-point transfer for any topology. The SpatialSource for a
+        source mesh is built once per run and shared through index_cache."""
+        key = (source, skc_src)
+        src = index_cache.get(key)
+        if src is None:
+            src = index_cache[key] = SpatialSource(*self._skin_handles(skc_src, source))
+
+        fn_t, dag_t, comp_t, v_tgt, infs_t = self._skin_handles(skc_tgt, target)
+        missing = [j for j in src.infs if j not in infs_t]
+        if missing:
+            cmds.skinCluster(skc_tgt, e=True, ai=missing, lw=False, wt=0.0)
+            fn_t, dag_t, comp_t, v_tgt, infs_t = self._skin_handles(skc_tgt, target)
+        n_t = len(infs_t)
+        remap = [infs_t.index(j) for j in src.infs]
+        tgt_points = om2.MFnMesh(dag_t).getPoints(om2.MSpace.kWorld)
+
+        if cKDTree is not None:
+            pts = np.array([(p.x, p.y, p.z) for p in tgt_points])
+            dst = np.zeros((v_tgt, n_t))
+            dst[:, remap] = src.batch_weights(pts, mode, k)
+            self._set_weights(fn_t, dag_t, comp_t, n_t, dst.ravel().tolist())
+            return v_tgt
+
+        dst = array('d', bytes(8 * v_tgt * n_t))
+        for vi, p in enumerate(tgt_points):
+            acc = src.blend(src.samples((p.x, p.y, p.z), mode, k))
+            total = sum(acc.values())
+            if total <= 0.0:
+                continue
+            base = vi * n_t
+            for c, w in acc.items():
+                dst[base + remap[c]] = w / total
 
-        cmds.skinPercent(skc_tgt, f"{target}.vtx[0:{v_tgt - 1}]", normalize=True)
-        return True
+        self._set_weights(fn_t, dag_t, comp_t, n_t, dst)
+        return v_tgt
 
-    def copy_skin_weights(self, source, target):
-        skc_src = None
-        for n in cmds.listHistory(source) or []:
-            if cmds.nodeType(n) == "skinCluster":
-                skc_src = n
-                break
+    def copy_skin_weights(self, source, target, skc_src=None, index_cache=None):
+        if skc_src is None:
+            skcs = cmds.ls(cmds.listHistory(source, pruneDagObjects=True) or [], type="skinCluster")
+            skc_src = skcs[0] if skcs else None
         if not skc_src:
             return
 
         joints = cmds.skinCluster(skc_src, q=True, inf=True)
 
-        for n in cmds.listHistory(target) or []:
-            if cmds.nodeType(n) == "skinCluster":
-                cmds.delete(n)
+        old = cmds.ls(cmds.listHistory(target, pruneDagObjects=True) or [], type="skinCluster")
+        if old:
+            cmds.delete(old)
 
-        cmds.skinCluster(joints, target, tsb=True)
+        skc_tgt = cmds.skinCluster(joints, target, tsb=True)[0]
 
-        skc_tgt = None
-        for n in cmds.listHistory(target) or []:
-            if cmds.nodeType(n) == "skinCluster":
-                skc_tgt = n
-                break
+        if not (self._is_mesh(source) and self._is_mesh(target)):
+            # NURBS / lattice 等：内置引擎只处理 mesh，交给 copySkinWeights
+            print("[SkinCopy] %s -> %s  not a mesh pair, using copySkinWeights" % (source, target))
+            return self._maya_copy(source, target)
 
         if self.cb_per_vertex.isChecked():
-            ok = self._copy_weights_per_vertex(source, target, skc_src, skc_tgt)
-            if ok:
-                return
-
+            count = self._copy_weights_per_vertex(source, target, skc_src, skc_tgt)
+            if count:
+                return count
+
+        mode = self.cmb_transfer.currentData()
+        if mode == "maya":
+            return self._maya_copy(source, target)
+
+        if index_cache is None:
+            index_cache = {}
+        if not self.cb_compare.isChecked():
+            return self._transfer_weights_spatial(source, target, skc_src, skc_tgt,
+                                                  mode, self.sp_k.value(), index_cache)
+
+        # 对照：先跑 Maya copySkinWeights 计时并留下结果，再用内置引擎覆盖
+        t0 = time.perf_counter()
+        self._maya_copy(source, target)
+        t_maya = time.perf_counter() - t0
+        reference = self._weight_matrix(skc_tgt, target)
+        reused = (source, skc_src) in index_cache
+        t0 = time.perf_counter()
+        count = self._transfer_weights_spatial(source, target, skc_src, skc_tgt,
+                                               mode, self.sp_k.value(), index_cache)
+        t_engine = time.perf_counter() - t0
+        result = self._weight_matrix(skc_tgt, target)
+        # 引擎可能给目标加了 influence（追加在后面），只比较 Maya 结果里已有的列
+        cols = min(len(reference[0]), len(result[0])) if count else 0
+        if np is not None:
+            diff = float(np.abs(np.asarray(reference)[:, :cols] - np.asarray(result)[:, :cols]).max()) if cols else 0.0
+        else:
+            diff = max([abs(r[c] - e[c]) for r, e in zip(reference, result) for c in range(cols)] or [0.0])
+        print("[SkinCopy] %s -> %s  %s, %s engine%s: %.3fs  vs copySkinWeights %.3fs  x%.1f  max |dw| %.4f"
+              % (source, target, mode, spatial_engine(), " (source index reused)" if reused else "",
+                 t_engine, t_maya, t_maya / t_engine if t_engine else 0.0, diff))
+        return count
+
+    def _weight_matrix(self, skc, mesh):
+        """[[w per influence] per vertex]"""
+        fn, dag, comp, _, _ = self._skin_handles(skc, mesh)
+        weights, n_inf = fn.getWeights(dag, comp)
+        weights = array('d', weights)
+        return [weights[b:b + n_inf] for b in range(0, len(weights), n_inf)]
+
+    def _maya_copy(self, source, target):
         cmds.copySkinWeights(
             source, target,
             noMirror=True,
             surfaceAssociation="closestPoint",
             influenceAssociation="oneToOne"
         )
+        count = cmds.polyEvaluate(target, v=True) if self._is_mesh(target) else 0
+        return count if isinstance(count, int) else 0
 
     def process_pairs(self):
         self.mark_invalid_pairs()
         n = max(self.left_list.count(), self.right_list.count())
+        pairs = []
         for i in range(n):
             l = self.left_list.item(i)
             r = self.right_list.item(i)
@@ -257,7 +687,36 @@ class SkinWeightCopier(QtWidgets.QWidget):
                 continue
             if l.background().color().red() > 100:
                 continue
-            self.copy_skin_weights(l.text(), r.text())
+            pairs.append((l, r.text()))
+
+        index_cache = {}
+        total_verts = 0
+        t_all = time.perf_counter()
+        # 整批一个 undo chunk：重新绑定 + 权重写入（api_undo）一次 Ctrl+Z 撤销
+        cmds.undoInfo(openChunk=True, chunkName="SkinWeightCopy")
+        try:
+            for i, (l, tgt) in enumerate(pairs):
+                src = l.text()
+                t0 = time.perf_counter()
+                try:
+                    # resolved per pair: an earlier pair may have rebound this source
+                    verts = self.copy_skin_weights(src, tgt, self._skin_cluster(l), index_cache) or 0
+                except Exception as e:
+                    print("[SkinCopy] %d/%d  %s -> %s  FAILED: %s" % (i + 1, len(pairs), src, tgt, e))
+                    continue
+                # a rebound target can no longer serve as a cached source
+                for key in [key for key in index_cache if key[0] == tgt]:
+                    del index_cache[key]
+                dt = time.perf_counter() - t0
+                total_verts += verts
+                print("[SkinCopy] %d/%d  %s -> %s  %d verts  %.3fs  %.0f verts/s"
+                      % (i + 1, len(pairs), src, tgt, verts, dt, verts / dt if dt else 0.0))
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+        dt = time.perf_counter() - t_all
+        print("[SkinCopy] done: %d pairs  %d verts  %.3fs  %.0f verts/s"
+              % (len(pairs), total_verts, dt, total_verts / dt if dt else 0.0))
 
 
 def show_skin_weight_copier():
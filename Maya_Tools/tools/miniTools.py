@@ -1,8 +1,21 @@
 # -*- coding: utf-8 -*-
 import maya.cmds as cmds
-import os, re
+import maya.api.OpenMaya as om2
+import maya.api.OpenMayaAnim as oma2
+import os, re, sys, time
 
 import json
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+import struct
+from array import array
+import inspect
+
+# test/ 下的共用模块
+_TEST_DIR = os.path.dirname(inspect.getfile(inspect.currentframe())).replace("tools", "test")
+if _TEST_DIR not in sys.path:
+    sys.path.append(_TEST_DIR)
+import api_undo
 # ===== PySide =====
 from maya import OpenMayaUI as omui
 try:
@@ -10,6 +23,226 @@ try:
 except Exception:
     from PySide6 import QtWidgets, QtCore
 
+# --------------------------------------
+# joint weight 二进制格式 (.jwb)
+#   [magic 'JCQW'][u16 version][u16 reserved][u32 header_len][header JSON utf-8][pad→4]
+#   每个条目：u32 顶点索引[count] + f32 权重[count]（小端，稀疏，仅非零）
+#   header: {"keep_namespace": bool,
+#            "items": [{"joint", "skinCluster", "geo", "count", "offset"}]}
+#   offset 为相对数据区起点（header 对齐之后）的字节偏移，读取时直接 mmap 切片
+# --------------------------------------
+WEIGHT_BIN_MAGIC = b'JCQW'
+WEIGHT_BIN_VERSION = 1
+_WEIGHT_BIN_HEAD = struct.Struct('<4sHHI')
+
+
+def _pad4(n):
+    return (4 - n % 4) % 4
+
+
+def is_weight_bin(path):
+    """按文件头判断是否为 .jwb（与扩展名无关）"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(4) == WEIGHT_BIN_MAGIC
+    except (IOError, OSError):
+        return False
+
+
+def write_weight_bin(path, items, keep_namespace=False):
+    """items: [{"joint", "skinCluster", "geo", "indices": array('I'), "weights": array('f')}]"""
+    header = {"keep_namespace": bool(keep_namespace), "items": []}
+    blocks = []
+    for it in items:
+        idx = array('I', it["indices"])
+        wts = array('f', it["weights"])
+        if len(idx) != len(wts):
+            raise ValueError("indices/weights length mismatch: %s" % it.get("joint"))
+        if sys.byteorder != 'little':
+            idx.byteswap(); wts.byteswap()
+        header["items"].append({"joint": it["joint"], "skinCluster": it["skinCluster"],
+                                "geo": it["geo"], "count": len(idx)})
+        blocks.append((idx, wts))
+
+    offset = 0
+    for info in header["items"]:
+        info["offset"] = offset
+        offset += info["count"] * 8
+    raw = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    with open(path, 'wb') as f:
+        f.write(_WEIGHT_BIN_HEAD.pack(WEIGHT_BIN_MAGIC, WEIGHT_BIN_VERSION, 0, len(raw)))
+        f.write(raw)
+        f.write(b'\0' * _pad4(len(raw)))
+        for idx, wts in blocks:
+            idx.tofile(f)
+            wts.tofile(f)
+    return header
+
+
+def read_weight_bin(path):
+    """mmap 读取 .jwb；返回 (header, items)，items 的 indices/weights 为 memoryview（零拷贝）。
+    用完后调用 close_weight_bin(header, items) 释放映射"""
+    f = open(path, 'rb')
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    magic, version, _, hlen = _WEIGHT_BIN_HEAD.unpack_from(mm, 0)
+    if magic != WEIGHT_BIN_MAGIC:
+        mm.close()
+        raise ValueError("not a joint weight binary: %s" % path)
+    if version > WEIGHT_BIN_VERSION:
+        mm.close()
+        raise ValueError("unsupported weight binary version %d (max %d)" % (version, WEIGHT_BIN_VERSION))
+    start = _WEIGHT_BIN_HEAD.size
+    header = json.loads(bytes(mm[start:start + hlen]).decode('utf-8'))
+
+    base = start + hlen + _pad4(hlen)
+    view = memoryview(mm)
+    items = []
+    for info in header.get("items", []):
+        n, off = info["count"], base + info["offset"]
+        if sys.byteorder == 'little':
+            idx = view[off:off + 4 * n].cast('I')
+            wts = view[off + 4 * n:off + 8 * n].cast('f')
+        else:
+            idx = array('I', bytes(view[off:off + 4 * n])); idx.byteswap()
+            wts = array('f', bytes(view[off + 4 * n:off + 8 * n])); wts.byteswap()
+        items.append(dict(info, indices=idx, weights=wts))
+    header["_mmap"] = (mm, view)
+    return header, items
+
+
+def close_weight_bin(header, items=()):
+    for it in items:
+        for k in ("indices", "weights"):
+            if isinstance(it.get(k), memoryview):
+                it[k].release()
+    mm, view = header.pop("_mmap", (None, None))
+    if view is not None:
+        view.release()
+    if mm is not None:
+        mm.close()
+
+
+# --------------------------------------
+# 帧序列目录索引（file sequence tool 用）
+# --------------------------------------
+_SEQ_NAME_RE = re.compile(r"^(.*?)(\d+)(\.[^.]+)$")
+
+
+class SequenceIndex(object):
+    """Per-directory index of numbered files, keyed by directory and mtime.
+
+    Each directory is listed once with os.scandir and grouped into
+    (prefix, pad, suffix) -> sorted frames; a listing is reused until the
+    directory mtime changes. prefetch() scans several directories in
+    parallel, which matters on network shares."""
+
+    def __init__(self, max_workers=8):
+        self.max_workers = max_workers
+        self._dirs = {}  # dname -> (mtime, {(prefix, pad, suffix): [frames]})
+
+    @staticmethod
+    def parse_name(fname):
+        m = _SEQ_NAME_RE.match(fname)
+        if not m:
+            return None
+        prefix, digits, suffix = m.groups()
+        return (prefix, len(digits), suffix), int(digits)
+
+    def _list_dir(self, dname):
+        seqs = {}
+        with os.scandir(dname) as it:
+            for entry in it:
+                parsed = self.parse_name(entry.name)
+                if parsed:
+                    seqs.setdefault(parsed[0], []).append(parsed[1])
+        for frames in seqs.values():
+            frames.sort()
+        return seqs
+
+    def _is_fresh(self, dname, mtime):
+        hit = self._dirs.get(dname)
+        return hit is not None and hit[0] == mtime
+
+    def directory(self, dname):
+        """{(prefix, pad, suffix): frames} for dname; raises if it does not exist."""
+        try:
+            mtime = os.stat(dname).st_mtime
+        except OSError:
+            raise RuntimeError("Directory does not exist: %s" % dname)
+        if not self._is_fresh(dname, mtime):
+            self._dirs[dname] = (mtime, self._list_dir(dname))
+        return self._dirs[dname][1]
+
+    def prefetch(self, dnames):
+        """Scan every stale directory of dnames concurrently; missing ones are skipped."""
+        def _scan(d):
+            try:
+                self.directory(d)
+            except (RuntimeError, OSError):
+                pass
+        todo = sorted(set(d for d in dnames if d))
+        if len(todo) <= 1:
+            for d in todo:
+                _scan(d)
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(todo))) as pool:
+            list(pool.map(_scan, todo))
+
+    def frames_for(self, tex_path):
+        if not tex_path:
+            raise RuntimeError("fileTextureName is empty.")
+        fname = os.path.basename(tex_path)
+        parsed = self.parse_name(fname)
+        if not parsed:
+            raise RuntimeError("Cannot parse frame digits from filename: %s" % fname)
+        return self.directory(os.path.dirname(tex_path)).get(parsed[0], [])
+
+    def seq_range(self, tex_path):
+        frames = self.frames_for(tex_path)
+        if not frames:
+            (prefix, pad, suffix), _ = self.parse_name(os.path.basename(tex_path))
+            raise RuntimeError("No matching sequence found: %s[%%0%dd]%s" % (prefix, pad, suffix))
+        return frames[0], frames[-1]
+
+    def invalidate(self, dname=None):
+        if dname is None:
+            self._dirs.clear()
+        else:
+            self._dirs.pop(dname, None)
+
+
+_SEQ_INDEX = SequenceIndex()
+
+
+class ExpressionIndex(object):
+    """Driven plug -> expression nodes, built from the expressions' actual
+    output connections with one listConnections query (unitConversion nodes
+    in between are skipped). Build once per batch; discard() keeps it in
+    sync when the batch deletes expressions."""
+
+    def __init__(self):
+        self._driven = {}
+        exprs = cmds.ls(type="expression") or []
+        if not exprs:
+            return
+        pairs = cmds.listConnections(exprs, s=False, d=True, plugs=True,
+                                     connections=True, skipConversionNodes=True) or []
+        for i in range(0, len(pairs), 2):
+            expr = pairs[i].split(".", 1)[0]
+            self._driven.setdefault(pairs[i + 1], set()).add(expr)
+
+    def expressions_for(self, plug):
+        return sorted(self._driven.get(plug, ()))
+
+    def discard(self, expr):
+        for exprs in self._driven.values():
+            exprs.discard(expr)
+
+
 # --------------------------------------
 # 迷你工具窗口
 # --------------------------------------
@@ -505,7 +738,7 @@ class MyWindow(QtWidgets.QWidget):
             return win
 
     def build_joint_weight_io_tool(self):
-        """导出/导入关节权重；可选择是否保留命名空间"""
+        """导出/导入关节权重；可选择是否保留命名空间；支持 JSON 与二进制 .jwb（导入时按文件头自动识别）"""
 
         # ===== 基础工具 =====
         def _short_no_ns(n):
@@ -516,7 +749,9 @@ class MyWindow(QtWidgets.QWidget):
             return f'{_short_no_ns(obj)}.vtx[{idx}]'
 
         def _choose_path(save=True):
-            dlg = cmds.fileDialog2(fileFilter='JSON (*.json)', dialogStyle=2,
+            flt = ('Joint Weights Binary (*.jwb);;JSON (*.json)' if save
+                   else 'Joint Weights (*.jwb *.json);;All Files (*.*)')
+            dlg = cmds.fileDialog2(fileFilter=flt, dialogStyle=2,
                                    fileMode=0 if save else 1)
             return dlg[0] if dlg else None
 
@@ -587,7 +822,111 @@ class MyWindow(QtWidgets.QWidget):
             if full: geo_cache[key] = full
             return full
 
-        # ===== 导出（批量 skinPercent 版） =====
+        # ===== 批量权重引擎（OpenMaya 2.0 整矩阵读写，经 api_undo 进 undo 队列） =====
+        def _skin_handles(skc, geo):
+            """返回 (MFnSkinCluster, shape dagPath, 全顶点 component, 顶点数, 影响长名列表)；
+            只支持 mesh，其它几何抛 RuntimeError，由调用方回退 skinPercent"""
+            sl = om2.MSelectionList()
+            sl.add(skc)
+            sl.add(geo)
+            fn = oma2.MFnSkinCluster(sl.getDependNode(0))
+            dag = sl.getDagPath(1)
+            if dag.apiType() == om2.MFn.kTransform:
+                dag.extendToShape()
+            if not dag.hasFn(om2.MFn.kMesh):
+                raise RuntimeError(u'不是 mesh（%s）' % dag.node().apiTypeStr)
+            n_vtx = om2.MFnMesh(dag).numVertices
+            comp_fn = om2.MFnSingleIndexedComponent()
+            comp = comp_fn.create(om2.MFn.kMeshVertComponent)
+            comp_fn.setCompleteData(n_vtx)
+            infs = [p.fullPathName() for p in fn.influenceObjects()]
+            return fn, dag, comp, n_vtx, infs
+
+        def _read_weight_matrix(skc, geo):
+            """一次调用取整个权重矩阵；返回 (array('d') 行优先[顶点*影响], 顶点数, 影响长名列表)"""
+            fn, dag, comp, n_vtx, infs = _skin_handles(skc, geo)
+            weights, n_inf = fn.getWeights(dag, comp)
+            return array('d', weights), n_vtx, infs
+
+        def _write_weight_matrix(skc, geo, values, n_inf, undoable=True):
+            """一次调用写回整个权重矩阵（normalize 由调用方负责）；
+            旧权重一并取回，登记到 undo 队列（Ctrl+Z 写回旧矩阵）"""
+            fn, dag, comp, n_vtx, infs = _skin_handles(skc, geo)
+            cols = om2.MIntArray(list(range(n_inf)))
+            new = om2.MDoubleArray(values)
+            old = fn.setWeights(dag, comp, cols, new, False, undoable)
+            if undoable:
+                api_undo.commit(lambda: fn.setWeights(dag, comp, cols, old, False),
+                                lambda: fn.setWeights(dag, comp, cols, new, False))
+
+        def _normalize_rows(values, n_inf):
+            """逐行归一化（等价于 skinPercent normalize=True，忽略锁定影响）"""
+            for b in range(0, len(values), n_inf):
+                row = values[b:b + n_inf]
+                s = sum(row)
+                if s > 0.0 and abs(s - 1.0) > 1e-9:
+                    values[b:b + n_inf] = array('d', [w / s for w in row])
+
+        def _inf_column(infs_long, node):
+            long_name = (cmds.ls(node, long=True) or [node])[0]
+            try:
+                return infs_long.index(long_name)
+            except ValueError:
+                return None
+
+        def _use_bulk():
+            return cmds.optionMenu('weightEngineOpt', q=True, sl=True) == 1
+
+        def _timing_report(title, timings):
+            lines = [u'[Timing] %s' % title]
+            lines += [u'  %-24s %8.3f s' % (k, v) for k, v in timings]
+            lines.append(u'  %-24s %8.3f s' % (u'total', sum(v for _, v in timings)))
+            msg = u'\n'.join(lines)
+            print(msg)
+            return msg
+
+        # ===== 文件格式：内部统一为 indices/weights 数组 =====
+        def _items_to_json(items, keep_ns):
+            """旧 JSON 布局：weights 为 {"geo.vtx[i]": w}（保留 6 位小数）"""
+            out = []
+            for it in items:
+                geo = it["geo"]
+                weight_dict = {}
+                for i, w in zip(it["indices"], it["weights"]):
+                    k = f'{geo}.vtx[{i}]' if keep_ns else _strip_ns_vtx_key(geo, i)
+                    weight_dict[k] = float('%.6f' % w)
+                out.append({"joint": it["joint"], "skinCluster": it["skinCluster"],
+                            "geo": geo, "weights": weight_dict})
+            return {"items": out, "keep_namespace": keep_ns}
+
+        def _items_from_json(data):
+            """把旧 JSON 的 vtx 键解析成 indices/weights（与几何短名不符的键跳过）"""
+            items = []
+            for it in data.get("items", []):
+                geo_short = _short_no_ns(it.get("geo") or "")
+                idx_arr, wt_arr = array('I'), array('d')
+                for k, w in (it.get("weights") or {}).items():
+                    try:
+                        obj, rest = k.split('.vtx[')
+                        if _short_no_ns(obj) != geo_short:
+                            continue
+                        idx_arr.append(int(rest[:-1]))
+                        wt_arr.append(float(w))
+                    except Exception:
+                        continue
+                items.append(dict(it, indices=idx_arr, weights=wt_arr))
+            return items
+
+        def _load_weight_file(path):
+            """返回 (items, fmt, close_fn)；按文件头识别 .jwb，否则按 JSON 读"""
+            if is_weight_bin(path):
+                header, items = read_weight_bin(path)
+                return items, 'jwb', lambda: close_weight_bin(header, items)
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return _items_from_json(data), 'json', lambda: None
+
+        # ===== 导出 =====
         def _export_selected_joints_weights(*_):
             path = _choose_path(save=True)
             if not path:
@@ -600,8 +939,13 @@ class MyWindow(QtWidgets.QWidget):
                 return
 
             keep_ns = cmds.checkBox('keepNSChk', q=True, v=True)
+            bulk = _use_bulk()
             data = {"items": [], "keep_namespace": keep_ns}
+            timings = []
+            t_read = 0.0
+            matrix_cache = {}
 
+            t0 = time.perf_counter()
             for j in sel:
                 j_name = j if keep_ns else _short_no_ns(j)
 
@@ -627,88 +971,144 @@ class MyWindow(QtWidgets.QWidget):
                     if not inf_match:
                         continue
 
-                    # 对每个 geo，一次性查询所有顶点的权重
                     geos = cmds.skinCluster(skc, q=True, geometry=True) or []
                     for geo in geos:
-                        vtx_count = cmds.polyEvaluate(geo, v=True)
-                        if not vtx_count:
-                            continue
-
-                        # 批量查询：geo.vtx[0:count-1]
-                        comp = f'{geo}.vtx[0:{vtx_count - 1}]'
-                        try:
-                            # 注意：有的 Maya 版本需要显式写 value=True
-                            wt_list = cmds.skinPercent(
-                                skc, comp,
-                                q=True, t=inf_match, value=True
-                            )
-                        except TypeError:
-                            # 回退：有的版本 q=True,t=xxx 默认返回值列表
-                            wt_list = cmds.skinPercent(
-                                skc, comp,
-                                q=True, t=inf_match
-                            )
+                        tr = time.perf_counter()
+                        key = (skc, geo)
+                        if bulk and key not in matrix_cache:
+                            # 每个 (skinCluster, geo) 只读一次整矩阵，多个 joint 共用；非 mesh 回退逐点
+                            try:
+                                matrix_cache[key] = _read_weight_matrix(skc, geo)
+                            except RuntimeError as e:
+                                print(f'[警告] 整矩阵读取失败，回退 skinPercent: {geo}: {e}')
+                                matrix_cache[key] = None
+                        if bulk and matrix_cache[key]:
+                            mat, n_vtx, infs_long = matrix_cache[key]
+                            col = _inf_column(infs_long, inf_match)
+                            wt_list = mat[col::len(infs_long)] if col is not None else None
+                        else:
+                            vtx_count = cmds.polyEvaluate(geo, v=True)
+                            if not vtx_count:
+                                continue
+                            # 批量查询：geo.vtx[0:count-1]
+                            comp = f'{geo}.vtx[0:{vtx_count - 1}]'
+                            try:
+                                # 注意：有的 Maya 版本需要显式写 value=True
+                                wt_list = cmds.skinPercent(skc, comp, q=True, t=inf_match, value=True)
+                            except TypeError:
+                                # 回退：有的版本 q=True,t=xxx 默认返回值列表
+                                wt_list = cmds.skinPercent(skc, comp, q=True, t=inf_match)
+                        t_read += time.perf_counter() - tr
 
                         if not wt_list:
                             continue
 
-                        weight_dict = {}
-                        geo_short = _short_no_ns(geo)
-                        # 遍历列表，只对非零权重记录
+                        # 稀疏：只记录非零权重
+                        idx_arr, wt_arr = array('I'), array('d')
                         for i, w in enumerate(wt_list):
-                            if not w or w <= 0.0:
-                                continue
-                            k = f'{geo}.vtx[{i}]' if keep_ns else _strip_ns_vtx_key(geo, i)
-                            # 保持原来 6 位小数的输出
-                            weight_dict[k] = float('%.6f' % w)
+                            if w and w > 0.0:
+                                idx_arr.append(i)
+                                wt_arr.append(w)
 
-                        if weight_dict:
+                        if idx_arr:
                             data["items"].append({
                                 "joint": j_name,
                                 "skinCluster": skc if keep_ns else _short_no_ns(skc),
-                                "geo": geo if keep_ns else geo_short,
-                                "weights": weight_dict
+                                "geo": geo if keep_ns else _short_no_ns(geo),
+                                "indices": idx_arr,
+                                "weights": wt_arr
                             })
+            timings.append((u'read weights', t_read))
+            timings.append((u'collect items', time.perf_counter() - t0 - t_read))
 
             if not data["items"]:
                 _dlg_warn(u'未采集到任何权重，未写入文件。', title=u'无数据')
                 return
 
+            as_json = path.lower().endswith('.json')
             try:
-                with open(path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                _dlg_info(u'导出成功：\n%s\n条目：%d\n保留命名空间：%s' %
-                          (path, len(data["items"]), keep_ns))
+                t0 = time.perf_counter()
+                if as_json:
+                    with open(path, 'w', encoding='utf-8') as f:
+                        json.dump(_items_to_json(data["items"], keep_ns), f, ensure_ascii=False, indent=2)
+                else:
+                    write_weight_bin(path, data["items"], keep_ns)
+                timings.append((u'write file', time.perf_counter() - t0))
+                report = _timing_report(u'export (%s, %s)' % ('bulk' if bulk else 'skinPercent',
+                                                               'json' if as_json else 'jwb'), timings)
+                _dlg_info(u'导出成功：\n%s\n条目：%d\n保留命名空间：%s\n\n%s' %
+                          (path, len(data["items"]), keep_ns, report))
             except Exception as e:
                 _dlg_warn(u'写入失败：%s' % e, title=u'失败')
 
-        # ===== 导入（去掉逐点 normalize，最后整体 normalize） =====
+        # ===== 导入：逐点写（旧路径，保留用于对比） =====
+        def _apply_per_vertex(skc, geo, jobs):
+            vtx_max = cmds.polyEvaluate(geo, v=True)
+            applied = 0
+            for inf_match, indices, weights in jobs:
+                for idx, w in zip(indices, weights):
+                    if not (0 <= idx < vtx_max):
+                        continue
+
+                    # 逐点写时不做 normalize，最后整体 normalize
+                    cmds.skinPercent(skc, f'{geo}.vtx[{idx}]',
+                                     transformValue=[(inf_match, float(w))],
+                                     normalize=False)
+                    applied += 1
+            if applied and vtx_max:
+                cmds.skinPercent(skc, f'{geo}.vtx[0:{vtx_max - 1}]', normalize=True)
+            return applied
+
+        # ===== 导入：整矩阵写（读一次 → 改列 → 归一化 → 写一次） =====
+        def _apply_bulk(skc, geo, jobs):
+            mat, n_vtx, infs_long = _read_weight_matrix(skc, geo)
+            n_inf = len(infs_long)
+            applied = 0
+            for inf_match, indices, weights in jobs:
+                col = _inf_column(infs_long, inf_match)
+                if col is None:
+                    print(f'[跳过] {inf_match} 不在 {skc} 的影响中')
+                    continue
+                for idx, w in zip(indices, weights):
+                    if not (0 <= idx < n_vtx):
+                        continue
+                    mat[idx * n_inf + col] = w
+                    applied += 1
+            if applied:
+                _normalize_rows(mat, n_inf)
+                _write_weight_matrix(skc, geo, mat, n_inf)
+            return applied
+
         def _apply_weights_from_json(*_):
             path = _choose_path(save=False)
             if not path:
                 _dlg_info(u'已取消导入。', title=u'已取消')
                 return
+            timings = []
             try:
-                with open(path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
+                t0 = time.perf_counter()
+                items, fmt, close_file = _load_weight_file(path)
+                timings.append((u'read file (%s)' % fmt, time.perf_counter() - t0))
             except Exception as e:
-                _dlg_warn(u'读取JSON失败：%s' % e, title=u'失败')
+                _dlg_warn(u'读取权重文件失败：%s' % e, title=u'失败')
                 return
+            try:
+                _apply_weight_items(path, items, timings)
+            finally:
+                close_file()
 
-            items = data.get("items", [])
+        def _apply_weight_items(path, items, timings):
             if not items:
-                _dlg_warn(u'JSON 内无 items。', title=u'无数据')
+                _dlg_warn(u'文件内无 items。', title=u'无数据')
                 return
 
-            # 记录哪些 (skinCluster, geo) 被改过，最后统一 normalize
-            touched_pairs = set()
-
-            total_applied = 0
+            # 第1遍：解析节点（可能弹窗/添加影响），按 (skinCluster, geo) 分组
+            t0 = time.perf_counter()
+            groups = {}
             for it in items:
                 j_short   = _short_no_ns(it.get("joint"))
                 skc_short = _short_no_ns(it.get("skinCluster"))
                 geo_short = _short_no_ns(it.get("geo"))
-                wdict     = it.get("weights", {})
 
                 skc = _resolve_unique_by_short('skinCluster', skc_short)
                 if not skc:
@@ -749,45 +1149,96 @@ class MyWindow(QtWidgets.QWidget):
                     else:
                         continue
 
-                vtx_max = cmds.polyEvaluate(geo, v=True)
-                applied = 0
+                groups.setdefault((skc, geo), []).append((inf_match, it["indices"], it["weights"]))
+            timings.append((u'resolve nodes', time.perf_counter() - t0))
 
-                for k, w in wdict.items():
+            # 第2遍：每个 (skinCluster, geo) 写一次并统一归一化；整个导入是一步 undo
+            bulk = _use_bulk()
+            t0 = time.perf_counter()
+            total_applied = 0
+            cmds.undoInfo(openChunk=True, chunkName='JointWeightImport')
+            try:
+                for (skc, geo), jobs in groups.items():
                     try:
-                        obj, rest = k.split('.vtx[')
-                        if _short_no_ns(obj) != geo_short:
-                            continue
-                        idx = int(rest[:-1])
-                        if not (0 <= idx < vtx_max):
-                            continue
-                    except Exception:
+                        applied = None
+                        if bulk:
+                            # 非 mesh 回退逐点（与导出一致）
+                            try:
+                                applied = _apply_bulk(skc, geo, jobs)
+                            except RuntimeError as e:
+                                print(f'[警告] 整矩阵写入失败，回退 skinPercent: {geo}: {e}')
+                        if applied is None:
+                            applied = _apply_per_vertex(skc, geo, jobs)
+                    except Exception as e:
+                        print(f'[警告] 写入失败 {skc}, {geo}: {e}')
                         continue
+                    total_applied += applied
+                    print(f'[Apply] {skc} / {geo} -> {applied} weights')
+            finally:
+                cmds.undoInfo(closeChunk=True)
+            timings.append((u'apply weights', time.perf_counter() - t0))
+
+            report = _timing_report(u'import (%s)' % ('bulk' if bulk else 'skinPercent'), timings)
+            _dlg_info(u'导入完成：\n文件：%s\n应用权重：%d\n\n%s' % (path, total_applied, report))
+
+        # ===== 对比计时：逐点 skinPercent vs 整矩阵 =====
+        def _benchmark_engines(*_):
+            """对所选蒙皮几何计时；逐点路径只跑前 N 个顶点并按比例估算全量"""
+            sample = 2000
+            geos = []
+            for s in cmds.ls(sl=True, long=True) or []:
+                shapes = cmds.listRelatives(s, s=True, ni=True, f=True, type='mesh') or []
+                geos += shapes or ([s] if cmds.nodeType(s) == 'mesh' else [])
+            if not geos:
+                _dlg_warn(u'请选择已蒙皮的模型后再计时。', title=u'无选择')
+                return
 
-                    vtx_comp = f'{geo}.vtx[{idx}]'
-                    # 关键改动：逐点写时不做 normalize
-                    cmds.skinPercent(
-                        skc, vtx_comp,
-                        transformValue=[(inf_match, float(w))],
-                        normalize=False
-                    )
-                    applied += 1
-
-                if applied:
-                    touched_pairs.add((skc, geo))
-                total_applied += applied
+            lines = []
+            undo_state = cmds.undoInfo(q=True, state=True)
+            cmds.undoInfo(stateWithoutFlush=False)
+            try:
+                for geo in geos:
+                    skc = next((h for h in cmds.listHistory(geo) or []
+                                if cmds.nodeType(h) == 'skinCluster'), None)
+                    if not skc:
+                        continue
 
-            # 统一归一化：每个 (skinCluster, geo) 只做一次
-            for skc, geo in touched_pairs:
-                try:
-                    vtx_max = cmds.polyEvaluate(geo, v=True)
-                    if vtx_max:
-                        comp = f'{geo}.vtx[0:{vtx_max - 1}]'
-                        cmds.skinPercent(skc, comp, normalize=True)
-                        print(f'[Normalize] {skc} / {geo} -> {vtx_max} verts')
-                except Exception as e:
-                    print(f'[警告] 归一化失败 {skc}, {geo}: {e}')
+                    t0 = time.perf_counter()
+                    mat, n_vtx, infs_long = _read_weight_matrix(skc, geo)
+                    t_bulk_r = time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    _write_weight_matrix(skc, geo, mat, len(infs_long), undoable=False)
+                    t_bulk_w = time.perf_counter() - t0
 
-            _dlg_info(u'导入完成：\n文件：%s\n应用顶点：%d' % (path, total_applied))
+                    n = min(sample, n_vtx)
+                    infs = cmds.skinCluster(skc, q=True, inf=True) or []
+                    rows = []
+                    t0 = time.perf_counter()
+                    for i in range(n):
+                        rows.append(cmds.skinPercent(skc, f'{geo}.vtx[{i}]', q=True, value=True) or [])
+                    t_pv_r = time.perf_counter() - t0
+                    t0 = time.perf_counter()
+                    for i, row in enumerate(rows):
+                        tv = [(inf, w) for inf, w in zip(infs, row) if w > 0.0]
+                        if tv:
+                            cmds.skinPercent(skc, f'{geo}.vtx[{i}]', transformValue=tv, normalize=False)
+                    t_pv_w = time.perf_counter() - t0
+
+                    scale = float(n_vtx) / n if n else 0.0
+                    t_pv = (t_pv_r + t_pv_w) * scale
+                    t_bulk = t_bulk_r + t_bulk_w
+                    lines.append(u'%s  verts=%d infs=%d\n'
+                                 u'  skinPercent  read %.3fs  write %.3fs  (sample %d, 估算全量 %.2fs)\n'
+                                 u'  bulk         read %.3fs  write %.3fs  (全量 %.3fs)  x%.1f'
+                                 % (_short_no_ns(geo), n_vtx, len(infs_long),
+                                    t_pv_r * scale, t_pv_w * scale, n, t_pv,
+                                    t_bulk_r, t_bulk_w, t_bulk, t_pv / t_bulk if t_bulk else 0.0))
+            finally:
+                cmds.undoInfo(stateWithoutFlush=undo_state)
+
+            msg = u'\n'.join(lines) or u'所选对象上没有找到 skinCluster。'
+            print(u'[Timing] weight engines\n' + msg)
+            _dlg_info(msg, title=u'计时结果')
 
         # ===== UI =====
         win = 'JointWeightIOWin'
@@ -795,10 +1246,16 @@ class MyWindow(QtWidgets.QWidget):
         cmds.window(win, t=u'Joint Weights I/O', mnb=False, mxb=False)
         cmds.columnLayout(adj=True, rs=6)
         cmds.checkBox('keepNSChk', l=u'保留命名空间 (导出时记录完整路径)', v=False)
-        cmds.button(l=u'导出所选Joint权重 → JSON', h=36, c=_export_selected_joints_weights)
-        cmds.button(l=u'从JSON应用权重（同名缓存选择；缺失影响可添加）', h=36, c=_apply_weights_from_json)
+        cmds.optionMenu('weightEngineOpt', l=u'权重引擎')
+        cmds.menuItem(l=u'bulk (OpenMaya 整矩阵)')
+        cmds.menuItem(l=u'per-vertex (skinPercent)')
+        cmds.button(l=u'导出所选Joint权重 → .jwb / JSON', h=36, c=_export_selected_joints_weights)
+        cmds.button(l=u'从文件应用权重（同名缓存选择；缺失影响可添加）', h=36, c=_apply_weights_from_json)
+        cmds.button(l=u'计时对比（所选模型）', h=28, c=_benchmark_engines)
         cmds.separator(h=6, st='none')
-        cmds.text(l=u'导出时如勾选“保留命名空间”，会记录完整节点名。\n未勾选则自动截断为短名。', al='left')
+        cmds.text(l=u'导出时如勾选“保留命名空间”，会记录完整节点名。\n未勾选则自动截断为短名。\n'
+                    u'导入可以 Ctrl+Z 一步撤销（bulk 引擎同样）。\n'
+                    u'导出按扩展名选择格式（.json 为旧格式）；导入自动识别。', al='left')
         cmds.showWindow(win)
         return win
 
@@ -983,6 +1440,8 @@ class MyWindow(QtWidgets.QWidget):
         - Builds controller null (seqMin/seqMax/seqOffset/flipAlpha) with recognizable tags.
         - frameExtension = clamp(time1.outTime + seqOffset, seqMin, seqMax)
         - flipAlpha (0/1) -> (-1/+1) drives file.alphaGain (fallback colorBalance.alphaGain).
+        - "Create All" builds every eligible file node in one undo chunk with refresh suspended,
+          optionally through a single MDagModifier; nodes/sec is logged for comparison.
         """
 
         # ---------------- helpers ----------------
@@ -996,38 +1455,20 @@ class MyWindow(QtWidgets.QWidget):
                     except: pass
             return _U()
 
-        def _scan_seq_range(tex_path):
-            if not tex_path:
-                raise RuntimeError("fileTextureName is empty.")
-            fname = os.path.basename(tex_path)
-            dname = os.path.dirname(tex_path)
-            m = re.search(r"^(.*?)(\d+)(\.[^.]+)$", fname)
-            if not m:
-                raise RuntimeError("Cannot parse frame digits from filename: %s" % fname)
-            prefix, digits, suffix = m.groups()
-            pad = len(digits)
-            if not os.path.isdir(dname):
-                raise RuntimeError("Directory does not exist: %s" % dname)
-            rgx = re.compile(r"^" + re.escape(prefix) + r"(\d+)" + re.escape(suffix) + r"$")
-            frames = []
-            for f in os.listdir(dname):
-                mm = rgx.match(f)
-                if not mm: continue
-                s = mm.group(1)
-                if len(s) != pad: continue
-                try: frames.append(int(s))
-                except: pass
-            if not frames:
-                raise RuntimeError("No matching sequence found: %s[%%0%dd]%s" % (pad, suffix))
-            return min(frames), max(frames)
+        seq_index = _SEQ_INDEX
 
-        def _disconnect_all_inputs(attr):
-            # expressions
-            for e in cmds.ls(type='expression') or []:
+        def _scan_seq_range(tex_path):
+            # shared directory index: each folder is listed once until its mtime changes
+            return seq_index.seq_range(tex_path)
+
+        def _disconnect_all_inputs(attr, expr_index=None):
+            # expressions driving attr (index is built once per batch)
+            if expr_index is None:
+                expr_index = ExpressionIndex()
+            for e in expr_index.expressions_for(attr):
                 try:
-                    s = cmds.getAttr(e + ".expression") or ""
-                    if attr in s:
-                        cmds.delete(e)
+                    cmds.delete(e)
+                    expr_index.discard(e)
                 except: pass
             # anim curves
             conns = cmds.listConnections(attr, s=True, d=False, plugs=True) or []
@@ -1040,7 +1481,7 @@ class MyWindow(QtWidgets.QWidget):
             # other connections
             pair = cmds.listConnections(attr, s=True, d=False, plugs=True, connections=True) or []
             for i in range(0, len(pair), 2):
-                src, dst = pair[i], pair[i+1]
+                dst, src = pair[i], pair[i+1]
                 try: cmds.disconnectAttr(src, dst)
                 except: pass
 
@@ -1067,16 +1508,19 @@ class MyWindow(QtWidgets.QWidget):
             return len(conns) > 0
 
         def _eligible_file_nodes():
-            res = []
+            res, dirs = [], set()
             for n in cmds.ls(type="file") or []:
                 try:
                     if not cmds.getAttr(n + ".useFrameExtension"): continue
                     tex = cmds.getAttr(n + ".fileTextureName")
                     if not tex: continue
-                    if not re.search(r"\d+(?=\.[^.]+$)", os.path.basename(tex)): continue
+                    if not seq_index.parse_name(os.path.basename(tex)): continue
                     if _is_file_tagged(n): continue
                     res.append(n)
+                    dirs.add(os.path.dirname(tex))
                 except: pass
+            # warm the index for every folder at once so building is cache hits only
+            seq_index.prefetch(dirs)
             return sorted(res)
 
         def _lock_trs(x):
@@ -1087,7 +1531,7 @@ class MyWindow(QtWidgets.QWidget):
                     except: pass
 
         # ---------------- build logic ----------------
-        def build_for_file(file_node):
+        def build_for_file(file_node, expr_index=None, stats=None):
             if not cmds.objExists(file_node) or cmds.nodeType(file_node) != "file":
                 raise RuntimeError("File node not found: %s" % file_node)
 
@@ -1126,7 +1570,7 @@ class MyWindow(QtWidgets.QWidget):
 
             # clamp network for frameExtension
             target_attr = file_node + ".frameExtension"
-            _disconnect_all_inputs(target_attr)
+            _disconnect_all_inputs(target_attr, expr_index)
             time1 = _ensure_time1()
 
             pma = cmds.shadingNode("plusMinusAverage", asUtility=True, n=f"PMA_{file_node}_frame")
@@ -1135,6 +1579,7 @@ class MyWindow(QtWidgets.QWidget):
             cmds.connectAttr(ctrl  + ".seqOffset", pma + ".input1D[1]", f=True)
 
             clp = cmds.shadingNode("clamp", asUtility=True, n=f"CLP_{file_node}_frame")
+            created = 3
             cmds.connectAttr(pma + ".output1D", clp + ".inputR", f=True)
             cmds.connectAttr(ctrl + ".seqMin",  clp + ".minR",   f=True)
             cmds.connectAttr(ctrl + ".seqMax",  clp + ".maxR",   f=True)
@@ -1164,6 +1609,7 @@ class MyWindow(QtWidgets.QWidget):
                 cmds.setAttr(    pma2 + ".input1D[1]", 1)                           # -1
                 # result: 2*flipAlpha - 1  => {0->-1, 1->+1}
                 cmds.connectAttr(pma2 + ".output1D", target_alpha, f=True)
+                created += 2
 
             # prime value
             cur = int(cmds.currentTime(q=True))
@@ -1172,8 +1618,190 @@ class MyWindow(QtWidgets.QWidget):
             except: pass
 
             print("[OK] Built controller for %s  range=[%d,%d]  tag=%s" % (file_node, fmin, fmax, tool_tag))
+            if stats is not None:
+                stats["files"] += 1
+                stats["nodes"] += created
             return ctrl
 
+        # ---------------- batch build (one MDagModifier) ----------------
+
+        def _mobj(name):
+            sl = om2.MSelectionList()
+            try:
+                sl.add(name)
+            except RuntimeError:
+                return None
+            return sl.getDependNode(0)
+
+        def _plug(obj, attr, index=None):
+            p = om2.MFnDependencyNode(obj).findPlug(attr, False)
+            return p.elementByLogicalIndex(index) if index is not None else p
+
+        def _ctrl_attrs(fmin, fmax):
+            out = []
+            for name, ntype, dv in (("seqMin", om2.MFnNumericData.kInt, int(fmin)),
+                                    ("seqMax", om2.MFnNumericData.kInt, int(fmax)),
+                                    ("seqOffset", om2.MFnNumericData.kInt, 0),
+                                    ("flipAlpha", om2.MFnNumericData.kBoolean, 1)):
+                fn = om2.MFnNumericAttribute()
+                out.append(fn.create(name, name, ntype, dv))
+                fn.keyable = True
+            fn = om2.MFnEnumAttribute()
+            out.append(fn.create("toolTag", "toolTag", 0))
+            fn.addField(tool_tag, 0)
+            fn.keyable = True
+            out.append(om2.MFnMessageAttribute().create(tag_attr, tag_attr))
+            return out
+
+        def build_batch_api(file_nodes, expr_index, stats):
+            """Build clampers for all file_nodes through one MDagModifier:
+            pass 1 queues cleanup, node creation and attributes, pass 2 the
+            connections and values. The modifier is recorded with api_undo, so it
+            undoes with the surrounding undo chunk; time1 connections and TRS locks
+            go through cmds inside the same chunk. A failure reverts the whole batch."""
+            mod = om2.MDagModifier()
+            name = lambda o: om2.MFnDependencyNode(o).name()
+            jobs = []
+
+            # pass 1: cleanup + nodes + attributes
+            for file_node in file_nodes:
+                fobj = _mobj(file_node)
+                if fobj is None or not fobj.hasFn(om2.MFn.kFileTexture):
+                    cmds.warning("File node not found: %s" % file_node)
+                    continue
+                try:
+                    fmin, fmax = _scan_seq_range(cmds.getAttr(file_node + ".fileTextureName"))
+                except RuntimeError as e:
+                    cmds.warning("Skip %s: %s" % (file_node, e))
+                    continue
+                mod.newPlugValueBool(_plug(fobj, "useFrameExtension"), True)
+
+                names = {"ctrl": f"{file_node}_{name_token}_CTRL",
+                         "pma": f"PMA_{file_node}_frame", "clp": f"CLP_{file_node}_frame",
+                         "md": f"MD_{file_node}_alpha2x", "pma2": f"PMA_{file_node}_alphaShift"}
+                deleted = set()
+                for n in list(names.values()) + expr_index.expressions_for(file_node + ".frameExtension"):
+                    o = _mobj(n)
+                    if o is not None:
+                        mod.deleteNode(o)
+                        deleted.add(name(o))
+                        expr_index.discard(n)
+                fe = _plug(fobj, "frameExtension")
+                src = fe.source()
+                if not src.isNull and name(src.node()) not in deleted:
+                    if src.node().hasFn(om2.MFn.kAnimCurve) or src.node().hasFn(om2.MFn.kExpression):
+                        mod.deleteNode(src.node())
+                    else:
+                        mod.disconnect(src, fe)
+
+                job = {"file": fobj, "fmin": fmin, "fmax": fmax,
+                       "alpha": cmds.attributeQuery("alphaGain", n=file_node, ex=True)}
+                job["ctrl"] = mod.createNode("transform")
+                kinds = [("pma", "plusMinusAverage"), ("clp", "clamp")]
+                if job["alpha"]:
+                    kinds += [("md", "multiplyDivide"), ("pma2", "plusMinusAverage")]
+                else:
+                    cmds.warning("Alpha Gain attribute not found on file node %s." % file_node)
+                for key, node_type in kinds:
+                    job[key] = om2.MDGModifier.createNode(mod, node_type)
+                for key in ["ctrl"] + [k for k, _ in kinds]:
+                    mod.renameNode(job[key], names[key])
+                for attr in _ctrl_attrs(fmin, fmax):
+                    mod.addAttribute(job["ctrl"], attr)
+                if not cmds.attributeQuery(tag_attr, n=file_node, ex=True):
+                    mod.addAttribute(fobj, om2.MFnMessageAttribute().create(tag_attr, tag_attr))
+                jobs.append(job)
+            try:
+                mod.doIt()
+                build_batch_connections(mod, jobs)
+            except Exception:
+                mod.undoIt()  # 任何一遍失败：连已建的节点一起撤掉，不留孤立节点
+                raise
+            # 先登记 modifier，后面的 cmds 编辑排在它之后，Ctrl+Z 时先撤 cmds 再撤节点
+            api_undo.commit(mod.undoIt, mod.doIt)
+            time1 = _ensure_time1()
+
+            # cmds 部分（在同一个 undo chunk 里，由 Maya 自己撤销）：
+            # time -> double 要 Maya 插 unitConversion；TRS 锁定是 plug 状态，modifier 管不到
+            for job in jobs:
+                ctrl, pma = name(job["ctrl"]), name(job["pma"])
+                cmds.connectAttr(time1 + ".outTime", pma + ".input1D[0]", f=True)
+                for a in ("t", "r", "s"):
+                    for ax in ("x", "y", "z"):
+                        cmds.setAttr("%s.%s%s" % (ctrl, a, ax), keyable=False, lock=True)
+                stats["files"] += 1
+                stats["nodes"] += 1 + (4 if job["alpha"] else 2)
+                print("[OK] Built controller for %s  range=[%d,%d]  tag=%s"
+                      % (name(job["file"]), job["fmin"], job["fmax"], tool_tag))
+
+        def build_batch_connections(mod, jobs):
+            # pass 2: connections + values
+            util_list = _mobj("defaultRenderUtilityList1")
+            util_plug = _plug(util_list, "utilities") if util_list is not None else None
+            util_next = max(list(util_plug.getExistingArrayAttributeIndices()) or [-1]) + 1 if util_plug else 0
+            for job in jobs:
+                ctrl, fobj, pma, clp = job["ctrl"], job["file"], job["pma"], job["clp"]
+
+                tag_dst = _plug(fobj, tag_attr)
+                if not tag_dst.source().isNull:
+                    mod.disconnect(tag_dst.source(), tag_dst)
+                mod.connect(_plug(ctrl, tag_attr), tag_dst)
+
+                mod.newPlugValueInt(_plug(pma, "operation"), 1)  # sum
+                mod.connect(_plug(ctrl, "seqOffset"), _plug(pma, "input1D", 1))
+                mod.connect(_plug(pma, "output1D"), _plug(clp, "inputR"))
+                mod.connect(_plug(ctrl, "seqMin"), _plug(clp, "minR"))
+                mod.connect(_plug(ctrl, "seqMax"), _plug(clp, "maxR"))
+                mod.connect(_plug(clp, "outputR"), _plug(fobj, "frameExtension"))
+                utils = [pma, clp]
+
+                if job["alpha"]:
+                    md, pma2 = job["md"], job["pma2"]
+                    mod.newPlugValueInt(_plug(md, "operation"), 1)  # multiply
+                    mod.connect(_plug(ctrl, "flipAlpha"), _plug(md, "input1X"))
+                    mod.newPlugValueFloat(_plug(md, "input2X"), 2.0)
+                    mod.newPlugValueInt(_plug(pma2, "operation"), 2)  # subtract
+                    mod.connect(_plug(md, "outputX"), _plug(pma2, "input1D", 0))
+                    mod.newPlugValueFloat(_plug(pma2, "input1D", 1), 1.0)
+                    mod.connect(_plug(pma2, "output1D"), _plug(fobj, "alphaGain"))
+                    utils += [md, pma2]
+
+                # same registration shadingNode -asUtility does (Hypershade utilities tab)
+                for u in (utils if util_plug else ()):
+                    mod.connect(_plug(u, "message"), util_plug.elementByLogicalIndex(util_next))
+                    util_next += 1
+
+            mod.doIt()
+
+        def run_batch(file_nodes, use_api):
+            """Build N clampers in one suspended-refresh, single-undo-chunk transaction."""
+            if not file_nodes:
+                cmds.warning("No eligible file nodes.")
+                return
+            stats = {"files": 0, "nodes": 0}
+            t0 = time.perf_counter()
+            cmds.refresh(suspend=True)
+            try:
+                with undo_chunk("ImageSeqClamperBatch"):
+                    expr_index = ExpressionIndex()
+                    if use_api:
+                        try:
+                            build_batch_api(file_nodes, expr_index, stats)
+                        except Exception as e:
+                            cmds.warning("API batch failed: %s" % e)
+                    else:
+                        for n in file_nodes:
+                            try:
+                                build_for_file(n, expr_index, stats)
+                            except Exception as e:
+                                cmds.warning("Failed %s: %s" % (n, e))
+            finally:
+                cmds.refresh(suspend=False)
+            dt = time.perf_counter() - t0
+            print("[Batch] %s  files=%d  nodes=%d  %.3fs  %.1f nodes/s"
+                  % ("MDagModifier" if use_api else "cmds", stats["files"], stats["nodes"],
+                     dt, stats["nodes"] / dt if dt else 0.0))
+
         # ---------------- UI ----------------
         def build_ui():
             win = "ImageSeqClamper_UI"
@@ -1184,11 +1812,16 @@ class MyWindow(QtWidgets.QWidget):
             menu = cmds.optionMenu()
             btnR = cmds.button(l="Refresh", c=lambda *_: fill_menu(menu))
             btnC = cmds.button(l="Create",  c=lambda *_: run_create(menu))
+            chkA = cmds.checkBox(l="Batch via MDagModifier (fast)", v=False)
+            btnA = cmds.button(l="Create All (batch)",
+                               c=lambda *_: run_batch(_eligible_file_nodes(), cmds.checkBox(chkA, q=True, v=True)))
             m = 8
             cmds.formLayout(form, e=True,
                 attachForm=[(lab,'top',m),(lab,'left',m),(menu,'top',m),(menu,'right',m),
-                            (btnR,'left',m),(btnC,'right',m),(btnR,'bottom',m),(btnC,'bottom',m)],
-                attachControl=[(menu,'left',6,lab),(btnR,'top',6,menu),(btnC,'top',6,menu)],
+                            (btnR,'left',m),(btnC,'right',m),(chkA,'left',m),(chkA,'right',m),
+                            (btnA,'left',m),(btnA,'right',m),(btnA,'bottom',m)],
+                attachControl=[(menu,'left',6,lab),(btnR,'top',6,menu),(btnC,'top',6,menu),
+                               (chkA,'top',6,btnR),(btnA,'top',6,chkA)],
                 attachPosition=[(btnR,'right',6,30),(btnC,'left',6,32)]
             )
             cmds.showWindow(win)